@@ -0,0 +1,16 @@
+"""
+Shared core for the AIVAs business assistants (no Streamlit dependencies)
+"""
+
+from aivas.bots import BOT_PERSONALITIES, build_system_prompt
+from aivas.chat import OPENAI_PRICING, TokenManager, EnhancedChatManager
+from aivas.providers import (
+    ChatChunk,
+    ChatResult,
+    LLMProvider,
+    OllamaProvider,
+    OpenAIProvider,
+    ProviderError,
+    StubProvider,
+    build_providers,
+)
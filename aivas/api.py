@@ -0,0 +1,433 @@
+"""
+Headless HTTP API for the AIVAs personas (plain ASGI, served by uvicorn)
+
+Routes:
+    GET  /health    liveness plus in-flight counters
+    GET  /bots      persona catalog (?category= filters)
+    POST /chat      {"bot", "message" | "messages", "model"?, "provider"?, "max_tokens"?,
+                     "temperature"?, "stream"?}; stream=true answers with Server-Sent Events
+    POST /images    {"prompt", "size"?, "model"?, "provider"?}
+
+The API runs the same EnhancedChatManager pipeline as the Streamlit page:
+single-flight deduplication, generation slots, the API key pool, learned
+max_tokens budgets from the shared usage ledger, and the RATE_LIMITS from
+config applied per client. A client that disconnects mid-stream cancels its
+generation upstream.
+
+Run:
+    python -m aivas.api --port 8100
+    AIVAS_API_KEYS=secret1,secret2 python -m aivas.api   # require "Authorization: Bearer <key>"
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import uvicorn
+
+from aivas.bots import BOT_PERSONALITIES, build_system_prompt
+from aivas.budgets import CHAT_ACTION, BudgetPlanner, UsageLedger
+from aivas.cancellation import CancellationToken, GenerationSlots
+from aivas.chat import EnhancedChatManager
+from aivas.keypool import ApiKeyPool, TokenBucket, parse_api_keys
+from aivas.providers import build_providers, default_provider_name, estimate_request_tokens
+from config import (
+    API,
+    API_KEY_POOL,
+    DEFAULT_MODELS,
+    GENERATION,
+    LLM_PROVIDERS,
+    PERSONA_PROVIDERS,
+    RATE_LIMITS,
+    TOKEN_BUDGETS,
+)
+
+logger = logging.getLogger(__name__)
+
+class HTTPError(Exception):
+    """Turned into a JSON error response"""
+
+    def __init__(self, status: int, message: str, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or []
+
+# ======================================================
+# 🚦 PER-CLIENT RATE LIMITS
+# ======================================================
+
+class ClientLimiter:
+    """RATE_LIMITS per client: requests per minute, tokens per hour, images per hour"""
+
+    def __init__(self, limits: Dict):
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+
+    def _client(self, client: str) -> Dict[str, TokenBucket]:
+        with self._lock:
+            if client not in self._buckets:
+                rpm = self.limits["requests_per_minute"]
+                tph = self.limits["tokens_per_hour"]
+                iph = self.limits["images_per_hour"]
+                self._buckets[client] = {
+                    "requests": TokenBucket(rpm / 60, rpm),
+                    "tokens": TokenBucket(tph / 3600, tph),
+                    "images": TokenBucket(iph / 3600, iph),
+                }
+            return self._buckets[client]
+
+    def check(self, client: str, bucket: str, amount: float = 1.0):
+        """Consume from one of the client's buckets or raise a 429 with Retry-After"""
+        limiter = self._client(client)[bucket]
+        if not limiter.try_consume(amount):
+            retry_after = max(1, math.ceil(limiter.time_until(amount)))
+            raise HTTPError(429, f"Rate limit exceeded ({bucket}); retry in {retry_after}s",
+                            [(b"retry-after", str(retry_after).encode())])
+
+    def check_many(self, client: str, amounts: Dict[str, float]):
+        """Consume from several buckets, all or nothing: a 429 from one refunds the ones already charged"""
+        charged = []
+        try:
+            for bucket, amount in amounts.items():
+                self.check(client, bucket, amount)
+                charged.append((bucket, amount))
+        except HTTPError:
+            buckets = self._client(client)
+            for bucket, amount in charged:
+                buckets[bucket].refund(amount)
+            raise
+
+# ======================================================
+# 🌐 ASGI APPLICATION
+# ======================================================
+
+def _json_bytes(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+def _sse(event: str, payload: Dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n".encode("utf-8")
+
+class AivasAPI:
+    """ASGI callable; blocking provider calls run on a bounded thread pool"""
+
+    def __init__(self, manager: EnhancedChatManager, planner: Optional[BudgetPlanner] = None,
+                 api_keys: Optional[List[str]] = None, threads: int = 64, max_body_bytes: int = 1_000_000,
+                 rate_limits: Optional[Dict] = None):
+        self.manager = manager
+        self.planner = planner
+        self.api_keys = set(api_keys or [])
+        self.max_body_bytes = max_body_bytes
+        self.limiter = ClientLimiter(rate_limits) if rate_limits else None
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="aivas-api")
+        self.stats = {"requests": 0, "streams_open": 0, "disconnects": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        self.stats["requests"] += 1
+        try:
+            client = self._authenticate(scope)
+            route = (scope["method"], scope["path"].rstrip("/") or "/")
+            if route == ("GET", "/health"):
+                await self._send_json(send, 200, self._health())
+            elif route == ("GET", "/bots"):
+                await self._send_json(send, 200, self._bots(scope))
+            elif route == ("POST", "/chat"):
+                await self._chat(client, await self._read_json(receive), receive, send)
+            elif route == ("POST", "/images"):
+                await self._images(client, await self._read_json(receive), send)
+            elif route[1] in ("/health", "/bots", "/chat", "/images"):
+                raise HTTPError(405, f"{scope['method']} not allowed on {route[1]}")
+            else:
+                raise HTTPError(404, f"No route {scope['path']}")
+        except HTTPError as e:
+            await self._send_json(send, e.status, {"error": e.message}, e.headers)
+        except Exception as e:
+            logger.error(f"API request failed: {str(e)}")
+            await self._send_json(send, 500, {"error": str(e)})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ---- request helpers ----------------------------------------------------
+
+    def _authenticate(self, scope) -> str:
+        """Client identity for rate limiting: the bearer key when keys are required, else the peer address"""
+        headers = dict(scope.get("headers") or [])
+        auth = headers.get(b"authorization", b"").decode("latin-1")
+        token = auth[7:].strip() if auth.lower().startswith("bearer ") else ""
+        if self.api_keys:
+            if token not in self.api_keys:
+                raise HTTPError(401, "Missing or invalid API key")
+            return f"key:{token}"
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else "ip:unknown"
+
+    async def _read_json(self, receive) -> Dict:
+        body, more = b"", True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "Client disconnected")
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+            if len(body) > self.max_body_bytes:
+                raise HTTPError(413, "Request body too large")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return payload
+
+    async def _send_json(self, send, status: int, payload, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        body = _json_bytes(payload)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                       + (headers or []),
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _try_send(self, send, message: Dict) -> bool:
+        """Send one ASGI message; False if the connection is already gone"""
+        try:
+            await send(message)
+            return True
+        except Exception as e:
+            logger.info(f"Send failed, client gone: {str(e)}")
+            return False
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _watch_disconnect(self, receive, token: CancellationToken):
+        """Cancel the generation when the client goes away"""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self.stats["disconnects"] += 1
+                token.cancel("client disconnected")
+                return
+
+    # ---- routes -------------------------------------------------------------
+
+    def _health(self) -> Dict:
+        slots = self.manager.slots
+        return {
+            "status": "ok",
+            "requests": self.stats["requests"],
+            "streams_open": self.stats["streams_open"],
+            "generations_active": slots.active if slots else None,
+            "generations_waiting": slots.waiting if slots else None,
+            "singleflight_in_flight": self.manager.singleflight.in_flight() if self.manager.singleflight else 0,
+        }
+
+    def _bots(self, scope) -> Dict:
+        category = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("category", [""])[0]
+        bots = [
+            {
+                "name": name,
+                "emoji": info["emoji"],
+                "category": info["category"],
+                "quick_actions": info.get("quick_actions", []),
+            }
+            for name, info in BOT_PERSONALITIES.items()
+            if not category or info["category"] == category
+        ]
+        return {"bots": bots, "count": len(bots)}
+
+    def _chat_request(self, client: str, body: Dict) -> Dict:
+        """Validate a /chat body into generation arguments"""
+        bot = body.get("bot")
+        if bot not in BOT_PERSONALITIES:
+            raise HTTPError(404, f"Unknown bot: {bot}")
+        bot_info = BOT_PERSONALITIES[bot]
+        if isinstance(body.get("messages"), list):
+            history = body["messages"]
+            if not history or not all(isinstance(msg, dict) and msg.get("role") in ("user", "assistant")
+                                      and isinstance(msg.get("content"), str) for msg in history):
+                raise HTTPError(400, "messages must be a non-empty list of {role: user|assistant, content}")
+        elif isinstance(body.get("message"), str) and body["message"].strip():
+            history = [{"role": "user", "content": body["message"]}]
+        else:
+            raise HTTPError(400, "Provide message or messages")
+
+        max_tokens = body.get("max_tokens")
+        if max_tokens is None:
+            max_tokens = self.planner.budget(bot, CHAT_ACTION, bot_info) if self.planner else 2000
+        elif isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens < 1:
+            raise HTTPError(400, "max_tokens must be a positive integer")
+        temperature = body.get("temperature", bot_info["temperature"])
+        if isinstance(temperature, bool) or not isinstance(temperature, (int, float)) or not 0 <= temperature <= 2:
+            raise HTTPError(400, "temperature must be a number between 0 and 2")
+        messages = [{"role": "system", "content": build_system_prompt(bot)}] + history
+        if self.limiter:
+            # A request refused for its token budget does not use up a request slot
+            self.limiter.check_many(client, {"tokens": estimate_request_tokens(messages, max_tokens),
+                                             "requests": 1})
+        return {
+            "bot": bot,
+            "messages": messages,
+            "model": body.get("model") or DEFAULT_MODELS["chat"],
+            "temperature": float(temperature),
+            "provider": body.get("provider") or PERSONA_PROVIDERS.get(bot) or bot_info.get("provider"),
+            "max_tokens": max_tokens,
+        }
+
+    def _record(self, bot: str, metadata: Dict):
+        if self.planner:
+            self.planner.ledger.record(bot, CHAT_ACTION, metadata)
+
+    async def _chat(self, client: str, body: Dict, receive, send):
+        request = self._chat_request(client, body)
+        token = CancellationToken()
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, token))
+        try:
+            if body.get("stream"):
+                await self._stream_chat(request, token, send)
+                return
+            content, metadata = await self._run(
+                lambda: self.manager.generate_response(request["messages"], request["model"], request["temperature"],
+                                                       provider=request["provider"], cancel_token=token,
+                                                       max_tokens=request["max_tokens"]))
+            if token.cancelled:
+                # Nobody is listening, but the response cycle still has to be completed
+                try:
+                    await self._send_json(send, 499, {"error": "Client disconnected", "metadata": metadata})
+                except Exception as e:
+                    logger.info(f"Send failed, client gone: {str(e)}")
+                return
+            self._record(request["bot"], metadata)
+            status = 502 if metadata.get("error") else 200
+            await self._send_json(send, status, {"bot": request["bot"], "content": content, "metadata": metadata})
+        finally:
+            watcher.cancel()
+
+    async def _stream_chat(self, request: Dict, token: CancellationToken, send):
+        """Relay manager.stream_response events as SSE; the generator runs on a pool thread"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            events = self.manager.stream_response(request["messages"], request["model"], request["temperature"],
+                                                  provider=request["provider"], cancel_token=token,
+                                                  max_tokens=request["max_tokens"])
+            try:
+                for event in events:
+                    loop.call_soon_threadsafe(queue.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, {"error": str(e)})
+            finally:
+                events.close()
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no")],
+        })
+        self.stats["streams_open"] += 1
+        producer = loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                event = await queue.get()
+                if event is done:
+                    break
+                if event.get("done"):
+                    self._record(request["bot"], event["metadata"])
+                    chunk = _sse("done", {"content": event["content"], "metadata": event["metadata"]})
+                elif "delta" in event:
+                    chunk = _sse("delta", {"text": event["delta"]})
+                elif event.get("queued"):
+                    chunk = _sse("queued", {"waiting": event["waiting"]})
+                else:
+                    chunk = _sse("error", event)
+                if not await self._try_send(send, {"type": "http.response.body", "body": chunk, "more_body": True}):
+                    # Stop relaying after the first failed send; the producer winds down on the cancel
+                    token.cancel("client disconnected")
+                    break
+            await self._try_send(send, {"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.stats["streams_open"] -= 1
+            if not producer.done():
+                token.cancel("stream closed")
+            await producer
+
+    async def _images(self, client: str, body: Dict, send):
+        prompt = body.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise HTTPError(400, "Provide prompt")
+        if self.limiter:
+            self.limiter.check_many(client, {"images": 1, "requests": 1})
+        url, metadata = await self._run(
+            lambda: self.manager.generate_image(prompt, body.get("model") or DEFAULT_MODELS["image"],
+                                                body.get("size") or "1024x1024", provider=body.get("provider")))
+        status = 502 if metadata.get("error") else 200
+        await self._send_json(send, status, {"url": url, "metadata": metadata})
+
+# ======================================================
+# 🚀 SERVER
+# ======================================================
+
+def create_app(openai_keys: Optional[List[Dict]] = None, base_url: Optional[str] = None,
+               api_keys: Optional[List[str]] = None, rate_limits: Optional[Dict] = RATE_LIMITS,
+               ledger_path: Optional[str] = TOKEN_BUDGETS["ledger_path"]) -> AivasAPI:
+    """API wired like the Streamlit page: shared slots, key pool and usage ledger (None: fixed budgets)"""
+    key_pool = ApiKeyPool(openai_keys, base_url, **API_KEY_POOL) if openai_keys else None
+    providers = build_providers(LLM_PROVIDERS, base_url=base_url, key_pool=key_pool)
+    manager = EnhancedChatManager(providers, default_provider_name(providers, LLM_PROVIDERS.get("default")),
+                                  slots=GenerationSlots(GENERATION["max_concurrent_generations"]))
+    planner = None
+    if ledger_path:
+        planner = BudgetPlanner(
+            UsageLedger(ledger_path, TOKEN_BUDGETS["window"]),
+            percentile=TOKEN_BUDGETS["percentile"],
+            headroom=TOKEN_BUDGETS["headroom"],
+            min_tokens=TOKEN_BUDGETS["min_tokens"],
+            max_tokens=TOKEN_BUDGETS["max_tokens"],
+            min_samples=TOKEN_BUDGETS["min_samples"]
+        )
+    return AivasAPI(manager, planner, api_keys, API["threads"], API["max_body_bytes"], rate_limits)
+
+def app_from_env() -> AivasAPI:
+    return create_app(
+        parse_api_keys(os.environ.get("OPENAI_API_KEYS") or os.environ.get("OPENAI_API_KEY")),
+        os.environ.get("OPENAI_BASE_URL"),
+        [key["api_key"] for key in parse_api_keys(os.environ.get("AIVAS_API_KEYS"))],
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the AIVAs personas over HTTP")
+    parser.add_argument("--host", default=API["host"])
+    parser.add_argument("--port", type=int, default=API["port"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(app_from_env(), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
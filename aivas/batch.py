@@ -0,0 +1,277 @@
+"""
+Headless batch evaluation: a prompt set against many personas and models
+
+Every (prompt, bot, model) job runs through EnhancedChatManager on a bounded
+worker pool and is appended to a JSONL results file as soon as it finishes.
+Re-running the same command skips jobs already in that file, so an
+interrupted run resumes where it stopped; failed jobs are retried.
+
+Examples:
+    python -m aivas.batch prompts.csv --all-bots --out results/batch.jsonl
+    python -m aivas.batch prompts.jsonl --category "Marketing & Sales" --models gpt-4-turbo gpt-3.5-turbo
+    python -m aivas.batch prompts.csv --bots "Startup Strategist" --provider stub --workers 16
+
+Prompt files: CSV with a "prompt" column, or JSONL objects with a "prompt"
+key. Optional "id" (stable resume key, defaults to a hash of the prompt) and
+"bot" (restricts that prompt to one persona) columns.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from aivas.bots import BOT_PERSONALITIES, build_system_prompt
+from aivas.chat import EnhancedChatManager
+from aivas.keypool import ApiKeyPool, parse_api_keys
+from aivas.providers import build_providers, default_provider_name
+from config import API_KEY_POOL, LLM_PROVIDERS
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class BatchJob:
+    """One prompt sent to one persona on one model"""
+    prompt_id: str
+    prompt: str
+    bot: str
+    model: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.prompt_id}|{self.bot}|{self.model}"
+
+# ======================================================
+# 📥 PROMPTS AND JOBS
+# ======================================================
+
+def _prompt_id(prompt: str) -> str:
+    return "p-" + hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+def load_prompts(path: str) -> List[Dict]:
+    """Prompt rows from a CSV or JSONL file: {"id", "prompt", "bot"?}"""
+    rows = []
+    with open(path, encoding="utf-8", newline="") as handle:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            records = (json.loads(line) for line in handle if line.strip())
+        else:
+            records = csv.DictReader(handle)
+        for record in records:
+            prompt = str(record.get("prompt") or "").strip()
+            if not prompt:
+                continue
+            rows.append({
+                "id": str(record.get("id") or "").strip() or _prompt_id(prompt),
+                "prompt": prompt,
+                "bot": (record.get("bot") or "").strip() or None,
+            })
+    return rows
+
+def select_bots(names: Optional[List[str]] = None, categories: Optional[List[str]] = None,
+                all_bots: bool = False) -> List[str]:
+    """Persona names by explicit name, by category, or every persona"""
+    if all_bots:
+        return sorted(BOT_PERSONALITIES)
+    unknown = [name for name in names or [] if name not in BOT_PERSONALITIES]
+    if unknown:
+        raise ValueError(f"Unknown bots: {', '.join(unknown)}")
+    selected = set(names or [])
+    for category in categories or []:
+        matches = {name for name, info in BOT_PERSONALITIES.items() if info["category"] == category}
+        if not matches:
+            raise ValueError(f"Unknown category: {category}")
+        selected |= matches
+    return sorted(selected)
+
+def build_jobs(prompts: List[Dict], bots: List[str], models: List[str]) -> List[BatchJob]:
+    """Cross product of prompts, bots and models (prompts pinned to a bot only run on that bot)"""
+    jobs = []
+    for row in prompts:
+        targets = [row["bot"]] if row["bot"] else bots
+        for bot in targets:
+            if bot not in BOT_PERSONALITIES:
+                logger.warning(f"Skipping prompt {row['id']}: unknown bot {bot}")
+                continue
+            for model in models:
+                jobs.append(BatchJob(row["id"], row["prompt"], bot, model))
+    return jobs
+
+def completed_keys(path: str) -> Set[str]:
+    """Keys of successful jobs already in a results file (the resume checkpoint)"""
+    keys: Set[str] = set()
+    if not os.path.exists(path):
+        return keys
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line after an interrupted run is skipped, not fatal
+                continue
+            if not record.get("error"):
+                keys.add(record["key"])
+    return keys
+
+# ======================================================
+# 🏃 RUNNER
+# ======================================================
+
+def run_job(manager: EnhancedChatManager, job: BatchJob, provider: Optional[str], max_tokens: int) -> Dict:
+    """Generate one answer and build its result record"""
+    messages = [
+        {"role": "system", "content": build_system_prompt(job.bot)},
+        {"role": "user", "content": job.prompt},
+    ]
+    started = time.perf_counter()
+    content, metadata = manager.generate_response(messages, job.model, BOT_PERSONALITIES[job.bot]["temperature"],
+                                                  provider=provider, max_tokens=max_tokens)
+    return {
+        "key": job.key,
+        "prompt_id": job.prompt_id,
+        "bot": job.bot,
+        "model": job.model,
+        "prompt": job.prompt,
+        "response": content,
+        "error": bool(metadata.get("error")),
+        "message": metadata.get("message"),
+        "provider": metadata.get("provider"),
+        "input_tokens": metadata.get("input_tokens", 0),
+        "output_tokens": metadata.get("output_tokens", 0),
+        "cost": metadata.get("cost", 0.0),
+        "finish_reason": metadata.get("finish_reason"),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+def run_batch(jobs: Iterable[BatchJob], manager: EnhancedChatManager, out_path: str,
+              workers: int = 8, provider: Optional[str] = None, max_tokens: int = 2000,
+              progress: Optional[Callable[[Dict, Dict], None]] = None) -> Dict:
+    """Run jobs not yet in out_path on a bounded pool, appending each result as it completes"""
+    jobs = list(jobs)
+    done = completed_keys(out_path)
+    pending = [job for job in jobs if job.key not in done]
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    stats = {"jobs": len(jobs), "skipped": len(jobs) - len(pending), "completed": 0, "errors": 0,
+             "input_tokens": 0, "output_tokens": 0, "cost": 0.0, "interrupted": False}
+    latencies: List[float] = []
+    lock = threading.Lock()
+    queue = deque(pending)
+    started = time.perf_counter()
+
+    with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        def write(record: Dict):
+            with lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                stats["completed"] += 1
+                stats["errors"] += int(record["error"])
+                if not record["error"]:
+                    stats["input_tokens"] += record["input_tokens"]
+                    stats["output_tokens"] += record["output_tokens"]
+                    stats["cost"] += record["cost"]
+                    latencies.append(record["latency_ms"])
+            if progress:
+                progress(record, stats)
+
+        # Only a couple of jobs per worker are queued at a time, so Ctrl-C stops quickly
+        # and huge prompt sets never sit in memory as futures
+        in_flight = set()
+        try:
+            while queue or in_flight:
+                while queue and len(in_flight) < workers * 2:
+                    in_flight.add(pool.submit(run_job, manager, queue.popleft(), provider, max_tokens))
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future.result())
+        except KeyboardInterrupt:
+            stats["interrupted"] = True
+            for future in in_flight:
+                future.cancel()
+            # Requests already upstream are paid for: keep their answers
+            for future in in_flight:
+                if not future.cancelled():
+                    write(future.result())
+            logger.warning("Interrupted: finished jobs are saved, re-run the same command to resume")
+
+    wall_s = time.perf_counter() - started
+    ok = stats["completed"] - stats["errors"]
+    stats.update({
+        "wall_s": round(wall_s, 3),
+        "throughput_per_s": round(ok / wall_s, 3) if wall_s else 0.0,
+        "tokens_per_s": round(stats["output_tokens"] / wall_s, 1) if wall_s else 0.0,
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+        "cost": round(stats["cost"], 6),
+    })
+    return stats
+
+def print_batch_summary(stats: Dict, out_path: str):
+    print(f"\nBatch results: {out_path}")
+    print(f"  jobs:        {stats['jobs']} ({stats['skipped']} already done, {stats['completed']} run now)")
+    print(f"  errors:      {stats['errors']}")
+    print(f"  wall time:   {stats['wall_s']:.1f}s")
+    print(f"  throughput:  {stats['throughput_per_s']:.2f} answers/s, {stats['tokens_per_s']:.0f} output tokens/s")
+    if stats["latency_ms_p50"] is not None:
+        print(f"  latency:     p50 {stats['latency_ms_p50']:.0f} ms, p95 {stats['latency_ms_p95']:.0f} ms")
+    print(f"  tokens:      {stats['input_tokens']} in / {stats['output_tokens']} out")
+    print(f"  cost:        ${stats['cost']:.4f}")
+    if stats["interrupted"]:
+        print("  interrupted: re-run the same command to resume")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a prompt set against AIVAs personas and models")
+    parser.add_argument("prompts", help="CSV or JSONL prompt file")
+    parser.add_argument("--bots", nargs="+", default=[], help="persona names")
+    parser.add_argument("--category", nargs="+", default=[], help="every persona in these categories")
+    parser.add_argument("--all-bots", action="store_true", help="every persona")
+    parser.add_argument("--models", nargs="+", default=["gpt-4-turbo"])
+    parser.add_argument("--provider", help="backend (openai, ollama, stub); default: OpenAI when a key is set")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent requests")
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    parser.add_argument("--out", default="data/batch/results.jsonl", help="JSONL results file, also the checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        bots = select_bots(args.bots, args.category, args.all_bots)
+    except ValueError as e:
+        parser.error(str(e))
+    if not bots:
+        parser.error("select personas with --bots, --category or --all-bots")
+
+    jobs = build_jobs(load_prompts(args.prompts), bots, args.models)
+    keys = parse_api_keys(os.environ.get("OPENAI_API_KEYS") or os.environ.get("OPENAI_API_KEY"))
+    base_url = os.environ.get("OPENAI_BASE_URL")
+    providers = build_providers(LLM_PROVIDERS, base_url=base_url,
+                                key_pool=ApiKeyPool(keys, base_url, **API_KEY_POOL) if keys else None)
+    # Batch prompts are distinct by construction: skip single-flight bookkeeping
+    manager = EnhancedChatManager(providers, default_provider_name(providers, LLM_PROVIDERS.get("default")),
+                                  singleflight=None)
+
+    def progress(record: Dict, stats: Dict):
+        if stats["completed"] % 25 == 0:
+            print(f"  {stats['completed'] + stats['skipped']}/{stats['jobs']} done, {stats['errors']} errors",
+                  file=sys.stderr)
+
+    stats = run_batch(jobs, manager, args.out, args.workers, args.provider, args.max_tokens, progress)
+    print_batch_summary(stats, args.out)
+    if stats["interrupted"]:
+        sys.exit(130)
+
+if __name__ == "__main__":
+    main()
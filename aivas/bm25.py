@@ -0,0 +1,286 @@
+"""
+BM25 inverted index: embedding-free lexical retrieval over document chunks and saved conversations
+
+Documents are buffered in memory (and searchable there) and flushed as
+immutable segments once flush_every documents are waiting or the oldest has
+waited flush_interval_s:
+    segment-000001.npz    sorted terms, postings offsets, doc ids (int32), term freqs (uint16), doc lengths
+    segment-000001.jsonl  per-document metadata (chunk_id, doc_id, source, location, text, tokens)
+    deleted.json          tombstoned chunk_ids, applied at query time
+Small segments are merged once there are more than max_segments of them.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from aivas.ingest import tokenize
+
+logger = logging.getLogger(__name__)
+
+class Segment:
+    """Immutable postings for a batch of documents"""
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, doc_ids: np.ndarray,
+                 term_freqs: np.ndarray, doc_lengths: np.ndarray, records: List[Dict]):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.records = records
+        self.dead: Optional[Tuple[int, np.ndarray]] = None   # (delete generation, tombstoned rows)
+
+    @classmethod
+    def build(cls, records: List[Dict]) -> "Segment":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = np.zeros(len(records), dtype=np.int32)
+        for doc_idx, record in enumerate(records):
+            counts = Counter(tokenize(record.get("text", "")))
+            lengths[doc_idx] = sum(counts.values())
+            for term, freq in counts.items():
+                postings.setdefault(term, []).append((doc_idx, freq))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for idx, term in enumerate(terms):
+            offsets[idx + 1] = offsets[idx] + len(postings[term])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        term_freqs = np.empty(offsets[-1], dtype=np.uint16)
+        for idx, term in enumerate(terms):
+            entries = np.asarray(postings[term], dtype=np.int64)
+            doc_ids[offsets[idx]:offsets[idx + 1]] = entries[:, 0]
+            term_freqs[offsets[idx]:offsets[idx + 1]] = np.minimum(entries[:, 1], np.iinfo(np.uint16).max)
+        return cls(np.asarray(terms, dtype=str), offsets, doc_ids, term_freqs, lengths, records)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        idx = int(np.searchsorted(self.terms, term))
+        if idx >= len(self.terms) or self.terms[idx] != term:
+            return self.doc_ids[:0], self.term_freqs[:0]
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.doc_ids[start:end], self.term_freqs[start:end]
+
+    def save(self, base_path: str):
+        np.savez(base_path + ".npz", terms=self.terms, offsets=self.offsets, doc_ids=self.doc_ids,
+                 term_freqs=self.term_freqs, doc_lengths=self.doc_lengths)
+        with open(base_path + ".jsonl", "w", encoding="utf-8") as handle:
+            for record in self.records:
+                handle.write(json.dumps(record) + "\n")
+
+    @classmethod
+    def load(cls, base_path: str) -> "Segment":
+        with np.load(base_path + ".npz") as data:
+            arrays = {name: data[name] for name in data.files}
+        with open(base_path + ".jsonl", encoding="utf-8") as handle:
+            records = [json.loads(line) for line in handle if line.strip()]
+        return cls(arrays["terms"], arrays["offsets"], arrays["doc_ids"],
+                   arrays["term_freqs"], arrays["doc_lengths"], records)
+
+class BM25Index:
+    """Segmented BM25 index with incremental adds and tombstone deletes"""
+
+    def __init__(self, directory: str, k1: float = 1.5, b: float = 0.75,
+                 flush_every: int = 256, max_segments: int = 8, flush_interval_s: float = 30.0):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.flush_every = flush_every
+        self.flush_interval_s = flush_interval_s
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self.segments: List[Segment] = []
+        self.segment_paths: List[str] = []
+        self.buffer: List[Dict] = []
+        self._buffer_segment: Optional[Segment] = None
+        self.deleted: set = set()
+        self._chunk_ids: set = set()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._generation = 0
+        self._load()
+
+    # ---- persistence ---------------------------------------------------
+
+    def _load(self):
+        for npz_path in sorted(glob.glob(os.path.join(self.directory, "segment-*.npz"))):
+            base_path = npz_path[:-len(".npz")]
+            try:
+                self.segments.append(Segment.load(base_path))
+                self.segment_paths.append(base_path)
+            except Exception as e:
+                logger.error(f"Skipping unreadable BM25 segment {base_path}: {str(e)}")
+        deleted_path = os.path.join(self.directory, "deleted.json")
+        if os.path.exists(deleted_path):
+            with open(deleted_path, encoding="utf-8") as handle:
+                self.deleted = set(json.load(handle))
+        self._chunk_ids = {record["chunk_id"] for segment in self.segments for record in segment.records
+                           if record["chunk_id"] not in self.deleted}
+
+    def _next_segment_path(self) -> str:
+        last = os.path.basename(self.segment_paths[-1]) if self.segment_paths else "segment-000000"
+        return os.path.join(self.directory, f"segment-{int(last.split('-')[1]) + 1:06d}")
+
+    def _save_deleted(self):
+        path = os.path.join(self.directory, "deleted.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as handle:
+            json.dump(sorted(self.deleted), handle)
+        os.replace(path + ".tmp", path)
+
+    def flush(self):
+        """Persist buffered documents as a new segment"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self.buffer:
+                return
+            segment = self._buffer_segment or Segment.build(self.buffer)
+            base_path = self._next_segment_path()
+            segment.save(base_path)
+            self.segments.append(segment)
+            self.segment_paths.append(base_path)
+            self.buffer, self._buffer_segment = [], None
+            if len(self.segments) > self.max_segments:
+                self.merge()
+
+    def merge(self):
+        """Merge all segments into one, dropping deleted documents"""
+        with self._lock:
+            records = [record for segment in self.segments for record in segment.records
+                       if record["chunk_id"] not in self.deleted]
+            old_paths = list(self.segment_paths)
+            base_path = self._next_segment_path()
+            self.segments, self.segment_paths = [], []
+            if records:
+                segment = Segment.build(records)
+                segment.save(base_path)
+                self.segments.append(segment)
+                self.segment_paths.append(base_path)
+            for path in old_paths:
+                for suffix in (".npz", ".jsonl"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+            # Deleted buffer documents were dropped from the buffer, so no tombstone is still needed
+            self.deleted = set()
+            self._chunk_ids = {record["chunk_id"] for record in records + self.buffer}
+            self._save_deleted()
+
+    # ---- mutation ------------------------------------------------------
+
+    def add(self, records: List[Dict]) -> int:
+        """Buffer documents (dicts with chunk_id and text); flushes every flush_every documents"""
+        with self._lock:
+            if any(record["chunk_id"] in self.deleted for record in records):
+                # Re-adding a deleted document: drop its tombstoned copy first
+                self.merge()
+            added = 0
+            for record in records:
+                if record["chunk_id"] in self._chunk_ids:
+                    continue
+                self.buffer.append(record)
+                self._chunk_ids.add(record["chunk_id"])
+                added += 1
+            if added:
+                self._buffer_segment = None
+            if len(self.buffer) >= self.flush_every:
+                self.flush()
+            elif self.buffer and self._flush_timer is None:
+                # Small uploads share a segment; the timer bounds how long they stay memory-only
+                self._flush_timer = threading.Timer(self.flush_interval_s, self._timed_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            return added
+
+    def _timed_flush(self):
+        with self._lock:
+            self._flush_timer = None
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Timed BM25 flush failed: {str(e)}")
+
+    def delete(self, chunk_ids: List[str]) -> int:
+        with self._lock:
+            live = [chunk_id for chunk_id in chunk_ids if chunk_id in self._chunk_ids]
+            if not live:
+                return 0
+            self.buffer = [record for record in self.buffer if record["chunk_id"] not in live]
+            self._buffer_segment = None
+            self.deleted.update(live)
+            self._chunk_ids.difference_update(live)
+            self._generation += 1
+            self._save_deleted()
+            stored = sum(len(segment.records) for segment in self.segments)
+            if stored and len(self.deleted) > stored // 2:
+                self.merge()
+            return len(live)
+
+    def delete_document(self, doc_id: str) -> int:
+        return self.delete([record["chunk_id"] for record in self.live_records() if record.get("doc_id") == doc_id])
+
+    # ---- queries -------------------------------------------------------
+
+    def _all_segments(self) -> List[Segment]:
+        if self.buffer and self._buffer_segment is None:
+            self._buffer_segment = Segment.build(self.buffer)
+        return self.segments + ([self._buffer_segment] if self.buffer else [])
+
+    def _dead_rows(self, segment: Segment) -> np.ndarray:
+        """Row indices of tombstoned documents in a segment, cached on it until the next delete"""
+        if segment.dead is None or segment.dead[0] != self._generation:
+            dead = np.array([idx for idx, record in enumerate(segment.records)
+                             if record["chunk_id"] in self.deleted], dtype=np.int64)
+            segment.dead = (self._generation, dead)
+        return segment.dead[1]
+
+    def live_records(self) -> List[Dict]:
+        with self._lock:
+            return [record for segment in self._all_segments() for record in segment.records
+                    if record["chunk_id"] not in self.deleted]
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._chunk_ids
+
+    def search(self, query: str, k: int = 8) -> List[Tuple[float, Dict]]:
+        """Top-k documents by BM25 score"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            segments = self._all_segments()
+            if not terms or not segments:
+                return []
+
+            total_docs = sum(len(segment.records) for segment in segments)
+            avg_length = sum(int(segment.doc_lengths.sum()) for segment in segments) / max(1, total_docs)
+            postings = [[segment.postings(term) for term in terms] for segment in segments]
+            doc_freq = np.array([sum(len(per_segment[t][0]) for per_segment in postings) for t in range(len(terms))])
+            idf = np.log(1.0 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+            candidates: List[Tuple[float, Dict]] = []
+            for segment, segment_postings in zip(segments, postings):
+                scores = np.zeros(len(segment.records), dtype=np.float64)
+                norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths / max(avg_length, 1e-9))
+                for term_idx, (doc_ids, term_freqs) in enumerate(segment_postings):
+                    if not len(doc_ids):
+                        continue
+                    tf = term_freqs.astype(np.float64)
+                    np.add.at(scores, doc_ids, idf[term_idx] * tf * (self.k1 + 1) / (tf + norm[doc_ids]))
+                if self.deleted:
+                    scores[self._dead_rows(segment)] = 0.0
+                hits = np.flatnonzero(scores > 0)
+                if not len(hits):
+                    continue
+                if len(hits) > k:
+                    hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+                candidates.extend((float(scores[idx]), segment.records[idx]) for idx in hits)
+
+            candidates.sort(key=lambda item: -item[0])
+            return candidates[:k]
@@ -0,0 +1,203 @@
+"""
+Branchable conversations stored as a persistent linked list
+
+Each message is an immutable node pointing at its parent, so a branch is
+just a head pointer: forking a "what if" from the middle of a chat shares
+the whole prefix instead of copying it. Nodes carry cumulative token counts,
+which makes a branch's size O(1) and lets window() send only the most
+recent history that fits the context budget.
+"""
+
+import logging
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAIN_BRANCH = "main"
+
+class MessageNode:
+    """One message; never mutated after creation, shared by every branch that contains it"""
+
+    __slots__ = ("message", "parent", "depth", "tokens", "cumulative_tokens")
+
+    def __init__(self, message: Dict, parent: Optional["MessageNode"], tokens: int):
+        self.message = message
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 1
+        self.tokens = tokens
+        self.cumulative_tokens = (parent.cumulative_tokens if parent else 0) + tokens
+
+class Conversation:
+    """List-like view of the current branch, plus fork/switch between branches"""
+
+    def __init__(self, token_counter: Optional[Callable[[str], int]] = None):
+        self.token_counter = token_counter or (lambda text: max(1, len(text) // 4))
+        self.branches: Dict[str, Optional[MessageNode]] = {MAIN_BRANCH: None}
+        self.current = MAIN_BRANCH
+        self._forks = 0
+        self.archived_messages = 0   # spilled to disk by aivas.memory, no longer in memory
+
+    # ---- list-like interface --------------------------------------------
+
+    @property
+    def head(self) -> Optional[MessageNode]:
+        return self.branches[self.current]
+
+    def _nodes_reversed(self) -> Iterator[MessageNode]:
+        node = self.head
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def _nodes(self) -> List[MessageNode]:
+        nodes = list(self._nodes_reversed())
+        nodes.reverse()
+        return nodes
+
+    def append(self, message: Dict):
+        tokens = self.token_counter(str(message.get("content", "")))
+        self.branches[self.current] = MessageNode(message, self.head, tokens)
+
+    def __len__(self) -> int:
+        return self.head.depth if self.head else 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter([node.message for node in self._nodes()])
+
+    def __reversed__(self) -> Iterator[Dict]:
+        return (node.message for node in self._nodes_reversed())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [node.message for node in self._nodes()[index]]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("conversation index out of range")
+        # Walk back from the head: recent messages are the common case
+        for node in self._nodes_reversed():
+            if node.depth == index + 1:
+                return node.message
+
+    def clear(self):
+        """Start over: drop every branch"""
+        self.branches = {MAIN_BRANCH: None}
+        self.current = MAIN_BRANCH
+        self._forks = 0
+        self.archived_messages = 0
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
+    def branch_messages(self, name: str) -> List[Dict]:
+        """Messages of any branch, without switching to it"""
+        messages, node = [], self.branches[name]
+        while node is not None:
+            messages.append(node.message)
+            node = node.parent
+        messages.reverse()
+        return messages
+
+    # ---- tokens -----------------------------------------------------------
+
+    @property
+    def total_tokens(self) -> int:
+        return self.head.cumulative_tokens if self.head else 0
+
+    def window(self, max_tokens: int) -> List[Dict]:
+        """Most recent messages whose combined size fits max_tokens (always at least the last one)"""
+        head = self.head
+        if head is None:
+            return []
+        selected = []
+        for node in self._nodes_reversed():
+            if selected and head.cumulative_tokens - node.cumulative_tokens + node.tokens > max_tokens:
+                break
+            selected.append(node.message)
+        selected.reverse()
+        return selected
+
+    # ---- branches -----------------------------------------------------------
+
+    def fork(self, index: int, name: Optional[str] = None) -> str:
+        """New branch sharing messages [0..index] with the current one; switches to it"""
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("conversation index out of range")
+        node = self.head
+        while node.depth > index + 1:
+            node = node.parent
+        self._forks += 1
+        name = name or f"branch {self._forks}"
+        while name in self.branches:
+            self._forks += 1
+            name = f"branch {self._forks}"
+        self.branches[name] = node
+        self.current = name
+        return name
+
+    def drop_before(self, depth: int, keep_last: int = 0) -> List[Tuple[str, Dict]]:
+        """Forget messages at positions 1..depth on every branch; returns the dropped (branch, message) pairs
+
+        Each branch keeps at least its own last keep_last messages, so the cut
+        is shallower on shorter branches. Newer nodes are rebuilt once per new
+        parent and still shared between branches; a message is only dropped
+        once no branch keeps it. Branches that diverged before the cut lose
+        their old messages too.
+        """
+        chains: Dict[str, Tuple[List[MessageNode], int]] = {}
+        kept_ids = set()
+        for name, head in self.branches.items():
+            chain, node = [], head
+            while node is not None:
+                chain.append(node)
+                node = node.parent
+            chain.reverse()
+            cut = min(depth, max(0, len(chain) - keep_last))
+            chains[name] = (chain, cut)
+            kept_ids.update(id(node) for node in chain[cut:])
+        rebuilt: Dict[Tuple[int, int], MessageNode] = {}
+        dropped: List[Tuple[str, Dict]] = []
+        dropped_ids = set()
+        for name, (chain, cut) in chains.items():
+            for node in chain[:cut]:
+                if id(node) not in kept_ids and id(node) not in dropped_ids:
+                    dropped_ids.add(id(node))
+                    dropped.append((name, node.message))
+            parent = None
+            for node in chain[cut:]:
+                key = (id(node), id(parent))
+                if key not in rebuilt:
+                    rebuilt[key] = MessageNode(node.message, parent, node.tokens)
+                parent = rebuilt[key]
+            self.branches[name] = parent
+        self.archived_messages += len(dropped)
+        return dropped
+
+    def switch(self, name: str):
+        if name not in self.branches:
+            raise KeyError(f"Unknown branch: {name}")
+        self.current = name
+
+    def delete_branch(self, name: str):
+        """Drop a branch pointer; shared messages stay alive while another branch uses them"""
+        if name == MAIN_BRANCH:
+            raise ValueError("The main branch cannot be deleted")
+        self.branches.pop(name, None)
+        if self.current == name:
+            self.current = MAIN_BRANCH
+
+    def branch_summary(self) -> List[Dict]:
+        """Name, length and token total of every branch"""
+        return [
+            {
+                "name": name,
+                "messages": head.depth if head else 0,
+                "tokens": head.cumulative_tokens if head else 0,
+                "current": name == self.current,
+            }
+            for name, head in self.branches.items()
+        ]
@@ -0,0 +1,125 @@
+"""
+Adaptive max_tokens budgets per (bot, action)
+
+Every completion's length is appended to a JSONL usage ledger. The planner
+sets the next request's max_tokens from a rolling high percentile of the
+lengths seen for the same bot and action, with headroom, so short follow-ups
+do not reserve 2000 tokens while long documents still fit. Bot catalog
+entries can pin budgets with "max_tokens" or "action_budgets".
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = 2000
+CHAT_ACTION = "chat"           # free-form prompts typed into the chat input
+CONTINUE_ACTION = "continue"   # follow-ups to a truncated answer
+
+Key = Tuple[str, str]
+
+class UsageLedger:
+    """Append-only JSONL log of completion lengths with a rolling in-memory window per key"""
+
+    def __init__(self, path: str, window: int = 200):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        # (output_tokens, max_tokens, truncated) per (bot, action)
+        self._samples: Dict[Key, Deque[Tuple[int, int, bool]]] = defaultdict(lambda: deque(maxlen=window))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                    self._add_sample(record)
+                except (ValueError, KeyError):
+                    # A torn last line after a crash is skipped, not fatal
+                    continue
+
+    def _add_sample(self, record: Dict):
+        self._samples[(record["bot"], record["action"])].append(
+            (int(record["output_tokens"]), int(record.get("max_tokens") or DEFAULT_MAX_TOKENS),
+             record.get("finish_reason") == "length")
+        )
+
+    def record(self, bot: str, action: str, metadata: Dict):
+        """Log one completion from its chat metadata; errors and cancelled generations are ignored"""
+        if metadata.get("error") or metadata.get("cancelled") or "output_tokens" not in metadata:
+            return
+        record = {
+            "ts": time.time(),
+            "bot": bot,
+            "action": action,
+            "model": metadata.get("model"),
+            "provider": metadata.get("provider"),
+            "output_tokens": metadata["output_tokens"],
+            "max_tokens": metadata.get("max_tokens"),
+            "finish_reason": metadata.get("finish_reason"),
+        }
+        with self._lock:
+            self._add_sample(record)
+            try:
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to write usage ledger: {str(e)}")
+
+    def samples(self, bot: str, action: Optional[str] = None):
+        """Recent samples for one action, or for every action of the bot when action is None"""
+        with self._lock:
+            if action is not None:
+                return list(self._samples.get((bot, action), ()))
+            return [sample for (name, _), samples in self._samples.items() if name == bot for sample in samples]
+
+class BudgetPlanner:
+    """max_tokens from the rolling percentile of observed completion lengths"""
+
+    def __init__(self, ledger: UsageLedger, percentile: float = 95, headroom: float = 1.25,
+                 min_tokens: int = 256, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 min_samples: int = 8, round_to: int = 64):
+        self.ledger = ledger
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.min_samples = min_samples
+        self.round_to = round_to
+
+    def budget(self, bot: str, action: str, bot_info: Optional[Dict] = None) -> int:
+        """Output budget for the next request of this bot and action"""
+        bot_info = bot_info or {}
+        pinned = bot_info.get("action_budgets", {}).get(action) or bot_info.get("max_tokens")
+        if pinned:
+            return int(pinned)
+
+        samples = self.ledger.samples(bot, action)
+        if len(samples) < self.min_samples:
+            # Not enough history for this action yet: use the bot's overall history
+            samples = self.ledger.samples(bot)
+        if len(samples) < self.min_samples:
+            return self.max_tokens
+
+        # Truncated answers only tell us the real length was above their budget: count them
+        # as twice that budget so repeated truncation raises the estimate quickly
+        lengths = np.array([max(tokens, limit * 2) if truncated else tokens
+                            for tokens, limit, truncated in samples], dtype=np.float64)
+        estimate = np.percentile(lengths, self.percentile) * self.headroom
+        rounded = int(math.ceil(estimate / self.round_to) * self.round_to)
+        return max(self.min_tokens, min(self.max_tokens, rounded))
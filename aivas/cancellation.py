@@ -0,0 +1,96 @@
+"""
+Cancellation tokens and generation slots for in-flight LLM requests
+
+A CancellationToken travels with one generation. Cancelling it (clear chat,
+bot switch, a newer prompt, a dropped API client) makes the chat manager stop
+reading the stream, close the upstream connection so no further tokens are
+generated, record the partial usage and give its GenerationSlots slot back.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class GenerationCancelled(Exception):
+    """Raised when a generation is cancelled while waiting or streaming"""
+
+class CancellationToken:
+    """Thread-safe cancel flag with optional callbacks"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Cancellation callback failed: {str(e)}")
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Run callback on cancel (immediately if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled(self.reason or "cancelled")
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to timeout; True as soon as the token is cancelled"""
+        return self._event.wait(timeout)
+
+class GenerationSlots:
+    """Caps concurrent upstream generations; waiting callers can be cancelled"""
+
+    def __init__(self, max_concurrent: int = 8):
+        self.max_concurrent = max_concurrent
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+
+    def acquire(self, token: Optional[CancellationToken] = None, timeout: Optional[float] = None,
+                poll_seconds: float = 0.1) -> bool:
+        """Take a slot; raises GenerationCancelled if the token fires first, False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                if token is not None:
+                    token.raise_if_cancelled()
+                wait = poll_seconds if deadline is None else min(poll_seconds, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+                if self._semaphore.acquire(timeout=wait):
+                    with self._lock:
+                        self.active += 1
+                    return True
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
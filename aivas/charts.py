@@ -0,0 +1,276 @@
+"""
+Local chart engine for the "Create Chart" feature
+
+Figures are built with plotly directly from the uploaded dataset: the chart
+type comes from the column kinds in the DatasetProfile, the file is
+re-read in chunks keeping only the plotted columns, and long series are
+downsampled (LTTB or min/max buckets) before they reach the browser. The
+assistant only gets a short numeric summary to narrate.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from aivas.profiler import DatasetProfile, coerce_series, iter_frames
+
+logger = logging.getLogger(__name__)
+
+CHART_KINDS = ["line", "bar", "scatter", "histogram"]
+AGGREGATIONS = ["sum", "mean", "count"]
+
+@dataclass
+class ChartSpec:
+    """What to plot: chart kind, columns and the aggregation for bar charts"""
+    kind: str
+    x: str
+    y: Optional[str] = None
+    agg: str = "sum"
+
+    @property
+    def title(self) -> str:
+        if self.kind == "histogram":
+            return f"Distribution of {self.x}"
+        if self.kind == "bar" and self.y is None:
+            return f"Most frequent {self.x}"
+        if self.kind == "bar":
+            return f"{self.agg.title()} of {self.y} by {self.x}"
+        if self.kind == "line":
+            return f"{self.y} over {self.x}"
+        return f"{self.y} vs {self.x}"
+
+@dataclass
+class ChartResult:
+    """A rendered figure plus the facts the assistant narrates"""
+    spec: ChartSpec
+    figure: go.Figure
+    summary: str
+    source_rows: int
+    plotted_points: int
+    elapsed_ms: float
+
+# ======================================================
+# 📉 DOWNSAMPLING
+# ======================================================
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the visual shape"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Min and max of each of n_out / 2 buckets, so spikes survive downsampling"""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    starts = edges[:-1][edges[:-1] < edges[1:]]
+    # Sort key within buckets: bucket id first, value second; first/last row per bucket = min/max
+    bucket_ids = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    order = np.lexsort((y, bucket_ids))
+    bucket_starts = np.searchsorted(bucket_ids[order], np.arange(len(starts)))
+    bucket_ends = np.append(bucket_starts[1:], n) - 1
+    return np.unique(np.concatenate([order[bucket_starts], order[bucket_ends]]))
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, method: str = "lttb") -> np.ndarray:
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    return lttb_indices(x, y, max_points)
+
+# ======================================================
+# 🧭 CHART TYPE SELECTION
+# ======================================================
+
+def _columns_of_kind(profile: DatasetProfile, *kinds: str) -> List[str]:
+    return [column.name for column in profile.columns if column.kind in kinds and column.count]
+
+def suggest_chart(profile: DatasetProfile, max_categories: int = 20) -> Optional[ChartSpec]:
+    """Pick a chart from column kinds: time series, category breakdown, correlation, distribution"""
+    numeric = _columns_of_kind(profile, "numeric")
+    dates = _columns_of_kind(profile, "datetime")
+    categories = [column.name for column in profile.columns
+                  if column.kind in ("text", "boolean") and column.count and not column.distinct_capped
+                  and column.distinct is not None and 1 < column.distinct <= max_categories]
+    if dates and numeric:
+        return ChartSpec("line", dates[0], numeric[0])
+    if categories and numeric:
+        return ChartSpec("bar", categories[0], numeric[0], "sum")
+    if profile.correlations:
+        x, y, _ = profile.correlations[0]
+        return ChartSpec("scatter", x, y)
+    if numeric:
+        return ChartSpec("histogram", numeric[0])
+    if categories:
+        return ChartSpec("bar", categories[0])
+    return None
+
+def validate_spec(profile: DatasetProfile, spec: ChartSpec) -> Optional[str]:
+    """Error message when the columns do not fit the chart kind, else None"""
+    x_column = profile.column(spec.x)
+    y_column = profile.column(spec.y) if spec.y else None
+    if x_column is None or (spec.y and y_column is None):
+        return "Unknown column"
+    if spec.kind == "histogram" and x_column.kind != "numeric":
+        return f"A histogram needs a numeric column, {spec.x} is {x_column.kind}"
+    if spec.kind in ("line", "scatter"):
+        if y_column is None or y_column.kind != "numeric":
+            return f"A {spec.kind} chart needs a numeric Y column"
+        if x_column.kind not in ("numeric", "datetime"):
+            return f"A {spec.kind} chart needs a numeric or date X column, {spec.x} is {x_column.kind}"
+    if spec.kind == "bar" and y_column is not None and y_column.kind != "numeric" and spec.agg != "count":
+        return f"{spec.agg.title()} needs a numeric Y column"
+    return None
+
+# ======================================================
+# 📊 FIGURE BUILDERS
+# ======================================================
+
+def _read_columns(name: str, data: bytes, profile: DatasetProfile, columns: List[str],
+                  chunk_rows: int) -> Tuple[Dict[str, np.ndarray], int]:
+    """Stream the file once keeping only the plotted columns, coerced to their profiled kind"""
+    parts: Dict[str, List[np.ndarray]] = {column: [] for column in columns}
+    rows = 0
+    for frame in iter_frames(name, data, chunk_rows):
+        frame.columns = [str(column) for column in frame.columns]
+        rows += len(frame)
+        for column in columns:
+            parts[column].append(coerce_series(frame[column], profile.column(column).kind).to_numpy())
+    return {column: np.concatenate(chunks) if chunks else np.array([]) for column, chunks in parts.items()}, rows
+
+def _xy_arrays(x_raw: np.ndarray, y_raw: np.ndarray, x_kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Drop rows with a missing x or y and return float arrays (datetimes as int64 ns)"""
+    if x_kind == "datetime":
+        x = pd.DatetimeIndex(pd.to_datetime(x_raw)).as_unit("ns").asi8.astype(np.float64)
+        x[pd.isna(x_raw)] = np.nan
+    else:
+        x = np.asarray(x_raw, dtype=np.float64)
+    y = np.asarray(y_raw, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    return x[keep], y[keep]
+
+def _line_chart(spec: ChartSpec, profile: DatasetProfile, columns: Dict[str, np.ndarray],
+                max_points: int, method: str) -> Tuple[go.Figure, str, int]:
+    x_kind = profile.column(spec.x).kind
+    x, y = _xy_arrays(columns[spec.x], columns[spec.y], x_kind)
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+    keep = downsample(x, y, max_points, method)
+    x_plot = pd.to_datetime(x[keep].astype(np.int64)) if x_kind == "datetime" else x[keep]
+    figure = go.Figure(go.Scattergl(x=x_plot, y=y[keep], mode="lines", name=spec.y))
+
+    summary = f"{len(x):,} points"
+    if len(keep) < len(x):
+        summary += f" downsampled to {len(keep):,} with {'min/max buckets' if method == 'minmax' else 'LTTB'}"
+    if len(y):
+        label = (lambda value: str(pd.Timestamp(int(value)))) if x_kind == "datetime" else (lambda value: f"{value:,.4g}")
+        peak, low = int(np.argmax(y)), int(np.argmin(y))
+        summary += (f". {spec.y} starts at {y[0]:,.4g} ({label(x[0])}) and ends at {y[-1]:,.4g} ({label(x[-1])}); "
+                    f"max {y[peak]:,.4g} at {label(x[peak])}, min {y[low]:,.4g} at {label(x[low])}")
+    return figure, summary, len(keep)
+
+def _scatter_chart(spec: ChartSpec, profile: DatasetProfile, columns: Dict[str, np.ndarray],
+                   max_points: int) -> Tuple[go.Figure, str, int]:
+    x, y = _xy_arrays(columns[spec.x], columns[spec.y], profile.column(spec.x).kind)
+    keep = np.arange(len(x))
+    if len(x) > max_points:
+        # A uniform sample keeps the density pattern of a scatter
+        keep = np.sort(np.random.default_rng(0).choice(len(x), max_points, replace=False))
+    figure = go.Figure(go.Scattergl(x=x[keep], y=y[keep], mode="markers", marker={"size": 4, "opacity": 0.6}))
+    summary = f"{len(x):,} points, {len(keep):,} plotted"
+    if len(x) > 2:
+        r = np.corrcoef(x, y)[0, 1]
+        slope, intercept = np.polyfit(x, y, 1)
+        summary += f"; Pearson r = {r:+.2f}, least-squares fit {spec.y} = {slope:,.4g} * {spec.x} + {intercept:,.4g}"
+    return figure, summary, len(keep)
+
+def _histogram_chart(spec: ChartSpec, columns: Dict[str, np.ndarray], bins: int) -> Tuple[go.Figure, str, int]:
+    values = np.asarray(columns[spec.x], dtype=np.float64)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=bins) if len(values) else (np.zeros(0), np.zeros(1))
+    centers = (edges[:-1] + edges[1:]) / 2
+    figure = go.Figure(go.Bar(x=centers, y=counts, width=np.diff(edges)))
+    summary = f"{len(values):,} values in {len(counts)} bins"
+    if len(counts):
+        mode = int(np.argmax(counts))
+        summary += (f" from {edges[0]:,.4g} to {edges[-1]:,.4g}; most common range "
+                    f"{edges[mode]:,.4g}-{edges[mode + 1]:,.4g} ({int(counts[mode]):,} values), "
+                    f"median {np.median(values):,.4g}")
+    return figure, summary, len(counts)
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return f"{int(value):,}" if value.is_integer() and abs(value) < 1e15 else f"{value:,.4g}"
+
+def _bar_chart(spec: ChartSpec, profile: DatasetProfile, columns: Dict[str, np.ndarray],
+               max_categories: int) -> Tuple[go.Figure, str, int]:
+    keys = pd.Series(columns[spec.x]).astype("string")
+    if spec.y is None or spec.agg == "count":
+        totals = keys.value_counts()
+        label = "count"
+    else:
+        values = pd.Series(np.asarray(columns[spec.y], dtype=np.float64))
+        totals = values.groupby(keys).agg(spec.agg).sort_values(ascending=False)
+        label = f"{spec.agg} of {spec.y}"
+    other = totals.iloc[max_categories:]
+    totals = totals.iloc[:max_categories]
+    figure = go.Figure(go.Bar(x=totals.index.tolist(), y=totals.to_numpy()))
+
+    summary = f"{label} for the top {len(totals)} of {len(totals) + len(other)} {spec.x} values"
+    if len(totals):
+        grand_total = float(totals.sum() + other.sum())
+        leaders = ", ".join(f"{key} {_format_value(value)}" for key, value in totals.head(5).items())
+        summary += f": {leaders}"
+        if spec.agg != "mean" and grand_total:
+            summary += f"; the top one is {totals.iloc[0] / grand_total:.0%} of the total"
+    return figure, summary, len(totals)
+
+def build_chart(name: str, data: bytes, profile: DatasetProfile, spec: ChartSpec,
+                max_points: int = 2000, downsampling: str = "lttb", max_categories: int = 20,
+                histogram_bins: int = 30, chunk_rows: int = 50000) -> ChartResult:
+    """Build a plotly figure for spec from the full file"""
+    error = validate_spec(profile, spec)
+    if error:
+        raise ValueError(error)
+    started = time.perf_counter()
+    columns, rows = _read_columns(name, data, profile, [c for c in (spec.x, spec.y) if c], chunk_rows)
+
+    if spec.kind == "line":
+        figure, summary, points = _line_chart(spec, profile, columns, max_points, downsampling)
+    elif spec.kind == "scatter":
+        figure, summary, points = _scatter_chart(spec, profile, columns, max_points)
+    elif spec.kind == "histogram":
+        figure, summary, points = _histogram_chart(spec, columns, histogram_bins)
+    else:
+        figure, summary, points = _bar_chart(spec, profile, columns, max_categories)
+
+    figure.update_layout(title=spec.title, xaxis_title=spec.x, yaxis_title=spec.y or "count",
+                         template="plotly_white", margin={"l": 40, "r": 20, "t": 50, "b": 40})
+    return ChartResult(
+        spec=spec,
+        figure=figure,
+        summary=f"{spec.kind.title()} chart '{spec.title}' from {profile.name} ({rows:,} rows): {summary}.",
+        source_rows=rows,
+        plotted_points=points,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
@@ -0,0 +1,352 @@
+"""
+Token accounting and chat management for the AIVAs business assistants
+"""
+
+import tiktoken
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple, Optional
+import logging
+import threading
+
+from aivas.cancellation import CancellationToken, GenerationCancelled, GenerationSlots
+from aivas.keypool import ApiKeyPool
+from aivas.providers import ChatResult, LLMProvider, OpenAIProvider, StubProvider, default_provider_name
+from aivas.singleflight import SHARED_SINGLEFLIGHT, SingleFlight, request_key
+
+logger = logging.getLogger(__name__)
+
+# ======================================================
+# 💰 TOKEN MANAGEMENT & COST CALCULATION
+# ======================================================
+
+OPENAI_PRICING = {
+    "gpt-4": {"input": 0.03, "output": 0.06},
+    "gpt-4-turbo": {"input": 0.01, "output": 0.03},
+    "gpt-3.5-turbo": {"input": 0.0015, "output": 0.002},
+    "dall-e-3": {"1024x1024": 0.040, "1024x1792": 0.080, "1792x1024": 0.080},
+    "dall-e-2": {"1024x1024": 0.020, "512x512": 0.018, "256x256": 0.016}
+}
+
+# Encodings per model, shared by every TokenManager in the process. A failed load
+# (e.g. no network to fetch the BPE file) is cached as None so it is not retried per session.
+_ENCODING_CACHE: Dict[str, Optional[object]] = {}
+# Held while loading, so concurrent sessions wait for one load instead of all fetching
+_ENCODING_LOCK = threading.Lock()
+
+class TokenManager:
+    def __init__(self, model="gpt-4-turbo"):
+        self.model = model
+        self.encoding = None
+        self.initialize_encoding()
+    
+    def initialize_encoding(self):
+        """Initialize token encoding with error handling"""
+        with _ENCODING_LOCK:
+            if self.model not in _ENCODING_CACHE:
+                _ENCODING_CACHE[self.model] = self._load_encoding()
+            self.encoding = _ENCODING_CACHE[self.model]
+    
+    def _load_encoding(self):
+        try:
+            return tiktoken.encoding_for_model(self.model)
+        except KeyError:
+            try:
+                encoding = tiktoken.get_encoding("cl100k_base")
+                logger.warning(f"Model {self.model} not found, using cl100k_base encoding")
+                return encoding
+            except Exception as e:
+                logger.error(f"Failed to initialize encoding: {str(e)}")
+                return None
+        except Exception as e:
+            logger.error(f"Failed to load encoding, falling back to estimates: {str(e)}")
+            return None
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in text with error handling"""
+        if not self.encoding:
+            return max(1, len(text) // 4)
+        
+        try:
+            return len(self.encoding.encode(str(text)))
+        except Exception as e:
+            logger.error(f"Token counting error: {str(e)}")
+            return max(1, len(text) // 4)
+    
+    def calculate_cost(self, input_tokens: int, output_tokens: int, model: str) -> float:
+        """Calculate cost based on token usage"""
+        if model not in OPENAI_PRICING:
+            return 0.0
+        
+        pricing = OPENAI_PRICING[model]
+        input_cost = (input_tokens / 1000) * pricing["input"]
+        output_cost = (output_tokens / 1000) * pricing["output"]
+        
+        return input_cost + output_cost
+
+# ======================================================
+# 🎯 ENHANCED CHAT MANAGER
+# ======================================================
+
+class EnhancedChatManager:
+    def __init__(self, providers: Optional[Dict[str, LLMProvider]] = None,
+                 default_provider: Optional[str] = None,
+                 singleflight: Optional[SingleFlight] = SHARED_SINGLEFLIGHT,
+                 slots: Optional[GenerationSlots] = None):
+        self.client = None
+        self.api_key = None
+        self.providers: Dict[str, LLMProvider] = dict(providers or {"stub": StubProvider()})
+        self.default_provider = default_provider_name(self.providers, default_provider)
+        self.token_manager = TokenManager()
+        self.singleflight = singleflight   # None disables deduplication
+        self.slots = slots                 # None: no cap on concurrent generations
+        self.conversation_history = []
+        self.session_stats = {
+            "total_tokens": 0,
+            "total_cost": 0.0,
+            "messages_count": 0,
+            "session_start": datetime.now()
+        }
+    
+    def initialize_client(self, api_key: str, base_url: Optional[str] = None,
+                          key_pool: Optional[ApiKeyPool] = None):
+        """Register the OpenAI backend, optionally against an OpenAI-compatible base URL or a shared key pool"""
+        try:
+            if key_pool is not None or (api_key and api_key != "demo_key"):
+                provider = OpenAIProvider(api_key, base_url, key_pool=key_pool)
+                self.providers["openai"] = provider
+                self.client = provider.client
+                self.api_key = api_key
+                self.default_provider = "openai"
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI client: {str(e)}")
+            return False
+    
+    def get_provider(self, name: Optional[str] = None) -> LLMProvider:
+        """Named backend, falling back to the default one when it is not configured"""
+        if name and name not in self.providers:
+            logger.warning(f"Provider {name} not configured, using {self.default_provider}")
+        return self.providers.get(name or self.default_provider) or self.providers[self.default_provider]
+    
+    def count_message_tokens(self, messages: List[Dict]) -> int:
+        """Estimate prompt tokens for a message list"""
+        return self.token_manager.count_tokens("\n".join([str(msg["content"]) for msg in messages]))
+    
+    def _record_usage(self, provider: LLMProvider, model: str, temperature: float,
+                      input_tokens: int, output_tokens: int, finish_reason: str,
+                      group_size: int = 1, max_tokens: Optional[int] = None) -> Dict:
+        """Update session stats and build the per-message metadata; shared requests split the cost"""
+        cost = self.token_manager.calculate_cost(input_tokens, output_tokens, model) if provider.billable else 0.0
+        cost /= group_size
+        total_tokens = input_tokens + output_tokens
+        
+        self.session_stats["total_tokens"] += total_tokens
+        self.session_stats["total_cost"] += cost
+        self.session_stats["messages_count"] += 1
+        
+        return {
+            "model": model,
+            "provider": provider.name,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "cost": cost,
+            "temperature": temperature,
+            "finish_reason": finish_reason,
+            "max_tokens": max_tokens,
+            "timestamp": datetime.now().isoformat(),
+            "offline": provider.offline
+        }
+    
+    def _acquire_slot(self, token: Optional[CancellationToken]):
+        if self.slots is not None:
+            self.slots.acquire(token)
+    
+    def _release_slot(self):
+        if self.slots is not None:
+            self.slots.release()
+    
+    def _record_cancelled(self, backend: LLMProvider, model: str, temperature: float,
+                          messages: List[Dict], content: str, started: bool,
+                          max_tokens: Optional[int] = None) -> Dict:
+        """Usage of a generation stopped early: prompt plus the tokens received so far"""
+        if not started:
+            return {"cancelled": True, "model": model, "provider": backend.name, "total_tokens": 0, "cost": 0.0}
+        metadata = self._record_usage(backend, model, temperature, self.count_message_tokens(messages),
+                                      self.token_manager.count_tokens(content) if content else 0, "cancelled",
+                                      max_tokens=max_tokens)
+        metadata["cancelled"] = True
+        return metadata
+    
+    def generate_response(self, messages: List[Dict], model: str = "gpt-4-turbo", temperature: float = 0.7,
+                          provider: Optional[str] = None,
+                          cancel_token: Optional[CancellationToken] = None,
+                          max_tokens: int = 2000) -> Tuple[str, Dict]:
+        """Generate response with enhanced error handling
+
+        The reply is read as a stream under the hood, so cancelling the token stops
+        it mid-generation and closes the upstream request (partial usage is recorded).
+        """
+        backend = None
+        partial: Optional[str] = None   # set when this caller's own upstream request was cancelled
+        try:
+            backend = self.get_provider(provider)
+            
+            def call(token: Optional[CancellationToken]) -> ChatResult:
+                nonlocal partial
+                self._acquire_slot(token)
+                parts: List[str] = []
+                result = ChatResult("")
+                chunks = backend.stream_chat(messages, model, temperature, max_tokens=max_tokens)
+                try:
+                    for chunk in chunks:
+                        if token is not None and token.cancelled:
+                            partial = "".join(parts)
+                            token.raise_if_cancelled()
+                        parts.append(chunk.text)
+                        if chunk.finish_reason:
+                            result.finish_reason = chunk.finish_reason
+                        if chunk.input_tokens is not None:
+                            result.input_tokens, result.output_tokens = chunk.input_tokens, chunk.output_tokens
+                finally:
+                    # Closes the upstream HTTP stream so the provider stops generating
+                    chunks.close()
+                    self._release_slot()
+                result.content = "".join(parts)
+                return result
+            
+            shared, group_size = False, 1
+            if self.singleflight is not None:
+                # Identical concurrent requests (e.g. the same quick action) go upstream once;
+                # the shared request runs under the flight's token, not this caller's
+                key = request_key(backend.name, model, temperature, max_tokens, messages)
+                result, shared, group_size = self.singleflight.do(key, call, cancel_token)
+            else:
+                result = call(cancel_token)
+            
+            input_tokens = result.input_tokens if result.input_tokens is not None else self.count_message_tokens(messages)
+            output_tokens = result.output_tokens if result.output_tokens is not None else self.token_manager.count_tokens(result.content)
+            metadata = self._record_usage(backend, model, temperature, input_tokens, output_tokens,
+                                          result.finish_reason, group_size, max_tokens)
+            if group_size > 1:
+                metadata["singleflight"] = {"shared": shared, "group_size": group_size}
+            
+            return result.content, metadata
+            
+        except GenerationCancelled as e:
+            if partial is not None:
+                metadata = self._record_cancelled(backend, model, temperature, messages, partial, True, max_tokens)
+                return "", {**metadata, "error": True, "message": str(e)}
+            return "", {"error": True, "cancelled": True, "message": str(e)}
+        except Exception as e:
+            logger.error(f"Chat generation error: {str(e)}")
+            error_message = f"I apologize, but I encountered an error: {str(e)}"
+            return error_message, {"error": True, "message": str(e)}
+    
+    def stream_response(self, messages: List[Dict], model: str = "gpt-4-turbo", temperature: float = 0.7,
+                        provider: Optional[str] = None,
+                        cancel_token: Optional[CancellationToken] = None,
+                        max_tokens: int = 2000) -> Iterator[Dict]:
+        """Stream a response as {"delta": text} events followed by one {"done": True, "content", "metadata"} event
+
+        While waiting for a generation slot, {"queued": True, "waiting": n} events are yielded.
+        Cancelling the token, or closing this generator early, stops reading, closes the upstream
+        stream and records the partial usage with metadata["cancelled"] = True.
+        """
+        token = cancel_token or CancellationToken()
+        parts: List[str] = []
+        backend = None
+        chunks = None
+        slot_held = False
+        finished = False
+        try:
+            backend = self.get_provider(provider)
+            if self.slots is not None:
+                while not self.slots.acquire(token, timeout=0.5):
+                    yield {"queued": True, "waiting": self.slots.waiting}
+                slot_held = True
+            input_tokens = output_tokens = None
+            finish_reason = "stop"
+            
+            chunks = backend.stream_chat(messages, model, temperature, max_tokens=max_tokens)
+            for chunk in chunks:
+                token.raise_if_cancelled()
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield {"delta": chunk.text}
+                if chunk.finish_reason:
+                    finish_reason = chunk.finish_reason
+                if chunk.input_tokens is not None:
+                    input_tokens, output_tokens = chunk.input_tokens, chunk.output_tokens
+            
+            content = "".join(parts)
+            if input_tokens is None:
+                input_tokens = self.count_message_tokens(messages)
+            if output_tokens is None:
+                output_tokens = self.token_manager.count_tokens(content)
+            metadata = self._record_usage(backend, model, temperature, input_tokens, output_tokens,
+                                          finish_reason, max_tokens=max_tokens)
+            finished = True
+            yield {"done": True, "content": content, "metadata": metadata}
+            
+        except GenerationCancelled:
+            finished = True
+            content = "".join(parts)
+            metadata = self._record_cancelled(backend, model, temperature, messages, content,
+                                                   chunks is not None, max_tokens)
+            yield {"done": True, "content": content, "metadata": metadata}
+        except GeneratorExit:
+            # The consumer stopped reading (Streamlit rerun, closed HTTP client): same as a cancel
+            if not finished and backend is not None:
+                token.cancel("consumer stopped reading")
+                self._record_cancelled(backend, model, temperature, messages, "".join(parts),
+                                       chunks is not None, max_tokens)
+            raise
+        except Exception as e:
+            if token.cancelled and backend is not None:
+                finished = True
+                content = "".join(parts)
+                metadata = self._record_cancelled(backend, model, temperature, messages, content,
+                                                       chunks is not None, max_tokens)
+                yield {"done": True, "content": content, "metadata": metadata}
+                return
+            logger.error(f"Chat streaming error: {str(e)}")
+            error_message = f"I apologize, but I encountered an error: {str(e)}"
+            yield {"done": True, "content": error_message, "metadata": {"error": True, "message": str(e)}}
+        finally:
+            if chunks is not None:
+                # Closes the upstream HTTP stream so the provider stops generating
+                chunks.close()
+            if slot_held:
+                self.slots.release()
+    
+    def embed(self, texts: List[str], provider: Optional[str] = None) -> List[List[float]]:
+        """Embed texts with the chosen backend"""
+        return self.get_provider(provider).embed(texts)
+    
+    def generate_image(self, prompt: str, model: str = "dall-e-3", size: str = "1024x1024",
+                       provider: Optional[str] = None) -> Tuple[str, Dict]:
+        """Generate image with the chosen backend"""
+        try:
+            backend = self.get_provider(provider)
+            image_url = backend.generate_image(prompt, model, size)
+            cost = OPENAI_PRICING.get(model, {}).get(size, 0.0) if backend.billable else 0.0
+            
+            # Update session stats
+            self.session_stats["total_cost"] += cost
+            
+            metadata = {
+                "model": model,
+                "provider": backend.name,
+                "size": size,
+                "cost": cost,
+                "timestamp": datetime.now().isoformat(),
+                "offline": backend.offline
+            }
+            
+            return image_url, metadata
+            
+        except Exception as e:
+            logger.error(f"Image generation error: {str(e)}")
+            return None, {"error": True, "message": str(e)}
@@ -0,0 +1,268 @@
+"""
+Streaming document ingestion for the AIVAs format specialist bots
+
+Files are read page by page / sheet by sheet through generators, split into
+token-budgeted chunks with TokenManager, and only the chunks relevant to the
+current question are put into the prompt.
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Segment = Tuple[str, str]  # (location label, text)
+
+@dataclass
+class DocumentChunk:
+    """A token-budgeted piece of an uploaded document"""
+    chunk_id: str
+    doc_id: str
+    source: str
+    location: str
+    text: str
+    tokens: int
+
+def document_id(data: bytes) -> str:
+    """Stable id for an upload, so re-uploads are not processed twice"""
+    return hashlib.sha1(data).hexdigest()[:12]
+
+# ======================================================
+# 📄 EXTRACTORS (generators, one segment at a time)
+# ======================================================
+
+def iter_pdf_pages(data: bytes) -> Iterator[Segment]:
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    for idx, page in enumerate(reader.pages):
+        text = page.extract_text() or ""
+        if text.strip():
+            yield f"page {idx + 1}", text
+
+def iter_docx_blocks(data: bytes, paragraphs_per_block: int = 25) -> Iterator[Segment]:
+    import docx
+
+    document = docx.Document(io.BytesIO(data))
+    block, start = [], 1
+    for idx, paragraph in enumerate(document.paragraphs, start=1):
+        if paragraph.text.strip():
+            block.append(paragraph.text)
+        if len(block) >= paragraphs_per_block:
+            yield f"paragraphs {start}-{idx}", "\n".join(block)
+            block, start = [], idx + 1
+    if block:
+        yield f"paragraphs {start}-{len(document.paragraphs)}", "\n".join(block)
+
+    for t_idx, table in enumerate(document.tables, start=1):
+        rows = ["\t".join(cell.text.strip() for cell in row.cells) for row in table.rows]
+        if rows:
+            yield f"table {t_idx}", "\n".join(rows)
+
+def _row_blocks(rows, label: str, rows_per_block: int) -> Iterator[Segment]:
+    block, start, count = [], 1, 0
+    for count, row in enumerate(rows, start=1):
+        cells = ["" if value is None else str(value) for value in row]
+        if any(cells):
+            block.append("\t".join(cells))
+        if len(block) >= rows_per_block:
+            yield f"{label} rows {start}-{count}", "\n".join(block)
+            block, start = [], count + 1
+    if block:
+        yield f"{label} rows {start}-{count}", "\n".join(block)
+
+def iter_xlsx_sheets(data: bytes, rows_per_block: int = 200) -> Iterator[Segment]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _row_blocks(sheet.iter_rows(values_only=True), f"sheet {sheet.title}", rows_per_block)
+    finally:
+        workbook.close()
+
+def iter_csv_rows(data: bytes, rows_per_block: int = 200) -> Iterator[Segment]:
+    reader = csv.reader(io.StringIO(data.decode("utf-8", errors="replace")))
+    yield from _row_blocks(reader, "csv", rows_per_block)
+
+def iter_text_sections(data: bytes, lines_per_block: int = 80) -> Iterator[Segment]:
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    for start in range(0, len(lines), lines_per_block):
+        text = "\n".join(lines[start:start + lines_per_block])
+        if text.strip():
+            yield f"lines {start + 1}-{min(start + lines_per_block, len(lines))}", text
+
+def iter_image_details(data: bytes) -> Iterator[Segment]:
+    """Images carry no text layer; describe format, size and EXIF so the bot can reason about them"""
+    from PIL import Image, ExifTags
+
+    with Image.open(io.BytesIO(data)) as image:
+        details = [
+            f"Format: {image.format}",
+            f"Dimensions: {image.width}x{image.height} px",
+            f"Color mode: {image.mode}",
+            f"File size: {len(data) / 1024:.1f} KB",
+        ]
+        if image.info.get("dpi"):
+            details.append(f"DPI: {image.info['dpi']}")
+        exif = image.getexif()
+        for tag_id, value in list(exif.items())[:30]:
+            details.append(f"EXIF {ExifTags.TAGS.get(tag_id, tag_id)}: {str(value)[:80]}")
+    yield "image properties", "\n".join(details)
+
+EXTRACTORS = {
+    ".pdf": iter_pdf_pages,
+    ".docx": iter_docx_blocks,
+    ".xlsx": iter_xlsx_sheets,
+    ".xlsm": iter_xlsx_sheets,
+    ".csv": iter_csv_rows,
+    ".txt": iter_text_sections,
+    ".md": iter_text_sections,
+    ".json": iter_text_sections,
+    ".png": iter_image_details,
+    ".jpg": iter_image_details,
+    ".jpeg": iter_image_details,
+    ".webp": iter_image_details,
+}
+
+SUPPORTED_EXTENSIONS = sorted(ext.lstrip(".") for ext in EXTRACTORS)
+
+def iter_segments(name: str, data: bytes) -> Iterator[Segment]:
+    """Pick the extractor from the file extension"""
+    extension = os.path.splitext(name.lower())[1]
+    extractor = EXTRACTORS.get(extension)
+    if extractor is None:
+        raise ValueError(f"Unsupported file type: {extension or name}")
+    return extractor(data)
+
+def extract_segments(name: str, data: bytes) -> List[Segment]:
+    """Run one extractor to completion (used as the process pool task)"""
+    return list(iter_segments(name, data))
+
+# ======================================================
+# ✂️ CHUNKING
+# ======================================================
+
+def _split_oversized(text: str, token_manager, max_tokens: int) -> Iterator[str]:
+    """Split a single paragraph that does not fit the budget on word boundaries"""
+    words = text.split()
+    # ~0.75 words per token keeps pieces under budget without counting every word
+    step = max(1, int(max_tokens * 0.75))
+    for start in range(0, len(words), step):
+        piece = " ".join(words[start:start + step])
+        while token_manager.count_tokens(piece) > max_tokens and step > 1:
+            step = max(1, step // 2)
+            piece = " ".join(words[start:start + step])
+        yield piece
+
+def chunk_segments(doc_id: str, source: str, segments, token_manager,
+                   max_tokens: int = 400, overlap_tokens: int = 40) -> Iterator[DocumentChunk]:
+    """Pack paragraphs of each segment into chunks of at most max_tokens"""
+    index = 0
+    for location, text in segments:
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n|\n", text) if p.strip()]
+        current: List[str] = []
+        current_tokens = 0
+
+        def emit():
+            nonlocal index
+            chunk_text = "\n".join(current)
+            chunk = DocumentChunk(
+                chunk_id=f"{doc_id}:{index}",
+                doc_id=doc_id,
+                source=source,
+                location=location,
+                text=chunk_text,
+                tokens=token_manager.count_tokens(chunk_text),
+            )
+            index += 1
+            return chunk
+
+        for paragraph in paragraphs:
+            tokens = token_manager.count_tokens(paragraph)
+            pieces = [paragraph] if tokens <= max_tokens else list(_split_oversized(paragraph, token_manager, max_tokens))
+            for piece in pieces:
+                # +1 for the newline joining pieces, so the packed chunk stays within budget
+                piece_tokens = (tokens if len(pieces) == 1 else token_manager.count_tokens(piece)) + 1
+                if current and current_tokens + piece_tokens > max_tokens:
+                    yield emit()
+                    # Carry the tail of the previous chunk for continuity
+                    tail_tokens = token_manager.count_tokens(current[-1]) if overlap_tokens else 0
+                    if overlap_tokens and tail_tokens <= overlap_tokens and tail_tokens + piece_tokens <= max_tokens:
+                        current, current_tokens = [current[-1]], tail_tokens
+                    else:
+                        current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += piece_tokens
+        if current:
+            yield emit()
+
+def ingest_files(files: List[Tuple[str, bytes]], token_manager, chunk_tokens: int = 400,
+                 overlap_tokens: int = 40, max_workers: int = 4) -> Tuple[List[DocumentChunk], Dict[str, str]]:
+    """Extract several files in a process pool, then chunk in the caller; returns chunks and per-file errors"""
+    chunks: List[DocumentChunk] = []
+    errors: Dict[str, str] = {}
+    if not files:
+        return chunks, errors
+
+    if len(files) == 1 or max_workers <= 1:
+        results = []
+        for name, data in files:
+            try:
+                results.append(extract_segments(name, data))
+            except Exception as e:
+                results.append(e)
+    else:
+        # spawn: the Streamlit server is multi-threaded, so forking it is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(files)), mp_context=context) as pool:
+            futures = [pool.submit(extract_segments, name, data) for name, data in files]
+            results = []
+            for (name, data), future in zip(files, futures):
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool:
+                    # Worker start-up failed (e.g. restricted environment); extract here instead
+                    logger.warning(f"Process pool unavailable, extracting {name} in-process")
+                    try:
+                        results.append(extract_segments(name, data))
+                    except Exception as e:
+                        results.append(e)
+                except Exception as e:
+                    results.append(e)
+
+    for (name, data), result in zip(files, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to extract {name}: {str(result)}")
+            errors[name] = str(result)
+            continue
+        chunks.extend(chunk_segments(document_id(data), name, result, token_manager,
+                                     chunk_tokens, overlap_tokens))
+    return chunks, errors
+
+# ======================================================
+# 🎯 RELEVANT CONTEXT
+# ======================================================
+
+STOPWORDS = frozenset("""a an and are as at be by for from has have how i in is it its me my of on or
+our please that the this to was we what when where which who why will with you your""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS and len(word) > 1]
+
+def format_context(chunks: List[DocumentChunk]) -> Optional[str]:
+    """Render selected chunks as a reference block for the system prompt"""
+    if not chunks:
+        return None
+    sections = [f"[{chunk.source} - {chunk.location}]\n{chunk.text}" for chunk in chunks]
+    return ("Reference material from the user's uploaded documents. Use it when relevant "
+            "and cite the source in brackets.\n\n" + "\n\n".join(sections))
@@ -0,0 +1,221 @@
+"""
+Pool of OpenAI API keys with per-key rate limits and health
+
+Each key (or organization) gets its own request and token buckets sized to
+its RPM/TPM limits. Requests lease the least-loaded healthy key that has
+capacity; a key answering 429 or 5xx cools down for its Retry-After (or an
+exponential backoff) while traffic moves to the other keys.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+from openai import APIConnectionError, OpenAI
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class KeyPoolExhausted(Exception):
+    """Raised when no key can take a request before the acquire timeout"""
+
+class TokenBucket:
+    """Classic token bucket: capacity tokens, refilled continuously at rate per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_consume(self, amount: float = 1.0) -> bool:
+        # Requests larger than the bucket are allowed once it is full, or they could never run
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= min(amount, self.capacity):
+                self.tokens -= amount
+                return True
+            return False
+
+    def refund(self, amount: float = 1.0):
+        """Give back tokens consumed for work that did not go ahead"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def time_until(self, amount: float = 1.0) -> float:
+        """Seconds until amount can be consumed"""
+        with self._lock:
+            self._refill(time.monotonic())
+            missing = min(amount, self.capacity) - self.tokens
+            return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+    def fill_ratio(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, self.tokens) / self.capacity
+
+@dataclass(eq=False)
+class ApiKeyState:
+    """One key's client, limits and health"""
+    label: str
+    client: OpenAI
+    requests: Optional[TokenBucket] = None   # RPM limit
+    tokens: Optional[TokenBucket] = None     # TPM limit
+    in_flight: int = 0
+    cooldown_until: float = 0.0
+    failures: int = 0
+    stats: Dict[str, int] = field(default_factory=lambda: {"requests": 0, "errors": 0, "cooldowns": 0})
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def has_capacity(self, tokens: int) -> bool:
+        return ((self.requests is None or self.requests.time_until(1) == 0)
+                and (self.tokens is None or self.tokens.time_until(tokens) == 0))
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        waits = [max(0.0, self.cooldown_until - now)]
+        if self.requests is not None:
+            waits.append(self.requests.time_until(1))
+        if self.tokens is not None:
+            waits.append(self.tokens.time_until(tokens))
+        return max(waits)
+
+    def load(self) -> float:
+        """Lower is better: requests in flight, then how drained the buckets are"""
+        buckets = [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+        return self.in_flight + (max(1 - bucket.fill_ratio() for bucket in buckets) if buckets else 0.0)
+
+def error_status(error: Exception) -> Tuple[Optional[int], Optional[float]]:
+    """HTTP status and Retry-After seconds of an SDK error; connection failures count as 503"""
+    status = getattr(error, "status_code", None)
+    if status is None and isinstance(error, APIConnectionError):
+        status = 503
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = None
+    try:
+        if headers.get("retry-after-ms"):
+            retry_after = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after"):
+            retry_after = float(headers["retry-after"])
+    except ValueError:
+        # HTTP-date form: fall back to the pool's backoff
+        retry_after = None
+    return status, retry_after
+
+def parse_api_keys(value: Union[None, str, List]) -> List[Dict]:
+    """Key entries from a secret: "sk-a,sk-b", ["sk-a", ...] or [{"api_key", "organization", "rpm", "tpm"}]"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = [part.strip() for part in value.replace("\n", ",").split(",")]
+    entries = []
+    for item in value:
+        entry = {"api_key": item} if isinstance(item, str) else dict(item)
+        if entry.get("api_key"):
+            entries.append(entry)
+    return entries
+
+class ApiKeyPool:
+    """Leases the least-loaded healthy key; see release() for health updates"""
+
+    def __init__(self, keys: List[Dict], base_url: Optional[str] = None, rpm: Optional[int] = None,
+                 tpm: Optional[int] = None, cooldown_s: float = 10.0, max_cooldown_s: float = 300.0,
+                 acquire_timeout_s: float = 30.0):
+        if not keys:
+            raise ValueError("ApiKeyPool needs at least one API key")
+        self.cooldown_s = cooldown_s
+        self.max_cooldown_s = max_cooldown_s
+        self.acquire_timeout_s = acquire_timeout_s
+        self._lock = threading.Lock()
+        self.keys: List[ApiKeyState] = []
+        for entry in keys:
+            key_rpm = entry.get("rpm", rpm)
+            key_tpm = entry.get("tpm", tpm)
+            # With several keys, failover is ours: the SDK must not retry the same key
+            client = OpenAI(api_key=entry["api_key"], organization=entry.get("organization"),
+                            base_url=entry.get("base_url", base_url),
+                            **({"max_retries": 0} if len(keys) > 1 else {}))
+            self.keys.append(ApiKeyState(
+                label=entry.get("label") or f"…{entry['api_key'][-4:]}",
+                client=client,
+                requests=TokenBucket(key_rpm / 60, key_rpm) if key_rpm else None,
+                tokens=TokenBucket(key_tpm / 60, key_tpm) if key_tpm else None,
+            ))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def acquire(self, tokens: int = 1, exclude: Optional[List[ApiKeyState]] = None,
+                timeout: Optional[float] = None) -> ApiKeyState:
+        """Lease a key for a request of about `tokens` tokens (prompt plus max_tokens); call release() after"""
+        deadline = time.monotonic() + (self.acquire_timeout_s if timeout is None else timeout)
+        exclude = exclude or []
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                candidates = [key for key in self.keys if key not in exclude] or list(self.keys)
+                ready = sorted((key for key in candidates if key.healthy(now) and key.has_capacity(tokens)),
+                               key=lambda key: key.load())
+                for key in ready:
+                    if key.requests is not None and not key.requests.try_consume(1):
+                        continue
+                    if key.tokens is not None and not key.tokens.try_consume(tokens):
+                        continue
+                    key.in_flight += 1
+                    key.stats["requests"] += 1
+                    return key
+                wait = min(key.wait_time(tokens, now) for key in candidates)
+            if now + wait > deadline:
+                raise KeyPoolExhausted(f"All {len(self.keys)} API keys are rate limited or cooling down "
+                                       f"(next free in {wait:.0f}s)")
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+    def release(self, key: ApiKeyState, status: Optional[int] = None, retry_after: Optional[float] = None,
+                charged: Optional[int] = None, used: Optional[int] = None):
+        """Return a lease; a retryable status puts the key in cooldown
+
+        charged is what acquire() took from the key's TPM bucket (prompt estimate
+        plus max_tokens) and used the tokens the request actually consumed; the
+        difference is refunded, so unused max_tokens do not throttle the key.
+        """
+        if key.tokens is not None and charged is not None and used is not None and used < charged:
+            key.tokens.refund(charged - used)
+        with self._lock:
+            key.in_flight -= 1
+            # A lone key only cools down when the server says how long: there is nowhere to fail over to
+            if status in RETRYABLE_STATUSES and (len(self.keys) > 1 or retry_after is not None):
+                key.failures += 1
+                key.stats["errors"] += 1
+                key.stats["cooldowns"] += 1
+                backoff = min(self.max_cooldown_s, self.cooldown_s * 2 ** (key.failures - 1))
+                key.cooldown_until = time.monotonic() + (retry_after if retry_after is not None else backoff)
+                logger.warning(f"API key {key.label} returned {status}; cooling down for "
+                               f"{key.cooldown_until - time.monotonic():.1f}s")
+            elif status is None:
+                key.failures = 0
+            else:
+                key.stats["errors"] += 1
+
+    def snapshot(self) -> List[Dict]:
+        """Per-key load and health for dashboards"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": key.label,
+                    "healthy": key.healthy(now),
+                    "cooldown_s": round(max(0.0, key.cooldown_until - now), 1),
+                    "in_flight": key.in_flight,
+                    **key.stats,
+                }
+                for key in self.keys
+            ]
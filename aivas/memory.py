@@ -0,0 +1,184 @@
+"""
+Per-session memory accounting for the Streamlit process
+
+estimate_size() walks session-state values (messages, metadata, datasets,
+indexes) and sums approximate byte sizes, counting shared objects once.
+Process-wide objects (the single-flight table, generation slots, key pools,
+anything passed to mark_shared()) and memory-mapped arrays are not charged
+to any session beyond their shallow size.
+Every session reports its total to the process-wide SESSION_REGISTRY, which
+admins can read. When a session exceeds its cap, the oldest messages are
+spilled to a JSONL archive on disk and dropped from memory.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aivas.branching import Conversation, MessageNode
+from aivas.singleflight import SHARED_SINGLEFLIGHT
+
+logger = logging.getLogger(__name__)
+
+_CONTAINERS = (dict, list, tuple, set, frozenset)
+
+# id -> object for instances shared by every session; holding them keeps the ids from being reused
+_SHARED: Dict[int, object] = {}
+
+def mark_shared(obj):
+    """Register a process-wide object so session sizes only count its shallow size; returns obj"""
+    _SHARED[id(obj)] = obj
+    return obj
+
+mark_shared(SHARED_SINGLEFLIGHT)
+
+def _is_mapped(array: np.ndarray) -> bool:
+    """Whether the array's memory belongs to a file mapping rather than this session"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base if isinstance(array.base, np.ndarray) else None
+    return False
+
+def estimate_size(obj, seen: Optional[set] = None) -> int:
+    """Approximate deep size in bytes; shared objects are counted once
+
+    Containers, numpy arrays, pandas objects and aivas classes are followed;
+    any other object (SDK clients, encoders shared by the process), objects
+    passed to mark_shared() and memory-mapped arrays only count their shallow size.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if id(item) in _SHARED:
+            total += sys.getsizeof(item)
+            continue
+        if isinstance(item, np.ndarray):
+            if _is_mapped(item):
+                total += sys.getsizeof(np.empty(0))
+                continue
+            total += item.nbytes + sys.getsizeof(np.empty(0))
+            continue
+        if isinstance(item, (pd.DataFrame, pd.Series)):
+            total += int(np.sum(item.memory_usage(deep=True)))
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, _CONTAINERS):
+            stack.extend(item)
+        elif type(item).__module__.startswith("aivas"):
+            if hasattr(item, "__dict__"):
+                stack.append(item.__dict__)
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+def measure_session(values: Dict) -> Dict[str, int]:
+    """Bytes per session-state key (objects shared between keys count toward the first)"""
+    seen: set = set()
+    return {str(key): estimate_size(value, seen) for key, value in values.items()}
+
+# ======================================================
+# 📦 SPILLING OLD MESSAGES
+# ======================================================
+
+def archive_messages(path: str, conversation_id: str, archived: Iterable[Tuple[str, Dict]]) -> int:
+    """Append (branch, message) pairs to the session's JSONL archive"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    with open(path, "a", encoding="utf-8") as handle:
+        for branch, message in archived:
+            record = {"ts": time.time(), "conversation": conversation_id, "branch": branch, "message": message}
+            handle.write(json.dumps(record, default=str) + "\n")
+            count += 1
+    return count
+
+def spill_conversation(conversation: Conversation, excess_bytes: int, keep_last: int,
+                       archive_path: str, conversation_id: str) -> int:
+    """Move the oldest messages out of memory until about excess_bytes are freed; returns messages archived"""
+    nodes: List[MessageNode] = []
+    node = conversation.head
+    while node is not None:
+        nodes.append(node)
+        node = node.parent
+    nodes.reverse()
+    cut, freed = 0, 0
+    seen: set = set()
+    for node in nodes[:max(0, len(nodes) - keep_last)]:
+        if freed >= excess_bytes:
+            break
+        freed += estimate_size(node.message, seen)
+        cut = node.depth
+    if not cut:
+        return 0
+    # Other branches keep their own last keep_last messages even where they share this prefix
+    archived = conversation.drop_before(cut, keep_last)
+    return archive_messages(archive_path, conversation_id, archived)
+
+# ======================================================
+# 🧠 PROCESS-WIDE REGISTRY
+# ======================================================
+
+@dataclass
+class SessionUsage:
+    """Latest memory report of one session"""
+    session_id: str
+    user: str
+    total_bytes: int
+    messages: int
+    archived_messages: int
+    top_keys: List[Tuple[str, int]] = field(default_factory=list)
+    last_seen: float = field(default_factory=time.time)
+
+class SessionRegistry:
+    """Memory totals reported by every live session in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, SessionUsage] = {}
+
+    def report(self, usage: SessionUsage):
+        with self._lock:
+            self._sessions[usage.session_id] = usage
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def prune(self, stale_after_s: float) -> int:
+        """Drop sessions that have not reported recently (closed browser tabs)"""
+        cutoff = time.time() - stale_after_s
+        with self._lock:
+            stale = [sid for sid, usage in self._sessions.items() if usage.last_seen < cutoff]
+            for session_id in stale:
+                del self._sessions[session_id]
+        return len(stale)
+
+    def snapshot(self) -> List[SessionUsage]:
+        with self._lock:
+            return sorted(self._sessions.values(), key=lambda usage: -usage.total_bytes)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(usage.total_bytes for usage in self._sessions.values())
+
+SESSION_REGISTRY = SessionRegistry()
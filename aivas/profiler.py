@@ -0,0 +1,324 @@
+"""
+Local dataset profiling for the "Analyze Data" feature
+
+CSV, XLSX and Parquet files are read in row chunks and summarized with
+vectorized NumPy/pandas accumulators. Only the compact profile (types, null
+rates, quantiles, frequent values, correlations) is sent to the assistant,
+never the raw rows.
+"""
+
+import io
+import logging
+import os
+import time
+import warnings
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ColumnProfile:
+    """Summary statistics for one column"""
+    name: str
+    kind: str                    # numeric, boolean, datetime or text
+    dtype: str
+    count: int = 0               # non-null values
+    nulls: int = 0
+    distinct: Optional[int] = None
+    distinct_capped: bool = False
+    minimum: Optional[object] = None
+    maximum: Optional[object] = None
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    quantiles: Dict[str, float] = field(default_factory=dict)
+    top_values: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def null_rate(self) -> float:
+        total = self.count + self.nulls
+        return self.nulls / total if total else 0.0
+
+@dataclass
+class DatasetProfile:
+    """Profile of a whole file plus a uniform row sample kept locally (never sent upstream)"""
+    name: str
+    rows: int
+    columns: List[ColumnProfile]
+    correlations: List[Tuple[str, str, float]]
+    sample: pd.DataFrame
+    elapsed_ms: float
+
+    def column(self, name: str) -> Optional[ColumnProfile]:
+        return next((column for column in self.columns if column.name == name), None)
+
+    def to_prompt(self, max_columns: int = 40) -> str:
+        """Compact text description for the system prompt"""
+        lines = [
+            f"Dataset profile of '{self.name}': {self.rows:,} rows x {len(self.columns)} columns. "
+            "The profile was computed locally over the full file; raw rows are not included.",
+            "",
+            "Columns:",
+        ]
+        for column in self.columns[:max_columns]:
+            lines.append(f"- {_describe_column(column)}")
+        if len(self.columns) > max_columns:
+            lines.append(f"- ... {len(self.columns) - max_columns} more columns not shown")
+        if self.correlations:
+            pairs = ", ".join(f"{a} ~ {b} (r={r:+.2f})" for a, b, r in self.correlations)
+            lines += ["", f"Strongest correlations (sampled): {pairs}"]
+        return "\n".join(lines)
+
+# ======================================================
+# 📥 CHUNKED READERS
+# ======================================================
+
+def iter_csv_frames(data: bytes, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(io.BytesIO(data), chunksize=chunk_rows, encoding_errors="replace")
+    with reader:
+        yield from reader
+
+def iter_xlsx_frames(data: bytes, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Rows of the first worksheet, header taken from its first row"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(value) if value is not None else f"column_{idx + 1}" for idx, value in enumerate(header)]
+        block = []
+        for row in rows:
+            block.append(row[:len(columns)])
+            if len(block) >= chunk_rows:
+                yield pd.DataFrame.from_records(block, columns=columns)
+                block = []
+        if block:
+            yield pd.DataFrame.from_records(block, columns=columns)
+    finally:
+        workbook.close()
+
+def iter_parquet_frames(data: bytes, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("Parquet support requires the pyarrow package") from e
+
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+FRAME_READERS = {
+    ".csv": iter_csv_frames,
+    ".xlsx": iter_xlsx_frames,
+    ".xlsm": iter_xlsx_frames,
+    ".parquet": iter_parquet_frames,
+}
+
+DATA_EXTENSIONS = sorted(ext.lstrip(".") for ext in FRAME_READERS)
+
+def iter_frames(name: str, data: bytes, chunk_rows: int = 50000) -> Iterator[pd.DataFrame]:
+    extension = os.path.splitext(name.lower())[1]
+    reader = FRAME_READERS.get(extension)
+    if reader is None:
+        raise ValueError(f"Unsupported data file type: {extension or name}")
+    return reader(data, chunk_rows)
+
+# ======================================================
+# 🧮 STREAMING ACCUMULATORS
+# ======================================================
+
+def _infer_kind(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    values = series.dropna().head(200)
+    if len(values) and values.map(lambda value: isinstance(value, str)).all():
+        with warnings.catch_warnings():
+            # Per-element parsing of mixed formats warns; a failed parse is all we need to know
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(values, errors="coerce")
+        if parsed.notna().mean() >= 0.9 and not pd.to_numeric(values, errors="coerce").notna().all():
+            return "datetime"
+    return "text"
+
+def coerce_series(series: pd.Series, kind: str) -> pd.Series:
+    """Force a chunk onto the kind decided from the first chunk"""
+    if kind == "numeric" and not pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(series, errors="coerce")
+    if kind == "datetime" and not pd.api.types.is_datetime64_any_dtype(series):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return pd.to_datetime(series, errors="coerce")
+    return series
+
+class _ColumnAccumulator:
+    """Exact counts, min/max and moments, merged chunk by chunk (Chan's parallel variance)"""
+
+    def __init__(self, name: str, kind: str, dtype: str, max_distinct: int):
+        self.profile = ColumnProfile(name=name, kind=kind, dtype=dtype)
+        self.max_distinct = max_distinct
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.values: Counter = Counter()
+        self.capped = False
+
+    def update(self, series: pd.Series):
+        profile = self.profile
+        series = coerce_series(series, profile.kind)
+        present = series.dropna()
+        profile.nulls += len(series) - len(present)
+        if not len(present):
+            return
+        profile.count += len(present)
+
+        if profile.kind == "numeric":
+            values = present.to_numpy(dtype=np.float64)
+            values = values[np.isfinite(values)]
+            if not len(values):
+                return
+            chunk_min, chunk_max = float(values.min()), float(values.max())
+            chunk_mean = float(values.mean())
+            chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+            total = self.n + len(values)
+            delta = chunk_mean - self.mean
+            self.mean += delta * len(values) / total
+            self.m2 += chunk_m2 + delta * delta * self.n * len(values) / total
+            self.n = total
+        elif profile.kind == "datetime":
+            chunk_min, chunk_max = present.min(), present.max()
+        else:
+            chunk_min = chunk_max = None
+            self._count_values(present)
+
+        if chunk_min is not None:
+            profile.minimum = chunk_min if profile.minimum is None else min(profile.minimum, chunk_min)
+            profile.maximum = chunk_max if profile.maximum is None else max(profile.maximum, chunk_max)
+
+    def _count_values(self, present: pd.Series):
+        counts = present.astype(str).value_counts(sort=False)
+        self.values.update(dict(zip(counts.index, counts.to_numpy().tolist())))
+        if len(self.values) > self.max_distinct:
+            # Keep the heavy hitters; frequencies of dropped rare values become approximate
+            self.values = Counter(dict(self.values.most_common(self.max_distinct // 2)))
+            self.capped = True
+
+    def finish(self, sample: pd.Series, top_k: int) -> ColumnProfile:
+        profile = self.profile
+        if profile.kind == "numeric" and profile.count:
+            profile.mean = self.mean
+            profile.std = float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else 0.0
+            values = pd.to_numeric(sample, errors="coerce").dropna().to_numpy(dtype=np.float64)
+            if len(values):
+                points = np.quantile(values, [0.05, 0.25, 0.5, 0.75, 0.95])
+                profile.quantiles = dict(zip(["p5", "p25", "p50", "p75", "p95"], points.tolist()))
+        elif profile.kind in ("text", "boolean"):
+            profile.distinct = len(self.values)
+            profile.distinct_capped = self.capped
+            profile.top_values = self.values.most_common(top_k)
+        return profile
+
+def _reservoir_merge(sample: Optional[pd.DataFrame], keys: np.ndarray, chunk: pd.DataFrame,
+                     rng: np.random.Generator, size: int) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Uniform row sample over all chunks: keep the rows with the smallest random keys"""
+    chunk_keys = rng.random(len(chunk))
+    if sample is None:
+        combined, combined_keys = chunk, chunk_keys
+    else:
+        combined = pd.concat([sample, chunk], ignore_index=True)
+        combined_keys = np.concatenate([keys, chunk_keys])
+    if len(combined) <= size:
+        return combined.reset_index(drop=True), combined_keys
+    keep = np.argpartition(combined_keys, size - 1)[:size]
+    return combined.iloc[keep].reset_index(drop=True), combined_keys[keep]
+
+def _top_correlations(sample: pd.DataFrame, numeric: List[str], limit: int) -> List[Tuple[str, str, float]]:
+    if len(numeric) < 2 or len(sample) < 3:
+        return []
+    matrix = sample[numeric].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    # Mean-impute missing values so one sparse column does not drop whole rows
+    column_means = np.nanmean(np.where(np.isfinite(matrix), matrix, np.nan), axis=0)
+    matrix = np.where(np.isfinite(matrix), matrix, column_means)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.corrcoef(matrix, rowvar=False)
+    upper_i, upper_j = np.triu_indices(len(numeric), k=1)
+    values = corr[upper_i, upper_j]
+    valid = np.isfinite(values)
+    upper_i, upper_j, values = upper_i[valid], upper_j[valid], values[valid]
+    order = np.argsort(-np.abs(values))[:limit]
+    return [(numeric[upper_i[idx]], numeric[upper_j[idx]], float(values[idx])) for idx in order]
+
+def profile_dataset(name: str, data: bytes, chunk_rows: int = 50000, sample_rows: int = 5000,
+                    top_k: int = 5, max_distinct: int = 20000, max_correlations: int = 5,
+                    seed: int = 0) -> DatasetProfile:
+    """Profile a CSV/XLSX/Parquet file chunk by chunk"""
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    accumulators: Dict[str, _ColumnAccumulator] = {}
+    sample, keys = None, np.zeros(0)
+    rows = 0
+
+    for frame in iter_frames(name, data, chunk_rows):
+        if frame.empty:
+            continue
+        frame.columns = [str(column) for column in frame.columns]
+        for column in frame.columns:
+            if column not in accumulators:
+                accumulators[column] = _ColumnAccumulator(column, _infer_kind(frame[column]),
+                                                          str(frame[column].dtype), max_distinct)
+            accumulators[column].update(frame[column])
+        rows += len(frame)
+        sample, keys = _reservoir_merge(sample, keys, frame, rng, sample_rows)
+
+    if sample is None:
+        sample = pd.DataFrame()
+    columns = [accumulator.finish(sample[column] if column in sample else pd.Series(dtype=float), top_k)
+               for column, accumulator in accumulators.items()]
+    numeric = [column.name for column in columns if column.kind == "numeric" and column.count]
+    return DatasetProfile(
+        name=name,
+        rows=rows,
+        columns=columns,
+        correlations=_top_correlations(sample, numeric, max_correlations),
+        sample=sample,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+# ======================================================
+# 📝 PROMPT FORMATTING
+# ======================================================
+
+def _format_number(value: Optional[float]) -> str:
+    if value is None:
+        return "n/a"
+    if abs(value) >= 1e6 or (value != 0 and abs(value) < 1e-3):
+        return f"{value:.3g}"
+    return f"{value:,.2f}".rstrip("0").rstrip(".")
+
+def _describe_column(column: ColumnProfile) -> str:
+    head = f"{column.name} ({column.kind}, nulls {column.null_rate:.1%})"
+    if not column.count:
+        return f"{head}: empty"
+    if column.kind == "numeric":
+        q = column.quantiles
+        return (f"{head}: min {_format_number(column.minimum)}, p25 {_format_number(q.get('p25'))}, "
+                f"median {_format_number(q.get('p50'))}, p75 {_format_number(q.get('p75'))}, "
+                f"max {_format_number(column.maximum)}, mean {_format_number(column.mean)}, "
+                f"std {_format_number(column.std)}")
+    if column.kind == "datetime":
+        return f"{head}: {column.minimum} to {column.maximum}"
+    distinct = f"{column.distinct:,}{'+' if column.distinct_capped else ''} distinct"
+    if column.distinct_capped or column.distinct > max(20, column.count // 2):
+        return f"{head}: {distinct}, mostly unique values (identifiers or free text)"
+    top = ", ".join(f"{str(value)[:40]} ({count / column.count:.0%})" for value, count in column.top_values)
+    return f"{head}: {distinct}; top: {top}"
@@ -0,0 +1,359 @@
+"""
+Pluggable LLM provider backends for the AIVAs assistants
+
+Every backend exposes the same four operations - chat, streaming chat, embeddings
+and image generation - so EnhancedChatManager and the personas can be routed to
+OpenAI, a local Ollama-style server or the in-process deterministic stub.
+"""
+
+import base64
+import hashlib
+import html
+import json
+import logging
+import math
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from openai import OpenAI
+
+from aivas.keypool import RETRYABLE_STATUSES, ApiKeyPool, ApiKeyState, error_status
+
+logger = logging.getLogger(__name__)
+
+class ProviderError(Exception):
+    """Raised when a backend cannot serve a request"""
+
+@dataclass
+class ChatResult:
+    """A completed chat response; token counts are None when the backend does not report them"""
+    content: str
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    finish_reason: str = "stop"
+
+@dataclass
+class ChatChunk:
+    """One streamed piece of a chat response; the last chunk carries finish_reason and usage"""
+    text: str = ""
+    finish_reason: Optional[str] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+def estimate_request_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """What a request counts against a tokens-per-minute limit: rough prompt size plus max_tokens"""
+    return sum(len(str(msg.get("content", ""))) for msg in messages) // 4 + max_tokens
+
+def api_messages(messages: List[Dict]) -> List[Dict]:
+    """Strip UI-only keys (metadata, image_url, ...) before sending messages upstream"""
+    return [{"role": msg["role"], "content": str(msg.get("content", ""))} for msg in messages]
+
+class LLMProvider(ABC):
+    """Base class for provider backends; subclasses implement chat() at least"""
+
+    name = "base"
+    billable = False   # whether OPENAI_PRICING applies to this backend's usage
+    offline = False    # True when no remote model is involved
+
+    @abstractmethod
+    def chat(self, messages: List[Dict], model: str, temperature: float = 0.7,
+             max_tokens: int = 2000) -> ChatResult:
+        """Complete the conversation in one response"""
+
+    def stream_chat(self, messages: List[Dict], model: str, temperature: float = 0.7,
+                    max_tokens: int = 2000) -> Iterator[ChatChunk]:
+        """Default streaming: a single chunk from chat()"""
+        result = self.chat(messages, model, temperature, max_tokens)
+        yield ChatChunk(text=result.content, finish_reason=result.finish_reason,
+                        input_tokens=result.input_tokens, output_tokens=result.output_tokens)
+
+    def embed(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        raise ProviderError(f"Embeddings are not supported by the {self.name} backend")
+
+    def generate_image(self, prompt: str, model: str = "dall-e-3", size: str = "1024x1024") -> str:
+        raise ProviderError(f"Image generation is not supported by the {self.name} backend")
+
+# ======================================================
+# ☁️ OPENAI
+# ======================================================
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI (or any OpenAI-compatible endpoint) through the official SDK
+
+    Requests go through an ApiKeyPool; a single api_key becomes a pool of one.
+    Retryable failures (429, 5xx, connection errors) fail over to the next key.
+    """
+
+    name = "openai"
+    billable = True
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 embedding_model: str = "text-embedding-3-small", key_pool: Optional[ApiKeyPool] = None):
+        self.key_pool = key_pool or ApiKeyPool([{"api_key": api_key}], base_url)
+        self.client = self.key_pool.keys[0].client
+        self.embedding_model = embedding_model
+
+    def _open(self, tokens: int, call: Callable[[OpenAI], Any]) -> Tuple[ApiKeyState, Any]:
+        """Run call(client) on a leased key, failing over on retryable errors; the caller releases the key"""
+        tried: List[ApiKeyState] = []
+        while True:
+            key = self.key_pool.acquire(tokens, exclude=tried)
+            try:
+                return key, call(key.client)
+            except Exception as e:
+                status, retry_after = error_status(e)
+                self.key_pool.release(key, status, retry_after)
+                tried.append(key)
+                if status not in RETRYABLE_STATUSES or len(tried) >= len(self.key_pool):
+                    raise
+
+    def _run(self, tokens: int, call: Callable[[OpenAI], Any],
+             used: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """Like _open() but releases the key, refunding the TPM estimate beyond used(result)"""
+        key, result = self._open(tokens, call)
+        self.key_pool.release(key, charged=tokens, used=used(result) if used else None)
+        return result
+
+    def chat(self, messages, model, temperature=0.7, max_tokens=2000) -> ChatResult:
+        tokens = estimate_request_tokens(messages, max_tokens)
+        response = self._run(tokens, lambda client: client.chat.completions.create(
+            model=model,
+            messages=api_messages(messages),
+            temperature=temperature,
+            max_tokens=max_tokens
+        ), used=lambda response: getattr(response.usage, "total_tokens", None))
+        choice = response.choices[0]
+        usage = response.usage
+        return ChatResult(
+            content=choice.message.content or "",
+            input_tokens=getattr(usage, "prompt_tokens", None),
+            output_tokens=getattr(usage, "completion_tokens", None),
+            finish_reason=choice.finish_reason or "stop"
+        )
+
+    def stream_chat(self, messages, model, temperature=0.7, max_tokens=2000) -> Iterator[ChatChunk]:
+        # The key stays leased (and counted as loaded) until the stream ends
+        tokens = estimate_request_tokens(messages, max_tokens)
+        key, stream = self._open(tokens, lambda client: client.chat.completions.create(
+            model=model,
+            messages=api_messages(messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        ))
+        status, retry_after = None, None
+        finish_reason = None
+        # Without a usage event (stopped early), estimate: full prompt plus the text received so far
+        used = tokens - max_tokens
+        try:
+            for event in stream:
+                if event.choices:
+                    choice = event.choices[0]
+                    finish_reason = choice.finish_reason or finish_reason
+                    if choice.delta and choice.delta.content:
+                        used += max(1, len(choice.delta.content) // 4)
+                        yield ChatChunk(text=choice.delta.content)
+                if getattr(event, "usage", None):
+                    used = event.usage.prompt_tokens + event.usage.completion_tokens
+                    yield ChatChunk(finish_reason=finish_reason or "stop",
+                                    input_tokens=event.usage.prompt_tokens,
+                                    output_tokens=event.usage.completion_tokens)
+                    return
+            yield ChatChunk(finish_reason=finish_reason or "stop")
+        except Exception as e:
+            status, retry_after = error_status(e)
+            raise
+        finally:
+            # Closing the HTTP response aborts generation upstream if we stop early
+            stream.close()
+            self.key_pool.release(key, status, retry_after, charged=tokens, used=used)
+
+    def embed(self, texts, model=None) -> List[List[float]]:
+        tokens = sum(len(text) for text in texts) // 4 + 1
+        response = self._run(tokens, lambda client: client.embeddings.create(
+            model=model or self.embedding_model, input=texts),
+            used=lambda response: getattr(response.usage, "total_tokens", None))
+        return [item.embedding for item in response.data]
+
+    def generate_image(self, prompt, model="dall-e-3", size="1024x1024") -> str:
+        response = self._run(1, lambda client: client.images.generate(
+            model=model,
+            prompt=prompt,
+            size=size,
+            quality="standard",
+            n=1
+        ))
+        return response.data[0].url
+
+# ======================================================
+# 🦙 OLLAMA-COMPATIBLE LOCAL SERVER
+# ======================================================
+
+class OllamaProvider(LLMProvider):
+    """Local models behind an Ollama-style /api/chat HTTP server"""
+
+    name = "ollama"
+    offline = True
+
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2",
+                 embedding_model: str = "nomic-embed-text", timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.default_model = model
+        self.embedding_model = embedding_model
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _model(self, model: Optional[str]) -> str:
+        """OpenAI model names from the UI map to the configured local model"""
+        if not model or model.startswith(("gpt-", "dall-e", "o1", "o3")):
+            return self.default_model
+        return model
+
+    def _payload(self, messages, model, temperature, max_tokens, stream: bool) -> Dict:
+        return {
+            "model": self._model(model),
+            "messages": api_messages(messages),
+            "stream": stream,
+            "options": {"temperature": temperature, "num_predict": max_tokens},
+        }
+
+    def _post(self, path: str, payload: Dict, stream: bool = False) -> requests.Response:
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload,
+                                         timeout=self.timeout, stream=stream)
+        except requests.RequestException as e:
+            raise ProviderError(f"Ollama server unreachable at {self.base_url}: {e}") from e
+        if response.status_code != 200:
+            raise ProviderError(f"Ollama error {response.status_code}: {response.text[:200]}")
+        return response
+
+    def chat(self, messages, model, temperature=0.7, max_tokens=2000) -> ChatResult:
+        data = self._post("/api/chat", self._payload(messages, model, temperature, max_tokens, False)).json()
+        return ChatResult(
+            content=data.get("message", {}).get("content", ""),
+            input_tokens=data.get("prompt_eval_count"),
+            output_tokens=data.get("eval_count"),
+            finish_reason=data.get("done_reason") or "stop"
+        )
+
+    def stream_chat(self, messages, model, temperature=0.7, max_tokens=2000) -> Iterator[ChatChunk]:
+        response = self._post("/api/chat", self._payload(messages, model, temperature, max_tokens, True), stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                text = data.get("message", {}).get("content", "")
+                if data.get("done"):
+                    yield ChatChunk(text=text, finish_reason=data.get("done_reason") or "stop",
+                                    input_tokens=data.get("prompt_eval_count"),
+                                    output_tokens=data.get("eval_count"))
+                    return
+                if text:
+                    yield ChatChunk(text=text)
+        finally:
+            response.close()
+
+    def embed(self, texts, model=None) -> List[List[float]]:
+        data = self._post("/api/embed", {"model": model or self.embedding_model, "input": texts}).json()
+        return data.get("embeddings", [])
+
+# ======================================================
+# 🧪 IN-PROCESS DETERMINISTIC STUB
+# ======================================================
+
+class StubProvider(LLMProvider):
+    """Deterministic offline backend: same input, same output, no network"""
+
+    name = "stub"
+    offline = True
+
+    def __init__(self, embedding_dim: int = 256, words_per_chunk: int = 4):
+        self.embedding_dim = embedding_dim
+        self.words_per_chunk = words_per_chunk
+
+    def _compose(self, messages: List[Dict], max_tokens: int) -> ChatResult:
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        persona = re.match(r"You are an? ([^.]+)\.", system)
+        persona = persona.group(1) if persona else "business assistant"
+        digest = hashlib.sha256(question.encode("utf-8")).hexdigest()[:8]
+
+        content = (
+            f"**Offline mode** ({persona}, ref {digest}) - no model backend is configured, "
+            f"so this is a deterministic local reply.\n\n"
+            f"You asked: \"{question[:300]}\"\n\n"
+            f"Suggested next steps:\n"
+            f"1. Clarify the goal and the metric that defines success\n"
+            f"2. List the constraints (budget, team, timeline)\n"
+            f"3. Pick one experiment you can run this week\n\n"
+            f"Configure an OpenAI key or a local Ollama server for real answers."
+        )
+        words = content.split(" ")
+        finish_reason = "stop"
+        if len(words) > max_tokens:
+            words, finish_reason = words[:max_tokens], "length"
+        return ChatResult(content=" ".join(words), finish_reason=finish_reason)
+
+    def chat(self, messages, model, temperature=0.7, max_tokens=2000) -> ChatResult:
+        return self._compose(messages, max_tokens)
+
+    def stream_chat(self, messages, model, temperature=0.7, max_tokens=2000) -> Iterator[ChatChunk]:
+        result = self._compose(messages, max_tokens)
+        words = result.content.split(" ")
+        for start in range(0, len(words), self.words_per_chunk):
+            text = " ".join(words[start:start + self.words_per_chunk])
+            yield ChatChunk(text=text if start == 0 else " " + text)
+        yield ChatChunk(finish_reason=result.finish_reason)
+
+    def embed(self, texts, model=None) -> List[List[float]]:
+        """Hashed bag-of-words vectors: lexical overlap gives cosine similarity"""
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.embedding_dim
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.md5(word.encode("utf-8")).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.embedding_dim
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+    def generate_image(self, prompt, model="dall-e-3", size="1024x1024") -> str:
+        """Placeholder SVG as a data URI, colored deterministically from the prompt"""
+        color = "#" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:6]
+        label = html.escape(prompt[:60])
+        svg = (
+            '<svg xmlns="http://www.w3.org/2000/svg" width="512" height="512">'
+            f'<rect width="512" height="512" fill="{color}"/>'
+            '<text x="256" y="240" font-size="28" text-anchor="middle" fill="white">Offline image</text>'
+            f'<text x="256" y="290" font-size="16" text-anchor="middle" fill="white">{label}</text>'
+            '</svg>'
+        )
+        return "data:image/svg+xml;base64," + base64.b64encode(svg.encode("utf-8")).decode("ascii")
+
+# ======================================================
+# 🧭 REGISTRY
+# ======================================================
+
+def build_providers(settings: Dict, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                    key_pool: Optional[ApiKeyPool] = None) -> Dict[str, LLMProvider]:
+    """Instantiate every configured backend; OpenAI only when a key (or key pool) is available"""
+    providers: Dict[str, LLMProvider] = {"stub": StubProvider(**settings.get("stub", {}))}
+    if api_key or key_pool:
+        providers["openai"] = OpenAIProvider(api_key, base_url, key_pool=key_pool, **settings.get("openai", {}))
+    # Only when a local server has been set up: an unreachable default would fail every routed request
+    if settings.get("ollama", {}).get("enabled", False):
+        ollama_settings = {k: v for k, v in settings.get("ollama", {}).items() if k != "enabled"}
+        providers["ollama"] = OllamaProvider(**ollama_settings)
+    return providers
+
+def default_provider_name(providers: Dict[str, LLMProvider], preferred: Optional[str] = None) -> str:
+    """Preferred backend if available, else OpenAI, else the offline stub"""
+    if preferred and preferred in providers:
+        return preferred
+    return "openai" if "openai" in providers else "stub"
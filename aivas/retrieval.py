@@ -0,0 +1,138 @@
+"""
+Retrieval over uploaded documents: only the best-matching chunks go into the prompt
+"""
+
+import logging
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aivas.bm25 import BM25Index
+from aivas.ingest import DocumentChunk, format_context
+from aivas.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+def user_index_dir(data_dir: str, user_key: str, name: str) -> str:
+    """Per-user index directory; the key is sanitized so it is always a single path component"""
+    safe_key = re.sub(r"[^A-Za-z0-9_-]", "_", str(user_key))[:64] or "anonymous"
+    return os.path.join(data_dir, safe_key, name)
+
+def chunk_from_row(row: Dict) -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=row["chunk_id"],
+        doc_id=row["doc_id"],
+        source=row.get("source", ""),
+        location=row.get("location", ""),
+        text=row.get("text", ""),
+        tokens=row.get("tokens", 0),
+    )
+
+def pack_within_budget(chunks: List[DocumentChunk], budget_tokens: int) -> List[DocumentChunk]:
+    """Keep ranked chunks in order while they fit the token budget"""
+    selected, used = [], 0
+    for chunk in chunks:
+        if used + chunk.tokens > budget_tokens:
+            continue
+        selected.append(chunk)
+        used += chunk.tokens
+    return selected
+
+class DocumentRetriever:
+    """Embeds chunks into a per-user VectorIndex and answers top-k queries"""
+
+    name = "vector"
+
+    def __init__(self, directory: str, embed_fn: EmbedFn, batch_size: int = 64):
+        self.index = VectorIndex(directory)
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+
+    def add_chunks(self, chunks: List[DocumentChunk]) -> int:
+        """Embed and index chunks not already present"""
+        pending = [chunk for chunk in chunks if chunk.chunk_id not in self.index]
+        added = 0
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            vectors = self.embed_fn([chunk.text for chunk in batch])
+            added += self.index.add(vectors, [vars(chunk).copy() for chunk in batch])
+        return added
+
+    def remove_document(self, doc_id: str) -> int:
+        removed = self.index.delete_document(doc_id)
+        if self.index.dead_fraction > 0.5:
+            self.index.compact()
+        return removed
+
+    def documents(self) -> Dict[str, Dict]:
+        return self.index.documents()
+
+    def search(self, query: str, k: int = 8) -> List[Tuple[float, DocumentChunk]]:
+        if not len(self.index) or not query.strip():
+            return []
+        query_vector = self.embed_fn([query])[0]
+        return [(score, chunk_from_row(row)) for score, row in self.index.search(query_vector, k)]
+
+    def build_context(self, query: str, budget_tokens: int = 1500, k: int = 8,
+                      min_score: float = 0.0) -> Optional[str]:
+        """Reference block from the top-k chunks that fit the token budget"""
+        hits = [chunk for score, chunk in self.search(query, k) if score > min_score]
+        return format_context(pack_within_budget(hits, budget_tokens))
+
+class LexicalRetriever:
+    """BM25 retrieval with the same interface as DocumentRetriever, no embedding calls"""
+
+    name = "bm25"
+
+    def __init__(self, directory: str, token_counter: Optional[Callable[[str], int]] = None, **index_options):
+        self.index = BM25Index(directory, **index_options)
+        self.token_counter = token_counter or (lambda text: max(1, len(text) // 4))
+
+    def add_chunks(self, chunks: List[DocumentChunk]) -> int:
+        # Buffered: the index flushes on size or age, so each upload does not become a segment
+        return self.index.add([vars(chunk).copy() for chunk in chunks])
+
+    def add_conversation(self, conversation_id: str, messages: List[Dict], title: str) -> int:
+        """Index a saved conversation, one chunk per user/assistant exchange"""
+        chunks, exchange = [], []
+        for message in messages:
+            if message.get("role") not in ("user", "assistant") or not message.get("content"):
+                continue
+            exchange.append(f"{message['role'].title()}: {message['content']}")
+            if message["role"] == "assistant":
+                text = "\n".join(exchange)
+                chunks.append(DocumentChunk(
+                    chunk_id=f"{conversation_id}:{len(chunks)}",
+                    doc_id=conversation_id,
+                    source=title,
+                    location=f"exchange {len(chunks) + 1}",
+                    text=text,
+                    tokens=self.token_counter(text),
+                ))
+                exchange = []
+        return self.add_chunks(chunks)
+
+    def remove_document(self, doc_id: str) -> int:
+        return self.index.delete_document(doc_id)
+
+    def documents(self) -> Dict[str, Dict]:
+        docs: Dict[str, Dict] = {}
+        for record in self.index.live_records():
+            doc = docs.setdefault(record["doc_id"], {"name": record.get("source", record["doc_id"]), "chunks": 0, "tokens": 0})
+            doc["chunks"] += 1
+            doc["tokens"] += record.get("tokens", 0)
+        return docs
+
+    def chunks_for(self, doc_ids) -> List[DocumentChunk]:
+        doc_ids = set(doc_ids)
+        return [chunk_from_row(record) for record in self.index.live_records() if record["doc_id"] in doc_ids]
+
+    def search(self, query: str, k: int = 8) -> List[Tuple[float, DocumentChunk]]:
+        return [(score, chunk_from_row(record)) for score, record in self.index.search(query, k)]
+
+    def build_context(self, query: str, budget_tokens: int = 1500, k: int = 8,
+                      min_score: float = 0.0) -> Optional[str]:
+        hits = [chunk for score, chunk in self.search(query, k) if score > min_score]
+        return format_context(pack_within_budget(hits, budget_tokens))
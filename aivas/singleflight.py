@@ -0,0 +1,122 @@
+"""
+Single-flight deduplication of identical in-flight LLM requests
+
+When several sessions send the same request at the same time (e.g. a whole
+class clicking the same quick action), only the first caller goes upstream;
+the others wait for its result. Each caller still records usage in its own
+session, with the cost split across the callers that received the result.
+
+The upstream request runs under the flight's own CancellationToken, which is
+cancelled only once every caller in the group has cancelled: one session
+clearing its chat, or one API client disconnecting, only detaches that caller.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aivas.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+def request_key(provider: str, model: str, temperature: float, max_tokens: int,
+                messages: List[Dict]) -> str:
+    """Stable key for a chat request: whitespace-normalized roles and contents plus sampling settings"""
+    normalized = [[msg["role"], " ".join(str(msg.get("content", "")).split())] for msg in messages]
+    payload = json.dumps([provider, model, round(float(temperature), 3), max_tokens, normalized],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _Call:
+    """One upstream request and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.group_size = 1                # callers that received the result, fixed when it is ready
+        self.token = CancellationToken()   # cancelled once no caller is left waiting
+        self.waiting = 1
+        self.left: set = set()             # ids of tokens whose callers cancelled before the result
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {"calls": 0, "executions": 0, "shared": 0}
+
+    def do(self, key: str, fn: Callable[[CancellationToken], Any],
+           token: Optional[CancellationToken] = None) -> Tuple[Any, bool, int]:
+        """Run fn(flight_token) once per key at a time; returns (result, shared, group_size)
+
+        shared is False for the caller that executed fn. group_size counts the
+        callers that received this result, so per-caller cost shares add up to
+        the whole. Errors propagate to all. Cancelling `token` before the result
+        is ready raises GenerationCancelled for this caller only; the flight
+        token passed to fn is cancelled when every caller has cancelled.
+        """
+        if token is not None:
+            token.raise_if_cancelled()
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None and not call.token.cancelled:
+                call.waiting += 1
+                self.stats["shared"] += 1
+                leader = False
+            else:
+                # A flight whose callers all left is finishing its cancellation: start a fresh one
+                call = self._calls[key] = _Call()
+                self.stats["executions"] += 1
+                leader = True
+        if token is not None:
+            token.on_cancel(lambda: self._leave(call, token))
+
+        if not leader:
+            while not call.done.wait(0.1):
+                if token is not None and token.cancelled and self._leave(call, token):
+                    token.raise_if_cancelled()
+        else:
+            try:
+                call.result = fn(call.token)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    # Later callers start a new flight instead of joining a finished one
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                    call.group_size = max(1, call.waiting)
+                    call.done.set()
+
+        if token is not None and id(token) in call.left:
+            # A leader cancelled while others still waited ran on to completion for them
+            token.raise_if_cancelled()
+        if call.error is not None:
+            raise call.error
+        return call.result, not leader, call.group_size
+
+    def _leave(self, call: _Call, token: CancellationToken) -> bool:
+        """Take a cancelled caller out of the group; False if the result was already handed to it"""
+        with self._lock:
+            if call.done.is_set():
+                return id(token) in call.left
+            if id(token) in call.left:
+                return True
+            call.left.add(id(token))
+            call.waiting -= 1
+            last = call.waiting == 0
+        if last:
+            call.token.cancel(token.reason or "cancelled")
+        return True
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+# Shared by every chat manager in the process (one per Streamlit session)
+SHARED_SINGLEFLIGHT = SingleFlight()
@@ -0,0 +1,261 @@
+"""
+Append-only, memory-mapped vector index for retrieval over uploaded documents
+
+Layout of an index directory:
+    vectors.f32   row-major float32 matrix, one L2-normalized row per chunk (append only)
+    meta.jsonl    sidecar log: {"op": "add", "row": n, ...metadata} / {"op": "delete", "row": n}
+    index.json    header with the vector dimension and the current generation
+
+Adds append rows, deletes append tombstones; neither rewrites the matrix.
+compact() drops deleted rows when the dead fraction gets large: it writes a
+new generation of both files (vectors.<g>.f32, meta.<g>.jsonl) and switches
+to it with a single rename of index.json, so a crash leaves either the old
+pair or the new one in use, never a mix.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class VectorIndex:
+    """Top-k cosine search over an on-disk float32 matrix"""
+
+    VECTORS_FILE = "vectors.f32"
+    META_FILE = "meta.jsonl"
+    HEADER_FILE = "index.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self.generation = 0
+        self.rows: List[Dict] = []            # metadata per row, None once deleted
+        self._alive = np.zeros(0, dtype=bool)
+        self._by_chunk: Dict[str, int] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._load()
+
+    # ---- paths & loading ----------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _generation_paths(self, generation: int) -> Tuple[str, str]:
+        """(vectors, meta) paths; generation 0 keeps the original file names"""
+        if generation == 0:
+            return self._path(self.VECTORS_FILE), self._path(self.META_FILE)
+        return self._path(f"vectors.{generation}.f32"), self._path(f"meta.{generation}.jsonl")
+
+    @property
+    def _vectors_path(self) -> str:
+        return self._generation_paths(self.generation)[0]
+
+    @property
+    def _meta_path(self) -> str:
+        return self._generation_paths(self.generation)[1]
+
+    def _write_header(self, generation: int):
+        tmp_path = self._path(self.HEADER_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"dim": self.dim, "version": 2, "generation": generation}, handle)
+        os.replace(tmp_path, self._path(self.HEADER_FILE))
+
+    def _load(self):
+        header_path = self._path(self.HEADER_FILE)
+        if os.path.exists(header_path):
+            with open(header_path, encoding="utf-8") as handle:
+                header = json.load(handle)
+            self.dim = header.get("dim")
+            self.generation = header.get("generation", 0)
+
+        adds: List[Dict] = []
+        deleted = set()
+        meta_path = self._meta_path
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.pop("op") == "add":
+                        adds.append(record)
+                    elif record["row"] < len(adds):
+                        deleted.add(record["row"])
+
+        stored_rows = self._stored_rows()
+        if stored_rows < len(adds):
+            # Metadata written for vectors that never reached disk: rewrite the log without
+            # them, or the next add() would pair these lines with the new rows' vectors
+            logger.warning(f"Vector file shorter than metadata in {self.directory}, truncating index")
+            adds = adds[:stored_rows]
+            deleted = {row for row in deleted if row < stored_rows}
+            self._write_meta(meta_path, adds, deleted)
+        elif (self.dim and os.path.exists(self._vectors_path)
+              and os.path.getsize(self._vectors_path) > len(adds) * self.dim * 4):
+            # A crash between writing vectors and metadata leaves orphan vector rows (or a torn one);
+            # cut them off, or the next add() would append after them and misalign every new row
+            logger.warning(f"Dropping orphan vector rows in {self.directory}")
+            with open(self._vectors_path, "r+b") as handle:
+                handle.truncate(len(adds) * self.dim * 4)
+
+        rows: List[Optional[Dict]] = [None if idx in deleted else row for idx, row in enumerate(adds)]
+        self.rows = rows
+        self._alive = np.array([row is not None for row in rows], dtype=bool)
+        self._by_chunk = {row["chunk_id"]: idx for idx, row in enumerate(rows) if row is not None}
+
+    @staticmethod
+    def _write_meta(path: str, adds: List[Dict], deleted: Iterable[int] = ()):
+        """Replace a metadata log atomically with the given add records and tombstones"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            for row, record in enumerate(adds):
+                handle.write(json.dumps(dict(record, row=row, op="add")) + "\n")
+            for row in sorted(deleted):
+                handle.write(json.dumps({"op": "delete", "row": row}) + "\n")
+        os.replace(tmp_path, path)
+
+    def _stored_rows(self) -> int:
+        path = self._vectors_path
+        if not self.dim or not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (4 * self.dim)
+
+    def _matrix_view(self) -> Optional[np.memmap]:
+        """Memory map covering every row written so far (remapped after appends)"""
+        if not self.rows:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != len(self.rows):
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                     shape=(len(self.rows), self.dim))
+        return self._matrix
+
+    # ---- mutation ------------------------------------------------------
+
+    def add(self, vectors: Iterable[Iterable[float]], metadatas: List[Dict]) -> int:
+        """Append normalized vectors with their metadata (each needs a unique chunk_id)"""
+        matrix = np.asarray(list(vectors), dtype=np.float32)
+        if matrix.size == 0:
+            return 0
+        if matrix.ndim != 2 or matrix.shape[0] != len(metadatas):
+            raise ValueError("vectors and metadatas must have the same length")
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                self._write_header(self.generation)
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {matrix.shape[1]}")
+
+            keep = [i for i, meta in enumerate(metadatas) if meta["chunk_id"] not in self._by_chunk]
+            if not keep:
+                return 0
+            matrix = matrix[keep]
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1.0, norms)
+
+            start = len(self.rows)
+            with open(self._vectors_path, "ab") as handle:
+                handle.write(np.ascontiguousarray(matrix).tobytes())
+            with open(self._meta_path, "a", encoding="utf-8") as handle:
+                for offset, idx in enumerate(keep):
+                    record = dict(metadatas[idx], row=start + offset)
+                    handle.write(json.dumps(dict(record, op="add")) + "\n")
+                    self.rows.append(record)
+                    self._by_chunk[record["chunk_id"]] = record["row"]
+
+            self._alive = np.concatenate([self._alive, np.ones(len(keep), dtype=bool)])
+            return len(keep)
+
+    def delete_rows(self, rows: List[int]) -> int:
+        """Tombstone rows; vectors stay on disk until compact()"""
+        with self._lock:
+            live = [row for row in rows if 0 <= row < len(self.rows) and self.rows[row] is not None]
+            if not live:
+                return 0
+            with open(self._meta_path, "a", encoding="utf-8") as handle:
+                for row in live:
+                    handle.write(json.dumps({"op": "delete", "row": row}) + "\n")
+                    self._by_chunk.pop(self.rows[row]["chunk_id"], None)
+                    self.rows[row] = None
+            self._alive[live] = False
+            return len(live)
+
+    def delete_document(self, doc_id: str) -> int:
+        return self.delete_rows([idx for idx, row in enumerate(self.rows) if row and row.get("doc_id") == doc_id])
+
+    def compact(self):
+        """Rewrite the matrix and sidecar without deleted rows"""
+        with self._lock:
+            matrix = self._matrix_view()
+            if matrix is None or self._alive.all():
+                return
+            live = np.flatnonzero(self._alive)
+            vectors = np.array(matrix[live])
+            records = [self.rows[idx] for idx in live]
+            self._matrix = None
+
+            old_paths = self._generation_paths(self.generation)
+            generation = self.generation + 1
+            vectors_path, meta_path = self._generation_paths(generation)
+            vectors.tofile(vectors_path)
+            self._write_meta(meta_path, records)
+            # The header rename is the single switch-over point between the two pairs
+            self._write_header(generation)
+            self.generation = generation
+            for path in old_paths:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove old index file {path}: {str(e)}")
+            self._load()
+
+    # ---- queries -------------------------------------------------------
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._by_chunk
+
+    def search(self, query: Iterable[float], k: int = 5) -> List[Tuple[float, Dict]]:
+        """Top-k live rows by cosine similarity"""
+        with self._lock:
+            matrix = self._matrix_view()
+            if matrix is None or not self._alive.any():
+                return []
+            vector = np.asarray(list(query), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                return []
+            scores = matrix @ (vector / norm)
+            scores = np.where(self._alive, scores, -np.inf)
+
+            k = min(k, int(self._alive.sum()))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[idx]), self.rows[idx]) for idx in top]
+
+    def documents(self) -> Dict[str, Dict]:
+        """Live documents with chunk and token counts"""
+        docs: Dict[str, Dict] = {}
+        for row in self.rows:
+            if row is None:
+                continue
+            doc = docs.setdefault(row["doc_id"], {"name": row.get("source", row["doc_id"]), "chunks": 0, "tokens": 0})
+            doc["chunks"] += 1
+            doc["tokens"] += row.get("tokens", 0)
+        return docs
+
+    def live_rows(self) -> List[Dict]:
+        return [row for row in self.rows if row is not None]
+
+    @property
+    def dead_fraction(self) -> float:
+        return 1.0 - len(self) / len(self.rows) if self.rows else 0.0
@@ -0,0 +1,194 @@
+"""
+HTTP API benchmark: N concurrent clients calling POST /chat on the aivas.api service
+
+By default both the mock OpenAI server and the API (uvicorn on a background
+thread) are started in-process, so runs are free and repeatable. Per-client
+rate limits are disabled for the in-process API, since every client shares
+one address.
+
+Examples:
+    python -m benchmarks.api_bench --clients 50 --requests 5 --out bench_results/api.json
+    python -m benchmarks.api_bench --clients 50 --stream --compare bench_results/api.json
+    python -m benchmarks.api_bench --api-url http://127.0.0.1:8100   # external API server
+"""
+
+import argparse
+import json
+import logging
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+import uvicorn
+
+from aivas import BOT_PERSONALITIES
+from aivas.api import create_app
+from benchmarks.mock_openai import add_settings_arguments, settings_from_args, start_mock_server
+from benchmarks.report import (
+    compare_results,
+    distribution,
+    environment_info,
+    print_summary,
+    save_results,
+)
+
+logger = logging.getLogger(__name__)
+
+def start_api_server(base_url: str) -> Tuple[uvicorn.Server, str]:
+    """Serve aivas.api on a free local port from a background thread; returns (server, url)"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    # No ledger: mock completions must not skew the budgets learned from real usage
+    app = create_app([{"api_key": "mock-key"}], base_url, rate_limits=None, ledger_path=None)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="aivas-api", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+def client_loop(client_idx: int, args: argparse.Namespace, api_url: str, start_barrier: threading.Barrier,
+                samples: List[Dict], lock: threading.Lock):
+    """One API client sending sequential /chat requests over a keep-alive session"""
+    session = requests.Session()
+    actions = BOT_PERSONALITIES[args.bot].get("quick_actions") or ["Give me advice"]
+    start_barrier.wait()
+    for turn in range(args.requests):
+        action = actions[(client_idx + turn) % len(actions)]
+        body = {"bot": args.bot, "message": f"Help me with: {action} (client {client_idx})",
+                "model": args.model, "max_tokens": args.max_tokens, "stream": args.stream}
+        started = time.perf_counter()
+        first_token_ms: Optional[float] = None
+        error, tokens, cost = False, 0, 0.0
+        try:
+            response = session.post(f"{api_url}/chat", json=body, stream=args.stream, timeout=120)
+            if response.status_code != 200:
+                error = True
+            elif args.stream:
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: "):
+                        if event == "delta" and first_token_ms is None:
+                            first_token_ms = (time.perf_counter() - started) * 1000
+                        elif event == "done":
+                            metadata = json.loads(line[6:])["metadata"]
+                            error = bool(metadata.get("error"))
+                            tokens, cost = metadata.get("total_tokens", 0), metadata.get("cost", 0.0)
+                        elif event == "error":
+                            error = True
+            else:
+                metadata = response.json()["metadata"]
+                tokens, cost = metadata.get("total_tokens", 0), metadata.get("cost", 0.0)
+        except requests.RequestException as e:
+            logger.warning(f"Client {client_idx} request failed: {str(e)}")
+            error = True
+        latency_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.append({
+                "client": client_idx,
+                "turn": turn,
+                "latency_ms": latency_ms,
+                "first_token_ms": first_token_ms,
+                "error": error,
+                "total_tokens": tokens,
+                "cost": cost,
+            })
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    mock = api = None
+    api_url = args.api_url
+    if not api_url:
+        mock, _ = start_mock_server(settings_from_args(args))
+        api, api_url = start_api_server(mock.base_url)
+
+    samples: List[Dict] = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.clients + 1)
+    threads = [
+        threading.Thread(target=client_loop, args=(idx, args, api_url, barrier, samples, lock),
+                         name=f"bench-client-{idx}", daemon=True)
+        for idx in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    wall_started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - wall_started
+
+    upstream_requests = None
+    if api:
+        api.should_exit = True
+    if mock:
+        upstream_requests = mock.chat_requests
+        mock.shutdown()
+        mock.server_close()
+
+    ok = [s for s in samples if not s["error"]]
+    total_tokens = sum(s["total_tokens"] for s in ok)
+    return {
+        "benchmark": "http_api",
+        "config": {
+            "clients": args.clients,
+            "requests": args.requests,
+            "bot": args.bot,
+            "model": args.model,
+            "stream": args.stream,
+            "max_tokens": args.max_tokens,
+            "api_url": args.api_url or "in-process",
+            "mock": vars(settings_from_args(args)) if not args.api_url else None,
+        },
+        "environment": environment_info(),
+        "summary": {
+            "turns": len(samples),
+            "errors": len(samples) - len(ok),
+            "wall_s": round(wall_s, 3),
+            "throughput_per_s": round(len(ok) / wall_s, 3) if wall_s else 0.0,
+            "tokens_per_s": round(total_tokens / wall_s, 1) if wall_s else 0.0,
+            "latency_ms": distribution(s["latency_ms"] for s in ok),
+            "first_token_ms": distribution(s["first_token_ms"] for s in ok if s["first_token_ms"] is not None),
+            "upstream_requests": upstream_requests,
+            "total_cost": round(sum(s["cost"] for s in ok), 6),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AIVAs HTTP API with concurrent clients")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent API clients")
+    parser.add_argument("--requests", type=int, default=5, help="sequential requests per client")
+    parser.add_argument("--bot", default="Startup Strategist", choices=sorted(BOT_PERSONALITIES))
+    parser.add_argument("--model", default="gpt-4-turbo")
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--stream", action="store_true", help="request Server-Sent Events")
+    parser.add_argument("--api-url", help="benchmark an already running API server")
+    parser.add_argument("--out", help="write results JSON to this path")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmark(args)
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            comparison = compare_results(results, json.load(handle), args.tolerance)
+        results["comparison"] = comparison
+
+    print_summary(results, comparison)
+    if args.out:
+        save_results(results, args.out)
+
+    if comparison and any(row["regression"] for row in comparison):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
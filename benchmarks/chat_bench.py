@@ -0,0 +1,172 @@
+"""
+Chat pipeline benchmark: N concurrent simulated users driving EnhancedChatManager
+
+By default a local mock OpenAI server is started in-process, so runs are free and repeatable.
+
+Examples:
+    python -m benchmarks.chat_bench --users 20 --turns 5 --out bench_results/chat.json
+    python -m benchmarks.chat_bench --users 20 --compare bench_results/chat.json
+    python -m benchmarks.chat_bench --base-url http://127.0.0.1:8008/v1   # external server
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from aivas import BOT_PERSONALITIES, EnhancedChatManager, build_system_prompt
+from benchmarks.mock_openai import add_settings_arguments, settings_from_args, start_mock_server
+from benchmarks.report import (
+    compare_results,
+    distribution,
+    environment_info,
+    print_summary,
+    save_results,
+)
+
+logger = logging.getLogger(__name__)
+
+def simulated_user(user_idx: int, args: argparse.Namespace, base_url: str,
+                   start_barrier: threading.Barrier, samples: List[Dict], lock: threading.Lock):
+    """One user: a fresh chat manager holding a growing conversation with a single bot"""
+    try:
+        manager = EnhancedChatManager()
+        manager.initialize_client("mock-key", base_url)
+    except Exception:
+        start_barrier.abort()
+        raise
+    bot_info = BOT_PERSONALITIES[args.bot]
+    actions = bot_info.get("quick_actions") or ["Give me advice"]
+    history = []
+
+    start_barrier.wait()
+    for turn in range(args.turns):
+        action = actions[turn % len(actions)] if args.same_prompt else actions[(user_idx + turn) % len(actions)]
+        history.append({"role": "user", "content": f"Help me with: {action}"})
+        messages = [{"role": "system", "content": build_system_prompt(args.bot)}] + history
+
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        first_token_ms = None
+        if args.stream:
+            for event in manager.stream_response(messages, args.model, bot_info["temperature"]):
+                if event.get("done"):
+                    response, metadata = event["content"], event["metadata"]
+                elif first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+        else:
+            response, metadata = manager.generate_response(messages, args.model, bot_info["temperature"])
+        cpu_ms = (time.thread_time() - cpu_started) * 1000
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        history.append({"role": "assistant", "content": response})
+        with lock:
+            samples.append({
+                "user": user_idx,
+                "turn": turn,
+                "latency_ms": latency_ms,
+                "first_token_ms": first_token_ms,
+                "cpu_ms": cpu_ms,
+                "error": bool(metadata.get("error")),
+                "total_tokens": metadata.get("total_tokens", 0),
+                "shared": bool(metadata.get("singleflight", {}).get("shared")),
+                "cost": metadata.get("cost", 0.0),
+            })
+
+def run_benchmark(args: argparse.Namespace) -> Dict:
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, _ = start_mock_server(settings_from_args(args))
+        base_url = server.base_url
+
+    samples: List[Dict] = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.users + 1)
+    threads = [
+        threading.Thread(target=simulated_user, args=(idx, args, base_url, barrier, samples, lock),
+                         name=f"bench-user-{idx}", daemon=True)
+        for idx in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    wall_started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - wall_started
+
+    upstream_requests = None
+    if server:
+        upstream_requests = server.chat_requests
+        server.shutdown()
+        server.server_close()
+
+    ok = [s for s in samples if not s["error"]]
+    total_tokens = sum(s["total_tokens"] for s in ok)
+    return {
+        "benchmark": "chat_pipeline",
+        "config": {
+            "users": args.users,
+            "turns": args.turns,
+            "bot": args.bot,
+            "model": args.model,
+            "stream": args.stream,
+            "same_prompt": args.same_prompt,
+            "base_url": args.base_url or "in-process mock",
+            "mock": vars(settings_from_args(args)) if not args.base_url else None,
+        },
+        "environment": environment_info(),
+        "summary": {
+            "turns": len(samples),
+            "errors": len(samples) - len(ok),
+            "wall_s": round(wall_s, 3),
+            "throughput_per_s": round(len(ok) / wall_s, 3) if wall_s else 0.0,
+            "tokens_per_s": round(total_tokens / wall_s, 1) if wall_s else 0.0,
+            "latency_ms": distribution(s["latency_ms"] for s in ok),
+            "cpu_ms_per_turn": distribution(s["cpu_ms"] for s in ok),
+            "first_token_ms": distribution(s["first_token_ms"] for s in ok if s["first_token_ms"] is not None),
+            "upstream_requests": upstream_requests,
+            "shared_turns": sum(1 for s in ok if s["shared"]),
+            "total_cost": round(sum(s["cost"] for s in ok), 6),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EnhancedChatManager with concurrent simulated users")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per user")
+    parser.add_argument("--bot", default="Startup Strategist", choices=sorted(BOT_PERSONALITIES))
+    parser.add_argument("--model", default="gpt-4-turbo")
+    parser.add_argument("--stream", action="store_true", help="use streaming completions")
+    parser.add_argument("--same-prompt", action="store_true",
+                        help="every user sends the same quick action each turn (thundering herd)")
+    parser.add_argument("--base-url", help="use an already running OpenAI-compatible server")
+    parser.add_argument("--out", help="write results JSON to this path")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmark(args)
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            comparison = compare_results(results, json.load(handle), args.tolerance)
+        results["comparison"] = comparison
+
+    print_summary(results, comparison)
+    if args.out:
+        save_results(results, args.out)
+
+    if comparison and any(row["regression"] for row in comparison):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Bulk mailer check against the local SMTP sink
+
+Sends one campaign through portal.mailer.BulkMailer to benchmarks.mock_smtp
+and checks the behavior the admin page relies on: a recipients loader is
+walked off the caller's thread, temporary 4xx replies are retried, permanent
+5xx replies are not, the combined send rate stays under rate_per_s, and
+cancelling a campaign skips its unsent jobs. Exits non-zero when a check
+fails.
+
+Examples:
+    python -m benchmarks.mailer_check
+    python -m benchmarks.mailer_check --recipients 500 --rate 100 --workers 8
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.mock_smtp import start_mock_smtp
+from portal.mailer import BulkMailer, Campaign, SMTPSettings
+
+logger = logging.getLogger(__name__)
+
+def wait_finished(campaign: Campaign, timeout_s: float) -> bool:
+    deadline = time.monotonic() + timeout_s
+    while campaign.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return campaign.finished_at is not None
+
+def run_checks(args: argparse.Namespace) -> List[Dict]:
+    server, _ = start_mock_smtp()
+    mailer = BulkMailer(SMTPSettings(host="127.0.0.1", port=server.port, sender="admin@example.com", starttls=False),
+                        rate_per_s=args.rate, burst=args.burst, workers=args.workers, max_attempts=3,
+                        backoff_s=0.2, idle_close_s=1.0)
+    checks = []
+
+    def check(name: str, passed: bool, detail: str):
+        checks.append({"check": name, "passed": passed, "detail": detail})
+
+    recipients = ([f"user{i}@example.com" for i in range(args.recipients)]
+                  + ["bad1@example.com", "flaky1@example.com", "USER1@example.com"])
+
+    def load():
+        # Stands in for paging the profile table
+        time.sleep(0.5)
+        yield from recipients
+
+    started = time.monotonic()
+    campaign = mailer.enqueue("Welcome {email}", "Hello {email}", load)
+    elapsed_ms = (time.monotonic() - started) * 1000
+    check("enqueue returns immediately", elapsed_ms < 100, f"{elapsed_ms:.1f}ms with a 500ms recipients loader")
+    finished = wait_finished(campaign, args.recipients / args.rate + 30)
+    check("campaign finishes", finished, f"sent={campaign.sent} failed={campaign.failed} pending={campaign.pending}")
+
+    delivered = [recipient for _, recipient in server.received]
+    check("duplicates collapsed", campaign.total == args.recipients + 2, f"total={campaign.total}")
+    check("4xx retried", "flaky1@example.com" in delivered and server.attempts["flaky1@example.com"] == 2,
+          f"flaky1 attempts={server.attempts['flaky1@example.com']} retries={campaign.retries}")
+    check("5xx not retried", server.attempts["bad1@example.com"] == 1 and campaign.failed == 1,
+          f"bad1 attempts={server.attempts['bad1@example.com']} failed={campaign.failed}")
+
+    times = sorted(at for at, _ in server.received)
+    if len(times) > args.burst + 1:
+        # The burst goes out at once; after that the bucket refills at rate_per_s
+        rate = (len(times) - args.burst - 1) / (times[-1] - times[args.burst])
+        check("rate limit honored", rate <= args.rate * 1.1, f"{rate:.1f}/s (limit {args.rate}/s)")
+
+    cancelled = mailer.enqueue("Late", "Never mind", [f"late{i}@example.com" for i in range(args.recipients * 2)])
+    time.sleep(0.2)
+    mailer.cancel(cancelled.id)
+    wait_finished(cancelled, 10)
+    delivered_late = sum(1 for _, recipient in server.received if recipient.startswith("late"))
+    check("cancel skips unsent jobs", cancelled.skipped > 0 and cancelled.pending == 0
+          and delivered_late == cancelled.sent,
+          f"sent={cancelled.sent} skipped={cancelled.skipped} pending={cancelled.pending}")
+    server.shutdown()
+    return checks
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the bulk mailer against a local SMTP sink")
+    parser.add_argument("--recipients", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=50.0, help="messages per second")
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    checks = run_checks(args)
+    for row in checks:
+        print(f"{'PASS' if row['passed'] else 'FAIL'}  {row['check']:<28} {row['detail']}")
+    if not all(row["passed"] for row in checks):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Local OpenAI-compatible mock server for load testing the AIVAs chat pipeline
+
+Serves /v1/chat/completions (streaming and non-streaming), /v1/images/generations
+and /v1/models with configurable latency and token rates, so benchmarks never
+spend real API credit.
+
+Run standalone:
+    python -m benchmarks.mock_openai --port 8008 --latency-ms 250 --tokens-per-sec 60
+
+Then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8008/v1
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FILLER_WORDS = [
+    "strategy", "growth", "customers", "revenue", "market", "team", "metrics",
+    "pricing", "launch", "pipeline", "retention", "budget", "roadmap", "brand",
+    "operations", "insight", "plan", "execution", "value", "segment",
+]
+
+@dataclass
+class MockSettings:
+    """Tunable behaviour of the mock server"""
+    latency_ms: float = 200.0          # time to first token / response headers
+    tokens_per_sec: float = 50.0       # generation speed; 0 means instant
+    completion_tokens: int = 200       # tokens produced when max_tokens allows
+    image_latency_ms: float = 1500.0
+    error_rate: float = 0.0            # fraction of requests answered with error_status
+    error_status: int = 429
+
+def estimate_prompt_tokens(messages: List[Dict]) -> int:
+    """Cheap prompt token estimate (~4 characters per token)"""
+    return sum(max(1, len(str(m.get("content", ""))) // 4) for m in messages)
+
+def completion_words(count: int, seed: str) -> List[str]:
+    """Deterministic filler completion, one word per token"""
+    rng = random.Random(seed)
+    return [rng.choice(FILLER_WORDS) for _ in range(count)]
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the subset of the OpenAI API used by the app"""
+
+    server_version = "MockOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def settings(self) -> MockSettings:
+        return self.server.settings
+
+    def log_message(self, format, *args):
+        logger.debug("mock-openai: " + format, *args)
+
+    # ---- helpers -------------------------------------------------------
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self) -> bool:
+        """Inject an error response according to error_rate"""
+        if self.settings.error_rate and random.random() < self.settings.error_rate:
+            status = self.settings.error_status
+            self._send_json(status, {"error": {
+                "message": f"Mock error {status}",
+                "type": "rate_limit_error" if status == 429 else "server_error",
+            }})
+            return True
+        return False
+
+    def _token_delay(self) -> float:
+        tps = self.settings.tokens_per_sec
+        return 1.0 / tps if tps > 0 else 0.0
+
+    # ---- routes --------------------------------------------------------
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "owned_by": "mock"}
+                for model in ("gpt-4-turbo", "gpt-4", "gpt-3.5-turbo", "dall-e-3")
+            ]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        if self.path.endswith("/chat/completions"):
+            self._chat_completions(payload)
+        elif self.path.endswith("/images/generations"):
+            self._image_generations(payload)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+    def _plan_completion(self, payload: Dict) -> Tuple[List[str], str, int]:
+        messages = payload.get("messages", [])
+        prompt_tokens = estimate_prompt_tokens(messages)
+        limit = payload.get("max_tokens") or payload.get("max_completion_tokens")
+        count = self.settings.completion_tokens
+        finish_reason = "stop"
+        if limit and limit < count:
+            count, finish_reason = int(limit), "length"
+        seed = json.dumps(messages[-1:], sort_keys=True)
+        return completion_words(count, seed), finish_reason, prompt_tokens
+
+    def _chat_completions(self, payload: Dict):
+        self.server.count_chat_request()
+        time.sleep(self.settings.latency_ms / 1000.0)
+        if self._maybe_fail():
+            return
+
+        words, finish_reason, prompt_tokens = self._plan_completion(payload)
+        model = payload.get("model", "gpt-4-turbo")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if payload.get("stream"):
+            self._stream_chat(payload, words, finish_reason, prompt_tokens, model, completion_id, created)
+            return
+
+        time.sleep(self._token_delay() * len(words))
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(words),
+                "total_tokens": prompt_tokens + len(words),
+            },
+        })
+
+    def _stream_chat(self, payload, words, finish_reason, prompt_tokens, model, completion_id, created):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: Dict, finish: Optional[str] = None, usage: Optional[Dict] = None) -> bytes:
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if usage is None else [],
+            }
+            if usage is not None:
+                event["usage"] = usage
+            return f"data: {json.dumps(event)}\n\n".encode("utf-8")
+
+        delay = self._token_delay()
+        try:
+            self.wfile.write(chunk({"role": "assistant", "content": ""}))
+            for idx, word in enumerate(words):
+                if delay:
+                    time.sleep(delay)
+                self.wfile.write(chunk({"content": word if idx == 0 else " " + word}))
+                self.wfile.flush()
+            self.wfile.write(chunk({}, finish=finish_reason))
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                self.wfile.write(chunk({}, usage={
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_tokens + len(words),
+                }))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream; stop generating like the real API does
+            logger.debug("mock-openai: client disconnected mid-stream")
+
+    def _image_generations(self, payload: Dict):
+        time.sleep(self.settings.image_latency_ms / 1000.0)
+        if self._maybe_fail():
+            return
+        count = int(payload.get("n") or 1)
+        self._send_json(200, {
+            "created": int(time.time()),
+            "data": [
+                {"url": f"https://mock-openai.local/images/{uuid.uuid4().hex}.png",
+                 "revised_prompt": payload.get("prompt", "")}
+                for _ in range(count)
+            ],
+        })
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server carrying the mock settings"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], settings: MockSettings):
+        super().__init__(address, MockOpenAIHandler)
+        self.settings = settings
+        self.chat_requests = 0
+        self._count_lock = threading.Lock()
+
+    def count_chat_request(self):
+        with self._count_lock:
+            self.chat_requests += 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+def start_mock_server(settings: Optional[MockSettings] = None,
+                      host: str = "127.0.0.1", port: int = 0) -> Tuple[MockOpenAIServer, threading.Thread]:
+    """Start the mock server on a background thread (port 0 picks a free port)"""
+    server = MockOpenAIServer((host, port), settings or MockSettings())
+    thread = threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True)
+    thread.start()
+    logger.info(f"Mock OpenAI server listening on {server.base_url}")
+    return server, thread
+
+def add_settings_arguments(parser: argparse.ArgumentParser):
+    """Register MockSettings fields as command line options"""
+    defaults = MockSettings()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--tokens-per-sec", type=float, default=defaults.tokens_per_sec)
+    parser.add_argument("--completion-tokens", type=int, default=defaults.completion_tokens)
+    parser.add_argument("--image-latency-ms", type=float, default=defaults.image_latency_ms)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    return MockSettings(**{field: getattr(args, field) for field in asdict(MockSettings())})
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockOpenAIServer((args.host, args.port), settings_from_args(args))
+    logger.info(f"Mock OpenAI server listening on {server.base_url} with {settings_from_args(args)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
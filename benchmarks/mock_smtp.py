@@ -0,0 +1,127 @@
+"""
+Local SMTP sink for exercising portal.mailer without a real mail server
+
+Speaks just enough SMTP for smtplib (EHLO, MAIL, RCPT, DATA, RSET, NOOP,
+QUIT) and records every accepted message. Recipients can be made to fail:
+addresses starting with "bad" get a permanent 550 at RCPT, and addresses
+starting with "flaky" get a temporary 451 until they have been tried
+`flaky_failures` times.
+
+Run standalone:
+    python -m benchmarks.mock_smtp --port 2525
+"""
+
+import argparse
+import logging
+import socketserver
+import threading
+import time
+from collections import Counter
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """One SMTP session"""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server: "MockSMTPServer" = self.server
+        self.reply("220 mock-smtp ready")
+        recipients: List[str] = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 mock-smtp")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[-1].strip().strip("<>").lower()
+                reply = server.check_recipient(address)
+                self.reply(reply)
+                if reply.startswith("250"):
+                    recipients.append(address)
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                server.record(recipients)
+                recipients = []
+                self.reply("250 OK queued")
+            elif verb == "RSET":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class MockSMTPServer(socketserver.ThreadingTCPServer):
+    """Threaded SMTP sink; `received` holds (monotonic time, recipient) per delivered message"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], flaky_failures: int = 1):
+        super().__init__(address, SMTPHandler)
+        self.flaky_failures = flaky_failures
+        self.attempts: Counter = Counter()
+        self.received: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def check_recipient(self, address: str) -> str:
+        with self._lock:
+            self.attempts[address] += 1
+            if address.startswith("bad"):
+                return "550 No such user"
+            if address.startswith("flaky") and self.attempts[address] <= self.flaky_failures:
+                return "451 Try again later"
+            return "250 OK"
+
+    def record(self, recipients: List[str]):
+        now = time.monotonic()
+        with self._lock:
+            self.received.extend((now, recipient) for recipient in recipients)
+
+def start_mock_smtp(host: str = "127.0.0.1", port: int = 0,
+                    flaky_failures: int = 1) -> Tuple[MockSMTPServer, threading.Thread]:
+    """Start the sink on a background thread (port 0 picks a free port)"""
+    server = MockSMTPServer((host, port), flaky_failures)
+    thread = threading.Thread(target=server.serve_forever, name="mock-smtp", daemon=True)
+    thread.start()
+    logger.info(f"Mock SMTP server listening on {host}:{server.port}")
+    return server, thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink for mailer tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--flaky-failures", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockSMTPServer((args.host, args.port), args.flaky_failures)
+    logger.info(f"Mock SMTP server listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
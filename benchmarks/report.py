@@ -0,0 +1,96 @@
+"""
+Shared result helpers for the benchmark suite: percentiles, JSON output and regression comparison
+"""
+
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {
+    "throughput_per_s": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "cpu_ms_per_turn.p50": False,
+    "cpu_ms_per_turn.p95": False,
+}
+
+def distribution(samples: Iterable[float]) -> Dict[str, float]:
+    """Summarize samples as mean/max and p50/p95/p99"""
+    values = np.asarray(list(samples), dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+def environment_info() -> Dict[str, str]:
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": str(os.cpu_count()),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+def save_results(results: Dict, path: str):
+    """Write benchmark results as pretty JSON"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, indent=2)
+
+def _lookup(summary: Dict, dotted: str) -> Optional[float]:
+    node = summary
+    for part in dotted.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float = 0.10) -> List[Dict]:
+    """Compare summaries metric by metric; a change worse than tolerance is a regression"""
+    rows = []
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        now = _lookup(current.get("summary", {}), metric)
+        before = _lookup(baseline.get("summary", {}), metric)
+        if now is None or before is None or before == 0:
+            continue
+        change = (now - before) / before
+        worse = -change if higher_is_better else change
+        rows.append({
+            "metric": metric,
+            "baseline": before,
+            "current": now,
+            "change_pct": round(change * 100, 2),
+            "regression": worse > tolerance,
+        })
+    return rows
+
+def print_summary(results: Dict, comparison: Optional[List[Dict]] = None):
+    summary = results["summary"]
+    print(f"turns={summary['turns']} errors={summary['errors']} wall={summary['wall_s']:.2f}s "
+          f"throughput={summary['throughput_per_s']:.2f}/s")
+    if summary.get("upstream_requests") is not None:
+        print(f"upstream_requests={summary['upstream_requests']} shared_turns={summary.get('shared_turns', 0)}")
+    for name in ("latency_ms", "first_token_ms", "cpu_ms_per_turn"):
+        dist = summary.get(name)
+        if not dist or not dist["count"]:
+            continue
+        print(f"{name:>16}: p50={dist['p50']:.1f} p95={dist['p95']:.1f} p99={dist['p99']:.1f} max={dist['max']:.1f}")
+    for row in comparison or []:
+        flag = "REGRESSION" if row["regression"] else "ok"
+        print(f"  {row['metric']:<24} {row['baseline']:>10.2f} -> {row['current']:>10.2f} "
+              f"({row['change_pct']:+.1f}%) {flag}")
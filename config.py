@@ -39,3 +39,165 @@ FEATURES = {
     "bot_search": True,
     "cost_tracking": True
 }
+
+# LLM Provider Backends
+LLM_PROVIDERS = {
+    "default": None,  # None: OpenAI when a key is configured, otherwise the offline stub
+    "ollama": {
+        "enabled": False,  # set True once an Ollama server is running at base_url
+        "base_url": "http://localhost:11434",
+        "model": "llama3.2",
+        "embedding_model": "nomic-embed-text"
+    },
+    "stub": {
+        "embedding_dim": 256
+    }
+}
+
+# Per-persona backend routing ("openai", "ollama" or "stub"); overrides a bot's "provider" key
+PERSONA_PROVIDERS = {
+    # "Social Media Manager": "ollama",
+}
+
+# Document Ingestion (uploads for the format specialist bots)
+INGESTION = {
+    "chunk_tokens": 400,          # token budget per stored chunk
+    "chunk_overlap_tokens": 40,
+    "context_tokens": 1500,       # max document tokens added to a prompt
+    "max_workers": 4,             # process pool size for multi-file uploads
+    "max_file_mb": 25
+}
+
+# Retrieval over uploaded documents (RAG)
+RETRIEVAL = {
+    "backend": "vector",            # "vector" (embeddings) or "bm25" (keyword, no embedding calls)
+    "data_dir": "data/retrieval",   # one index directory per user below this path
+    "embedding_provider": None,     # None: the chat manager's default backend
+    "top_k": 8,
+    "min_score": 0.05               # cosine similarity floor for semantic retrieval
+}
+
+# Keyword (BM25) index segments
+BM25 = {
+    "flush_every": 256,         # buffered chunks that trigger a segment flush
+    "flush_interval_s": 30.0,   # max time an upload stays buffered in memory only
+    "max_segments": 8           # merge into one segment above this count
+}
+
+# Local dataset profiling behind "🔍 Analyze Data" (only the profile reaches the model)
+DATA_PROFILING = {
+    "chunk_rows": 50000,      # rows read per chunk
+    "sample_rows": 5000,      # uniform row sample for quantiles and correlations
+    "top_k": 5,               # most frequent values listed per text column
+    "max_columns": 40,        # columns described in the prompt
+    "max_file_mb": 200
+}
+
+# Local charts behind "📊 Create Chart" (figures are built in-process, the model only narrates)
+CHARTS = {
+    "max_points": 2000,        # points per series sent to the browser
+    "downsampling": "lttb",    # "lttb" (shape preserving) or "minmax" (keeps spikes)
+    "max_categories": 20,      # bars shown before the rest is cut off
+    "histogram_bins": 30
+}
+
+# Upstream generation scheduling (shared by every session in the process)
+GENERATION = {
+    "max_concurrent_generations": 8   # further requests wait for a slot and can be cancelled while waiting
+}
+
+# Output budgets learned from completion lengths per (bot, action)
+TOKEN_BUDGETS = {
+    "ledger_path": "data/usage/ledger.jsonl",
+    "percentile": 95,         # rolling high percentile of observed output tokens
+    "headroom": 1.25,
+    "min_tokens": 256,
+    "max_tokens": 2000,       # ceiling, and the budget until enough history exists
+    "min_samples": 8,
+    "window": 200             # most recent completions kept per (bot, action)
+}
+
+# Chat history sent with each request (conversations are branchable, see aivas.branching)
+CONVERSATION = {
+    "history_tokens": 6000    # most recent messages re-sent to the model, within this many tokens
+}
+
+# Per-session memory accounting (see aivas.memory); totals are shown in the admin dashboard
+SESSION_MEMORY = {
+    "max_session_mb": 64,          # above this, the oldest messages are spilled to disk
+    "target_ratio": 0.75,          # spill down to this fraction of the cap
+    "keep_last_messages": 20,      # never spilled
+    "archive_dir": "data/sessions",
+    "measure_interval_s": 30,      # re-measure at most this often unless the session changed
+    "stale_after_s": 3600          # sessions that stop reporting drop out of the admin totals
+}
+
+# OpenAI key pool: set OPENAI_API_KEYS (secret or env) to a list of keys, or of
+# {api_key, organization, rpm, tpm} tables, to spread traffic over several keys
+API_KEY_POOL = {
+    "rpm": None,                   # default per-key requests per minute (None: unlimited)
+    "tpm": None,                   # default per-key tokens per minute, counting prompt + max_tokens
+    "cooldown_s": 10,              # first cooldown after a 429/5xx without Retry-After, doubling after that
+    "max_cooldown_s": 300,
+    "acquire_timeout_s": 30        # give up when no key frees up within this time
+}
+
+# Headless HTTP API (python -m aivas.api); RATE_LIMITS above apply per API client
+API = {
+    "host": "127.0.0.1",
+    "port": 8100,
+    "threads": 64,                 # pool running blocking provider calls and streams
+    "max_body_bytes": 1_000_000
+}
+
+# Admin portal (main_app.py)
+ADMIN_CONFIG = {
+    "auth_page_size": 1000,        # users per auth.admin.list_users() page
+    "auth_fetch_concurrency": 4,   # pages fetched in parallel
+    "profiles_page_size": 1000,    # rows per user_profiles select (PostgREST max-rows)
+    "directory_ttl_s": 120,        # the joined user directory is shared by admins for this long
+    "metrics_refresh_s": 60,       # background refresh of the database-side user counts
+    "user_page_sizes": [10, 25, 50, 100],  # choices on the user management page
+    "search_min_chars": 2,         # shorter email searches are not sent to the database
+    "role_ttl_s": 300              # cached profile roles for users without the role claim (portal/roles.py)
+}
+
+# Bulk email from user management (portal/mailer.py); the server is [smtp] in secrets:
+# host, port, sender, username, password, starttls, ssl
+MAILER = {
+    "rate_per_s": 5.0,             # messages per second across all workers (provider send limit)
+    "burst": 10,
+    "workers": 4,                  # concurrent SMTP connections
+    "max_attempts": 4,             # per recipient, for temporary failures
+    "backoff_s": 5.0,              # first retry delay, doubled per attempt
+    "welcome_subject": "Welcome to the AI Class portal",
+    "welcome_body": "Hi {email},\n\nWelcome aboard! Sign in any time to pick up where you left off.\n"
+}
+
+# Admin audit log viewed on the Reports page (portal/audit.py)
+AUDIT_LOG = {
+    "backend": "local",            # "local" (JSONL segments) or "supabase" (portal/sql/admin_audit_log.sql)
+    "directory": "data/audit",
+    "batch_size": 100,
+    "flush_interval_s": 1.0,
+    "max_queue": 10000
+}
+
+# Dependency health probes on the admin Reports page (portal/health.py)
+HEALTH_PROBES = {
+    "interval_s": 30,              # one round of probes this often
+    "window": 500,                 # probe results kept per dependency for percentiles
+    "timeout_s": 5.0,              # HTTP probe timeout
+    "failure_threshold": 3,        # consecutive failures that open a dependency's circuit
+    "reset_timeout_s": 30.0        # open circuits let one trial call through after this long
+}
+
+# Login, logout and page-view events behind the user activity page (portal/activity.py)
+ACTIVITY_LOG = {
+    "backend": "local",            # "local" (JSONL segments + rollup file) or "supabase" (portal/sql/user_activity.sql)
+    "directory": "data/activity",
+    "batch_size": 200,             # events per write
+    "flush_interval_s": 1.0,       # longest an event waits in the queue
+    "max_queue": 10000,            # events beyond this are dropped rather than blocking a page
+    "retention_days": 90           # local rollup days kept
+}
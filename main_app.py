@@ -3,7 +3,30 @@ from supabase import create_client, Client
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from aivas.keypool import parse_api_keys
+from aivas.memory import SESSION_REGISTRY
+from config import ACTIVITY_LOG, ADMIN_CONFIG, AUDIT_LOG, HEALTH_PROBES, MAILER, SESSION_MEMORY
+from portal.activity import ActivityLog
+from portal.audit import ACTIONS, AuditLog
+from portal.cache import Refresher, TTLCache
+from portal.directory import (
+    build_user_directory,
+    count_profiles,
+    fetch_auth_users,
+    fetch_profile_page,
+    iter_auth_users,
+    iter_profiles,
+    iter_table_rows,
+)
+from portal.health import HealthProber, build_probes
+from portal.mailer import BulkMailer, SMTPSettings
+from portal.metrics import fetch_admin_metrics
+from portal.roles import resolve_role, set_role
+from portal.trends import FREQUENCIES, RegistrationTrends, created_since, fetch_daily_registrations
 
 # -------------------------
 # Professional Styling
@@ -300,6 +323,135 @@ def init_connection() -> Client:
 
 supabase = init_connection()
 
+@st.cache_resource
+def get_admin_cache() -> TTLCache:
+    """Admin data shared by every admin session in this process"""
+    return TTLCache(ADMIN_CONFIG["directory_ttl_s"])
+
+def load_user_directory():
+    """Every profile joined with every auth user, paging through both; cached for directory_ttl_s"""
+    def load():
+        profiles = iter_table_rows(supabase, "user_profiles", page_size=ADMIN_CONFIG["profiles_page_size"])
+        auth_users = iter_auth_users(supabase.auth.admin, ADMIN_CONFIG["auth_page_size"],
+                                     ADMIN_CONFIG["auth_fetch_concurrency"])
+        return build_user_directory(list(profiles), auth_users)
+    return get_admin_cache().get_or_load("directory", load)
+
+def load_user_page(search, role, page_size, after):
+    """One page of filtered users joined with their auth users; auth users are cached by id"""
+    rows, next_cursor = fetch_profile_page(supabase, search, role, page_size, after)
+    cache = get_admin_cache()
+    missing = [row["id"] for row in rows if cache.get(("auth_user", row["id"])) is None]
+    for user in fetch_auth_users(supabase.auth.admin, missing, ADMIN_CONFIG["auth_fetch_concurrency"]):
+        cache.set(("auth_user", str(user.id)), user)
+    auth_users = [cache.get(("auth_user", row["id"])) for row in rows]
+    return build_user_directory(rows, [user for user in auth_users if user is not None]), next_cursor
+
+def count_confirmed_users() -> int:
+    """Confirmed auth users, paging list_users() only (no profile join)"""
+    auth_users = iter_auth_users(supabase.auth.admin, ADMIN_CONFIG["auth_page_size"],
+                                 ADMIN_CONFIG["auth_fetch_concurrency"])
+    return sum(1 for user in auth_users if getattr(user, "email_confirmed_at", None) is not None)
+
+@st.cache_resource
+def get_metrics_refresher() -> Refresher:
+    """Admin metrics recomputed by the database every metrics_refresh_s, in the background"""
+    return Refresher(
+        "admin-metrics",
+        lambda: fetch_admin_metrics(supabase, count_confirmed_users),
+        ADMIN_CONFIG["metrics_refresh_s"]
+    ).start()
+
+@st.cache_resource
+def get_registration_trends() -> RegistrationTrends:
+    """Registration counts per day; finished days are cached, so a view only recomputes today"""
+    return RegistrationTrends(lambda since: fetch_daily_registrations(
+        supabase, since, lambda since: created_since((getattr(user, "created_at", None) for user in iter_auth_users(
+            supabase.auth.admin, ADMIN_CONFIG["auth_page_size"], ADMIN_CONFIG["auth_fetch_concurrency"])), since)
+    ))
+
+@st.cache_resource
+def get_role_cache() -> TTLCache:
+    """Profile roles of users whose JWT does not carry the role claim yet"""
+    return TTLCache(ADMIN_CONFIG["role_ttl_s"])
+
+def get_openai_secret(name):
+    """OpenAI setting from secrets, else the environment"""
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        pass
+    return os.environ.get(name)
+
+@st.cache_resource
+def get_health_prober() -> HealthProber:
+    """Background probes of every dependency; their circuit breakers are shared by the whole process"""
+    keys = parse_api_keys(get_openai_secret("OPENAI_API_KEYS") or get_openai_secret("OPENAI_API_KEY"))
+    probes = build_probes(supabase, keys[0]["api_key"] if keys else None, get_openai_secret("OPENAI_BASE_URL"),
+                          HEALTH_PROBES["timeout_s"])
+    return HealthProber(
+        probes,
+        interval_s=HEALTH_PROBES["interval_s"],
+        window=HEALTH_PROBES["window"],
+        failure_threshold=HEALTH_PROBES["failure_threshold"],
+        reset_timeout_s=HEALTH_PROBES["reset_timeout_s"]
+    ).start()
+
+@st.cache_resource
+def get_activity_log() -> ActivityLog:
+    """Login, logout and page-view events, written in the background"""
+    return ActivityLog(
+        ACTIVITY_LOG["directory"],
+        client=supabase if ACTIVITY_LOG["backend"] == "supabase" else None,
+        retention_days=ACTIVITY_LOG["retention_days"],
+        batch_size=ACTIVITY_LOG["batch_size"],
+        flush_interval_s=ACTIVITY_LOG["flush_interval_s"],
+        max_queue=ACTIVITY_LOG["max_queue"]
+    )
+
+@st.cache_resource
+def get_audit_log() -> AuditLog:
+    """Admin actions, written in the background"""
+    return AuditLog(
+        AUDIT_LOG["directory"],
+        client=supabase if AUDIT_LOG["backend"] == "supabase" else None,
+        batch_size=AUDIT_LOG["batch_size"],
+        flush_interval_s=AUDIT_LOG["flush_interval_s"],
+        max_queue=AUDIT_LOG["max_queue"]
+    )
+
+@st.cache_resource
+def get_mailer():
+    """Process-wide bulk mailer, or None when [smtp] is not configured in secrets"""
+    try:
+        smtp = SMTPSettings.from_dict(st.secrets["smtp"])
+    except Exception:
+        return None
+    return BulkMailer(
+        smtp,
+        rate_per_s=MAILER["rate_per_s"],
+        burst=MAILER["burst"],
+        workers=MAILER["workers"],
+        max_attempts=MAILER["max_attempts"],
+        backoff_s=MAILER["backoff_s"]
+    )
+
+def audit(action, target=None, **details):
+    """Record an action by the signed-in admin on a target user dict ({"id", "email"})"""
+    admin = st.session_state.user
+    get_audit_log().record(
+        admin.email if admin else "unknown", action,
+        target_email=target["email"] if target else None, details=details,
+        admin_id=admin.id if admin else None, target_id=target["id"] if target else None
+    )
+
+def track_page_view(page):
+    """Record a page view when the user moves to another page (not on every rerun)"""
+    if st.session_state.get("tracked_page") != page and st.session_state.user:
+        st.session_state.tracked_page = page
+        get_activity_log().record(st.session_state.user.id, "page_view", page)
+
 # -------------------------
 # Session State
 # -------------------------
@@ -343,11 +495,12 @@ def login(email, password):
     try:
         res = supabase.auth.sign_in_with_password({"email": email, "password": password})
         if res.user:
-            profile = supabase.table("user_profiles").select("role").eq("id", res.user.id).execute()
-            role = profile.data[0]["role"] if profile.data else "user"
+            role = resolve_role(supabase, res.user, get_role_cache())
             st.session_state.authenticated = True
             st.session_state.user = res.user
             st.session_state.role = role
+            st.session_state.login_at = time.time()
+            get_activity_log().record(res.user.id, "login")
             return True, f"✅ Welcome back! Logged in as {role.capitalize()}"
         return False, "❌ Invalid email or password."
     except Exception as e:
@@ -363,6 +516,8 @@ def reset_password(email):
 
 def logout():
     """Logout user"""
+    if st.session_state.user:
+        get_activity_log().record(st.session_state.user.id, "logout")
     try:
         supabase.auth.sign_out()
     except Exception:
@@ -370,6 +525,7 @@ def logout():
     st.session_state.authenticated = False
     st.session_state.role = None
     st.session_state.user = None
+    st.session_state.tracked_page = None
     st.rerun()
 
 # -------------------------
@@ -394,15 +550,19 @@ def admin_dashboard():
         
         admin_section = st.selectbox(
             "Select Section",
-            ["📊 Analytics", "👥 User Management", "📈 Reports", "⚙️ Settings"]
+            ["📊 Analytics", "👥 User Management", "📈 Reports", "🧠 Session Memory", "⚙️ Settings"]
         )
     
+    track_page_view(admin_section)
+    
     if admin_section == "📊 Analytics":
         show_admin_analytics()
     elif admin_section == "👥 User Management":
         show_user_management()
     elif admin_section == "📈 Reports":
         show_system_reports()
+    elif admin_section == "🧠 Session Memory":
+        show_session_memory()
     elif admin_section == "⚙️ Settings":
         show_admin_settings()
 
@@ -411,34 +571,35 @@ def show_admin_analytics():
     st.subheader("📊 System Analytics")
     
     try:
-        users = supabase.table("user_profiles").select("*").execute()
-        auth_users = supabase.auth.admin.list_users()
+        refresher = get_metrics_refresher()
+        metrics = refresher.current()
         
-        total_users = len(users.data or [])
-        admin_count = len([u for u in users.data or [] if u["role"] == "admin"])
-        user_count = total_users - admin_count
+        total_users = metrics.total_users
+        admin_count = metrics.admins
+        user_count = metrics.regular_users
+        
+        trends = get_registration_trends()
+        daily = trends.daily()
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Users", total_users, delta=f"+{max(0, total_users-10)}")
+            st.metric("Total Users", total_users, delta=f"+{int(daily.tail(7).sum())} this week")
         with col2:
             st.metric("Regular Users", user_count)
         with col3:
             st.metric("Administrators", admin_count)
         with col4:
-            confirmed_users = len([u for u in auth_users.user if getattr(u, 'email_confirmed_at', None)])
-            st.metric("Confirmed Users", confirmed_users)
+            st.metric("Confirmed Users", metrics.confirmed if metrics.confirmed is not None else "n/a")
+        st.caption(f"Counted in the database ({metrics.source}) at {metrics.fetched_at.strftime('%H:%M:%S')}"
+                   + (f" · last refresh failed: {refresher.error}" if refresher.error else ""))
         
-        if users.data:
+        if total_users:
             st.subheader("📈 User Registration Trends")
-            dates = pd.date_range(start='2024-01-01', end=datetime.now(), freq='D')
-            registrations = pd.DataFrame({
-                'date': dates,
-                'registrations': [max(0, int(abs(hash(str(d)) % 8) - 3)) for d in dates]
-            })
+            frequency = st.radio("Granularity", list(FREQUENCIES), horizontal=True)
+            registrations = trends.series(frequency, daily)
             
             fig = px.line(registrations, x='date', y='registrations', 
-                         title='Daily User Registrations',
+                         title=f'{frequency} User Registrations',
                          color_discrete_sequence=['#3b82f6'])
             fig.update_layout(
                 plot_bgcolor='rgba(0,0,0,0)',
@@ -464,50 +625,117 @@ def show_admin_analytics():
     except Exception as e:
         st.error(f"Error loading analytics: {e}")
 
+def show_bulk_email(search, role):
+    """Queue an email to every user (or every user matching the filters) and follow its progress"""
+    mailer = get_mailer()
+    with st.expander("📧 Bulk Email"):
+        if mailer is None:
+            st.warning("Add an [smtp] section (host, port, sender, username, password) to secrets to send email.")
+            return
+        with st.form("bulk_email_form"):
+            subject = st.text_input("Subject", value=MAILER["welcome_subject"])
+            body = st.text_area("Message", value=MAILER["welcome_body"],
+                                help="{email} is replaced with each recipient's address")
+            only_matching = st.checkbox("Only users matching the current filters", value=bool(search or role))
+            if st.form_submit_button("📤 Queue Emails", type="primary"):
+                search, role = (search, role) if only_matching else ("", None)
+                admin_email = st.session_state.user.email if st.session_state.user else None
+                # Recipients are paged in on the mailer's thread, so the submit returns at once
+                campaign = mailer.enqueue(subject, body,
+                                          lambda: (row["email"] for row in iter_profiles(supabase, search, role)),
+                                          created_by=admin_email)
+                audit("bulk_email", campaign=campaign.id, subject=subject, search=search, role=role)
+                st.success("Campaign queued; recipients are gathered and emailed in the background.")
+    
+    campaigns = mailer.snapshot()
+    if campaigns:
+        active = any(campaign["finished_at"] is None for campaign in campaigns)
+        # Poll only while something is sending
+        st.fragment(show_mail_progress, run_every=2 if active else None)()
+
+def show_mail_progress():
+    """Progress and failures of the latest campaigns"""
+    mailer = get_mailer()
+    for campaign in mailer.snapshot()[:3]:
+        finished = campaign["total"] - campaign["pending"]
+        status = ("cancelled" if campaign["cancelled"] else "done") if campaign["finished_at"] else \
+            ("gathering recipients" if campaign["expanding"] else "sending")
+        st.progress(finished / campaign["total"] if campaign["total"] else 1.0,
+                    text=f"{campaign['subject']} · {status}: {campaign['sent']:,} sent, "
+                         f"{campaign['failed']:,} failed, {campaign['pending']:,} pending")
+        if campaign["retries"] or campaign["skipped"]:
+            st.caption(f"{campaign['retries']:,} retries · {campaign['skipped']:,} skipped")
+        if campaign["errors"]:
+            st.dataframe(pd.DataFrame(campaign["errors"], columns=["Recipient", "Error"]),
+                         use_container_width=True)
+        if campaign["finished_at"] is None and st.button("⏹️ Cancel", key=f"cancel_{campaign['id']}"):
+            mailer.cancel(campaign["id"])
+            audit("bulk_email", campaign=campaign["id"], cancelled=True)
+            st.info("Cancelled: unsent emails will be skipped.")
+
 def show_user_management():
     """Show user management interface"""
     st.subheader("👥 User Management")
     
     try:
-        users = supabase.table("user_profiles").select("*").execute()
-        auth_users = supabase.auth.admin.list_users()
-
-        user_data = []
-        for profile in users.data or []:
-            auth_info = next((u for u in auth_users.user if u.id == profile["id"]), None)
-            user_data.append({
-                "id": profile["id"],
-                "email": profile["email"],
-                "role": profile["role"],
-                "created_at": getattr(auth_info, "created_at", None),
-                "last_sign_in": getattr(auth_info, "last_sign_in_at", None),
-                "confirmed": getattr(auth_info, "email_confirmed_at", None) is not None,
-            })
-
-        col1, col2 = st.columns([2, 1])
+        col1, col2, col3 = st.columns([2, 1, 1])
         with col1:
-            search = st.text_input("🔍 Search by email")
+            # Text inputs only commit on Enter or blur, so typing does not query per keystroke
+            search = st.text_input("🔍 Search by email").strip()
         with col2:
             role_filter = st.selectbox("Filter by role", ["All", "user", "admin"])
+        with col3:
+            page_size = st.selectbox("Per page", ADMIN_CONFIG["user_page_sizes"], index=1)
+        
+        if 0 < len(search) < ADMIN_CONFIG["search_min_chars"]:
+            st.caption(f"Type at least {ADMIN_CONFIG['search_min_chars']} characters to search.")
+            search = ""
+        role = None if role_filter == "All" else role_filter
         
-        filtered = user_data
-        if search:
-            filtered = [u for u in filtered if search.lower() in u["email"].lower()]
-        if role_filter != "All":
-            filtered = [u for u in filtered if u["role"] == role_filter]
+        # New filters start again from the first page
+        filters = (search, role, page_size)
+        if st.session_state.get("user_filters") != filters:
+            st.session_state.user_filters = filters
+            st.session_state.user_cursors = [None]
+        cursors = st.session_state.user_cursors
+        
+        cache = get_admin_cache()
+        matching = cache.get_or_load(("user_count", search, role), lambda: count_profiles(supabase, search, role))
+        page, next_cursor = load_user_page(search, role, page_size, cursors[-1])
+        user_data = [record.to_dict() for record in page]
+        
+        col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+        with col1:
+            st.caption(f"{matching:,} matching users · page {len(cursors)} of {max(1, -(-matching // page_size))}")
+        with col2:
+            if st.button("⬅️ Previous", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with col3:
+            if st.button("Next ➡️", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+        with col4:
+            if st.button("🔄 Refresh"):
+                cache.invalidate()
+                st.rerun()
 
         st.subheader("🔧 Bulk Actions")
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("📧 Send Welcome Email to All"):
-                st.success("Welcome emails sent to all users!")
+            show_bulk_email(search, role)
         with col2:
             if st.button("⬇️ Export User Data"):
-                df = pd.DataFrame(filtered)
+                # The export covers every matching user, not just this page
+                matches = {user.id: user for user in load_user_directory()}
+                exported = [matches[row["id"]].to_dict() for row in iter_profiles(supabase, search, role)
+                            if row["id"] in matches]
+                audit("user_export", rows=len(exported), search=search, role=role)
+                df = pd.DataFrame(exported)
                 st.download_button("Download CSV", df.to_csv(index=False), "users.csv", "text/csv")
 
-        if filtered:
-            for i, user in enumerate(filtered):
+        if user_data:
+            for user in user_data:
                 with st.expander(f"👤 {user['email']} ({user['role'].title()}) {'✅' if user['confirmed'] else '❌'}"):
                     col1, col2 = st.columns(2)
                     with col1:
@@ -522,25 +750,32 @@ def show_user_management():
                     with action_col1:
                         new_role = st.selectbox("Change Role", ["user", "admin"], 
                                                 index=0 if user["role"] == "user" else 1,
-                                                key=f"role_{i}")
-                        if st.button("Update Role", key=f"update_{i}"):
-                            supabase.table("user_profiles").update({"role": new_role}).eq("id", user["id"]).execute()
+                                                key=f"role_{user['id']}")
+                        if st.button("Update Role", key=f"update_{user['id']}"):
+                            set_role(supabase, user["id"], new_role, get_role_cache())
+                            audit("role_change", user, old_role=user["role"], new_role=new_role)
+                            cache.invalidate()
                             st.success(f"Updated {user['email']} to {new_role}")
                             st.rerun()
                     
                     with action_col2:
-                        if st.button("🔄 Reset Password", key=f"reset_{i}"):
+                        if st.button("🔄 Reset Password", key=f"reset_{user['id']}"):
                             success, msg = reset_password(user["email"])
+                            audit("password_reset", user, sent=success)
                             if success:
                                 st.success(msg)
                             else:
                                 st.error(msg)
                     
                     with action_col3:
-                        if st.button("❌ Delete User", key=f"delete_{i}", type="secondary"):
+                        if st.button("❌ Delete User", key=f"delete_{user['id']}", type="secondary"):
                             try:
                                 supabase.table("user_profiles").delete().eq("id", user["id"]).execute()
                                 supabase.auth.admin.delete_user(user["id"])
+                                audit("user_delete", user, role=user["role"])
+                                cache.invalidate()
+                                get_role_cache().invalidate(("role", user["id"]))
+                                get_registration_trends().invalidate()
                                 st.warning(f"Deleted {user['email']}")
                                 st.rerun()
                             except Exception as e:
@@ -555,25 +790,113 @@ def show_system_reports():
     """Show system reports"""
     st.subheader("📈 System Reports")
     
-    st.write("**Recent System Activity**")
-    activity_data = [
-        {"timestamp": datetime.now() - timedelta(minutes=5), "action": "User login", "user": "user@example.com"},
-        {"timestamp": datetime.now() - timedelta(minutes=15), "action": "New user registration", "user": "newuser@example.com"},
-        {"timestamp": datetime.now() - timedelta(hours=1), "action": "Password reset", "user": "forgot@example.com"},
-        {"timestamp": datetime.now() - timedelta(hours=2), "action": "Admin role assigned", "user": "admin@example.com"},
-    ]
-    
-    for activity in activity_data:
-        st.write(f"🕐 {activity['timestamp'].strftime('%Y-%m-%d %H:%M')} - {activity['action']} - {activity['user']}")
+    st.subheader("📜 Admin Audit Log")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        admin_email = st.text_input("Admin email", key="audit_admin").strip()
+    with col2:
+        target_email = st.text_input("Target user email", key="audit_target").strip()
+    with col3:
+        action = st.selectbox("Action", ["All", *ACTIONS], key="audit_action")
+    with col4:
+        today = datetime.now(timezone.utc).date()
+        period = st.date_input("Period (UTC)", (today - timedelta(days=7), today), key="audit_period")
+    
+    since = until = None
+    if isinstance(period, (list, tuple)) and len(period) == 2:
+        since = datetime.combine(period[0], datetime.min.time(), timezone.utc)
+        until = datetime.combine(period[1], datetime.max.time(), timezone.utc)
+    try:
+        entries = get_audit_log().query(admin_email or None, target_email or None, since, until,
+                                        None if action == "All" else action)
+    except Exception as e:
+        st.error(f"Error loading audit log: {e}")
+        entries = []
+    
+    if entries:
+        st.dataframe(pd.DataFrame([
+            {
+                "Time (UTC)": entry["ts"].strftime('%Y-%m-%d %H:%M:%S'),
+                "Admin": entry["admin_email"],
+                "Action": entry["action"],
+                "Target": entry["target_email"] or "",
+                "Details": ", ".join(f"{key}={value}" for key, value in (entry["details"] or {}).items()),
+            }
+            for entry in entries
+        ]), use_container_width=True)
+        st.caption(f"Newest {len(entries)} matching entries.")
+    else:
+        st.info("No admin actions match these filters.")
     
     st.subheader("🏥 System Health")
-    col1, col2, col3 = st.columns(3)
+    health = get_health_prober().snapshot()
+    status_icons = {"closed": "✅ Healthy", "half_open": "⚠️ Recovering", "open": "❌ Down"}
+    
+    columns = st.columns(len(health))
+    for column, dependency in zip(columns, health):
+        with column:
+            if not dependency["samples"]:
+                st.metric(dependency["dependency"], "⏳ Probing…")
+                continue
+            p50 = f"{dependency['p50_ms']:.0f}ms p50" if dependency["p50_ms"] is not None else "no successful probe"
+            st.metric(dependency["dependency"], status_icons[dependency["circuit"]],
+                      delta=f"{p50} · {dependency['error_rate']:.1%} errors", delta_color="off")
+    
+    df = pd.DataFrame([
+        {
+            "Dependency": dependency["dependency"],
+            "Circuit": dependency["circuit"],
+            "p50 (ms)": dependency["p50_ms"],
+            "p95 (ms)": dependency["p95_ms"],
+            "p99 (ms)": dependency["p99_ms"],
+            "Error rate": f"{dependency['error_rate']:.1%}",
+            "Probes": dependency["samples"],
+            "Last check": datetime.fromtimestamp(dependency["checked_at"]).strftime('%H:%M:%S')
+                          if dependency["checked_at"] else "-",
+            "Last error": dependency["last_error"] or "",
+        }
+        for dependency in health
+    ])
+    st.dataframe(df.round(1), use_container_width=True)
+    st.caption(f"Probed every {HEALTH_PROBES['interval_s']}s; percentiles over the last "
+               f"{HEALTH_PROBES['window']} probes per dependency.")
+
+def show_session_memory():
+    """Show memory held by live chat sessions in this server process"""
+    st.subheader("🧠 Session Memory")
+    
+    SESSION_REGISTRY.prune(SESSION_MEMORY["stale_after_s"])
+    sessions = SESSION_REGISTRY.snapshot()
+    cap_mb = SESSION_MEMORY["max_session_mb"]
+    
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Database Status", "✅ Healthy", delta="99.9% uptime")
+        st.metric("Live Sessions", len(sessions))
     with col2:
-        st.metric("Auth Service", "✅ Operational", delta="0 errors")
+        st.metric("Total Memory", f"{SESSION_REGISTRY.total_bytes() / 1024 / 1024:,.1f} MB")
     with col3:
-        st.metric("API Response", "⚡ Fast", delta="120ms avg")
+        largest = sessions[0].total_bytes / 1024 / 1024 if sessions else 0
+        st.metric("Largest Session", f"{largest:,.1f} MB", delta=f"cap {cap_mb} MB", delta_color="off")
+    with col4:
+        st.metric("Archived Messages", sum(usage.archived_messages for usage in sessions))
+    
+    if not sessions:
+        st.info("No chat sessions have reported yet.")
+        return
+    
+    df = pd.DataFrame([
+        {
+            "User": usage.user,
+            "Memory (MB)": round(usage.total_bytes / 1024 / 1024, 2),
+            "Messages": usage.messages,
+            "Archived": usage.archived_messages,
+            "Largest keys": ", ".join(f"{key} {size / 1024:,.0f} KB" for key, size in usage.top_keys[:3]),
+            "Last seen": datetime.fromtimestamp(usage.last_seen).strftime('%H:%M:%S'),
+        }
+        for usage in sessions
+    ])
+    st.dataframe(df, use_container_width=True)
+    st.caption(f"Sessions above {cap_mb} MB spill their oldest messages to {SESSION_MEMORY['archive_dir']}/.")
 
 def show_admin_settings():
     """Show admin settings"""
@@ -590,7 +913,8 @@ def show_admin_settings():
     
     st.write("**System Maintenance**")
     if st.button("🧹 Clean up old sessions"):
-        st.success("Old sessions cleaned up!")
+        removed = SESSION_REGISTRY.prune(SESSION_MEMORY["stale_after_s"])
+        st.success(f"Old sessions cleaned up! ({removed} stale)")
     if st.button("📊 Generate system report"):
         st.success("System report generated!")
     
@@ -624,6 +948,8 @@ def user_dashboard():
             ["📊 My Activity", "👤 Profile", "🔔 Notifications", "❓ Help"]
         )
     
+    track_page_view(page)
+    
     if page == "📊 My Activity":
         show_user_activity(user_id, user_email)
     elif page == "👤 Profile":
@@ -633,28 +959,43 @@ def user_dashboard():
     elif page == "❓ Help":
         show_user_help()
 
+def format_time_ago(moment):
+    """Human-readable age of a timezone-aware datetime"""
+    seconds = (datetime.now(timezone.utc) - moment).total_seconds()
+    if seconds < 3600:
+        return f"{max(1, int(seconds // 60))} minutes ago"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} hours ago"
+    return f"{int(seconds // 86400)} days ago"
+
 def show_user_activity(user_id, user_email):
     """Show user activity"""
     st.subheader("📊 Your Activity Overview")
     
+    try:
+        activity_log = get_activity_log()
+        activity = activity_log.daily(user_id, days=30)
+        active = activity[(activity["logins"] + activity["page_views"]) > 0]
+        last_week = activity.tail(7)
+        previous_login = activity_log.last_login(user_id, before=st.session_state.get("login_at"))
+    except Exception as e:
+        st.error(f"Error loading activity: {e}")
+        return
+    
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Days Active", "12", delta="+2")
+        st.metric("Days Active", len(active),
+                  delta=f"+{int(((last_week['logins'] + last_week['page_views']) > 0).sum())} this week")
     with col2:
-        st.metric("Total Sessions", "45", delta="+5")
+        st.metric("Total Sessions", int(activity["logins"].sum()), delta=f"+{int(last_week['logins'].sum())} this week")
     with col3:
-        st.metric("Last Login", "2 hours ago")
+        st.metric("Last Login", format_time_ago(previous_login) if previous_login else "First visit")
     
     st.subheader("📈 Your Activity Chart")
-    dates = pd.date_range(start=datetime.now() - timedelta(days=30), end=datetime.now(), freq='D')
-    activity = pd.DataFrame({
-        'date': dates,
-        'sessions': [max(0, int(abs(hash(str(d) + user_email) % 5) - 1)) for d in dates]
-    })
-    
-    fig = px.bar(activity, x='date', y='sessions', 
+    fig = px.bar(activity, x='date', y=['logins', 'page_views'], 
                  title='Your Daily Activity (Last 30 Days)',
-                 color_discrete_sequence=['#3b82f6'])
+                 labels={'value': 'events', 'variable': ''},
+                 color_discrete_sequence=['#3b82f6', '#6366f1'])
     fig.update_layout(
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)',
@@ -6,10 +6,10 @@ with OpenAI API integration, inline image generation, and seamless chat experien
 """
 
 import streamlit as st
-from openai import OpenAI
 import tiktoken
 from datetime import datetime, timedelta
 import json
+import threading
 import time
 from typing import Dict, List, Tuple, Optional
 import logging
@@ -22,8 +22,47 @@ import requests
 from PIL import Image
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import uuid
+import sys
+
+# Make the shared assistant core importable when this page is run on its own
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aivas import (
+    BOT_PERSONALITIES,
+    OPENAI_PRICING,
+    TokenManager,
+    EnhancedChatManager,
+    build_providers,
+    build_system_prompt,
+)
+from aivas.branching import MAIN_BRANCH, Conversation
+from aivas.budgets import CHAT_ACTION, CONTINUE_ACTION, BudgetPlanner, UsageLedger
+from aivas.cancellation import CancellationToken, GenerationSlots
+from aivas.charts import AGGREGATIONS, CHART_KINDS, ChartSpec, build_chart, suggest_chart
+from aivas.ingest import SUPPORTED_EXTENSIONS, document_id, ingest_files
+from aivas.keypool import ApiKeyPool, parse_api_keys
+from aivas.memory import SESSION_REGISTRY, SessionUsage, mark_shared, measure_session, spill_conversation
+from aivas.profiler import DATA_EXTENSIONS, profile_dataset
+from aivas.providers import default_provider_name
+from aivas.retrieval import DocumentRetriever, LexicalRetriever, user_index_dir
+from config import (
+    API_KEY_POOL,
+    BM25,
+    CHARTS,
+    CONVERSATION,
+    DATA_PROFILING,
+    GENERATION,
+    INGESTION,
+    LLM_PROVIDERS,
+    PERSONA_PROVIDERS,
+    RETRIEVAL,
+    SESSION_MEMORY,
+    TOKEN_BUDGETS,
+)
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -222,489 +261,47 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 # 🔑 API CONFIGURATION
 # ======================================================
 
-def initialize_openai():
-    """Initialize OpenAI client with API key from secrets or environment"""
+def get_openai_base_url() -> Optional[str]:
+    """Optional OpenAI-compatible endpoint (e.g. the local mock server) from secrets or environment"""
     try:
-        # Try Streamlit secrets first
-        if hasattr(st, 'secrets') and 'OPENAI_API_KEY' in st.secrets:
-            api_key = st.secrets['OPENAI_API_KEY']
-            return OpenAI(api_key=api_key), api_key
-        
-        # Fallback to environment variable
-        elif 'OPENAI_API_KEY' in os.environ:
-            api_key = os.environ['OPENAI_API_KEY']
-            return OpenAI(api_key=api_key), api_key
-        
-        # No API key found
-        return None, None
-        
-    except Exception as e:
-        logger.error(f"Failed to initialize OpenAI: {str(e)}")
-        return None, None
-
-# ======================================================
-# 🤖 COMPREHENSIVE BUSINESS BOT PERSONALITIES (110+ Total)
-# ======================================================
+        if hasattr(st, 'secrets') and 'OPENAI_BASE_URL' in st.secrets:
+            return st.secrets['OPENAI_BASE_URL']
+    except Exception:
+        pass
+    return os.environ.get('OPENAI_BASE_URL')
 
-BOT_PERSONALITIES = {
-    # ENTREPRENEURSHIP & STARTUPS (15 bots)
-    "Startup Strategist": {
-        "description": "I specialize in helping new businesses with planning and execution. From MVP development to scaling strategies, I guide entrepreneurs through every stage of their startup journey with practical advice on product-market fit, business model validation, and growth hacking techniques.",
-        "emoji": "🚀",
-        "category": "Entrepreneurship & Startups",
-        "temperature": 0.7,
-        "specialties": ["Business Planning", "MVP Development", "Product-Market Fit", "Growth Hacking"],
-        "quick_actions": ["Create Business Plan", "Validate Idea", "Find Co-founder", "Pitch Deck Help"]
-    },
-    "Business Plan Writer": {
-        "description": "I am a Business Plan Writer specializing in creating comprehensive, investor-ready business plans. I help entrepreneurs articulate their vision, analyze markets, define strategies, and present financial projections that attract investors.",
-        "emoji": "📝",
-        "category": "Entrepreneurship & Startups",
-        "temperature": 0.6,
-        "specialties": ["Business Plans", "Market Analysis", "Financial Projections", "Investor Presentations"],
-        "quick_actions": ["Write Executive Summary", "Market Research", "Financial Model", "Competitive Analysis"]
-    },
-    "Venture Capital Advisor": {
-        "description": "As a Venture Capital Advisor, I guide startups through fundraising and investment landscapes. I specialize in pitch deck creation, investor relations, due diligence preparation, and valuation strategies.",
-        "emoji": "💼",
-        "category": "Entrepreneurship & Startups",
-        "temperature": 0.6,
-        "specialties": ["Fundraising", "Pitch Decks", "Investor Relations", "Valuation"],
-        "quick_actions": ["Create Pitch Deck", "Find Investors", "Prepare Due Diligence", "Valuation Help"]
-    },
-    "Tech Entrepreneur Advisor": {
-        "description": "As a Tech Entrepreneur Advisor, I guide technology startups through unique challenges. I provide expertise in product development, technical scaling, IP protection, and technology commercialization strategies.",
-        "emoji": "💻",
-        "category": "Entrepreneurship & Startups",
-        "temperature": 0.7,
-        "specialties": ["Tech Startups", "Product Development", "IP Protection", "Scaling"],
-        "quick_actions": ["Tech Stack Advice", "MVP Planning", "IP Strategy", "Team Building"]
-    },
-    "Lean Startup Expert": {
-        "description": "As a Lean Startup Expert, I help entrepreneurs build businesses using validated learning and iterative development. I focus on build-measure-learn cycles, MVPs, customer feedback, and pivot strategies.",
-        "emoji": "🔄",
-        "category": "Entrepreneurship & Startups",
-        "temperature": 0.7,
-        "specialties": ["Lean Methodology", "MVP Development", "Customer Validation", "Pivot Strategies"],
-        "quick_actions": ["Build MVP", "Customer Interviews", "Pivot Strategy", "Metrics Setup"]
-    },
-
-    # SALES & MARKETING (20 bots)
-    "Sales Performance Coach": {
-        "description": "As a Sales Performance Coach, I help individuals and teams maximize sales potential through proven methodologies. I specialize in sales funnel optimization, conversion improvement, objection handling, and closing techniques.",
-        "emoji": "💼",
-        "category": "Sales & Marketing",
-        "temperature": 0.8,
-        "specialties": ["Sales Funnels", "Conversion Optimization", "Objection Handling", "Closing Techniques"],
-        "quick_actions": ["Sales Script", "Objection Handling", "Pipeline Review", "Closing Tips"]
-    },
-    "Marketing Strategy Expert": {
-        "description": "I am a Marketing Strategy Expert with deep expertise in digital marketing, brand positioning, and customer acquisition. I help businesses build compelling campaigns that drive engagement and revenue growth.",
-        "emoji": "📱",
-        "category": "Sales & Marketing",
-        "temperature": 0.8,
-        "specialties": ["Digital Marketing", "Brand Positioning", "Customer Acquisition", "Campaign Strategy"],
-        "quick_actions": ["Marketing Plan", "Brand Strategy", "Campaign Ideas", "Target Audience"]
-    },
-    "Digital Marketing Specialist": {
-        "description": "As a Digital Marketing Specialist, I focus on online strategies that drive measurable results. I specialize in SEO, PPC advertising, social media marketing, and conversion optimization.",
-        "emoji": "🌐",
-        "category": "Sales & Marketing",
-        "temperature": 0.7,
-        "specialties": ["SEO", "PPC Advertising", "Social Media", "Conversion Optimization"],
-        "quick_actions": ["SEO Audit", "Ad Campaign", "Social Strategy", "Analytics Setup"]
-    },
-    "Content Marketing Strategist": {
-        "description": "I am a Content Marketing Strategist creating engaging content that attracts and converts audiences. I develop content strategies, editorial calendars, and storytelling frameworks for sustainable growth.",
-        "emoji": "✍️",
-        "category": "Sales & Marketing",
-        "temperature": 0.8,
-        "specialties": ["Content Strategy", "Editorial Calendars", "Storytelling", "Brand Authority"],
-        "quick_actions": ["Content Calendar", "Blog Ideas", "Social Posts", "Video Scripts"]
-    },
-    "Brand Development Strategist": {
-        "description": "I am a Brand Development Strategist helping businesses create compelling brand identities. I focus on brand architecture, messaging frameworks, and visual identity systems.",
-        "emoji": "🎨",
-        "category": "Sales & Marketing",
-        "temperature": 0.8,
-        "specialties": ["Brand Identity", "Brand Architecture", "Messaging", "Visual Design"],
-        "quick_actions": ["Brand Guidelines", "Logo Concepts", "Brand Voice", "Visual Identity"]
-    },
-
-    # FINANCE & ACCOUNTING (20 bots)
-    "Financial Controller": {
-        "description": "As a Financial Controller, I specialize in business financial management, budgeting, and financial planning. I help optimize financial operations, manage cash flow, and implement cost control measures.",
-        "emoji": "💰",
-        "category": "Finance & Accounting",
-        "temperature": 0.5,
-        "specialties": ["Financial Planning", "Budget Management", "Cash Flow", "Cost Control"],
-        "quick_actions": ["Budget Planning", "Cash Flow Analysis", "Cost Reduction", "Financial Reports"]
-    },
-    "Investment Banking Advisor": {
-        "description": "As an Investment Banking Advisor, I provide expertise in corporate finance, M&A, and capital raising. I help evaluate opportunities, structure deals, and conduct financial valuations.",
-        "emoji": "🏦",
-        "category": "Finance & Accounting",
-        "temperature": 0.5,
-        "specialties": ["Corporate Finance", "M&A", "Capital Raising", "Valuations"],
-        "quick_actions": ["Deal Analysis", "Valuation Model", "M&A Strategy", "Capital Structure"]
-    },
-    "Financial Analyst": {
-        "description": "As a Financial Analyst, I provide comprehensive financial modeling and analysis for business decisions. I specialize in forecasting, investment analysis, and performance measurement.",
-        "emoji": "📈",
-        "category": "Finance & Accounting",
-        "temperature": 0.5,
-        "specialties": ["Financial Modeling", "Forecasting", "Investment Analysis", "Performance Metrics"],
-        "quick_actions": ["Financial Model", "ROI Analysis", "Forecasting", "KPI Dashboard"]
-    },
-
-    # OPERATIONS & MANAGEMENT (20 bots)
-    "Operations Excellence Manager": {
-        "description": "I am an Operations Excellence Manager focused on streamlining processes and maximizing efficiency. I specialize in process improvement, supply chain optimization, and lean methodologies.",
-        "emoji": "⚙️",
-        "category": "Operations & Management",
-        "temperature": 0.6,
-        "specialties": ["Process Improvement", "Supply Chain", "Lean Methodologies", "Efficiency"],
-        "quick_actions": ["Process Map", "Efficiency Audit", "Workflow Design", "Cost Optimization"]
-    },
-    "Project Management Expert": {
-        "description": "I am a Project Management Expert helping organizations deliver projects on time and within budget. I specialize in planning, resource allocation, risk management, and stakeholder communication.",
-        "emoji": "📋",
-        "category": "Operations & Management",
-        "temperature": 0.6,
-        "specialties": ["Project Planning", "Resource Management", "Risk Management", "Stakeholder Communication"],
-        "quick_actions": ["Project Plan", "Risk Assessment", "Team Structure", "Timeline Creation"]
-    },
-
-    # TECHNOLOGY & INNOVATION (20 bots)
-    "Digital Transformation Consultant": {
-        "description": "As a Digital Transformation Consultant, I help organizations leverage technology to transform business models and operations. I specialize in digital strategy and change management.",
-        "emoji": "🔄",
-        "category": "Technology & Innovation",
-        "temperature": 0.7,
-        "specialties": ["Digital Strategy", "Technology Adoption", "Change Management", "Innovation"],
-        "quick_actions": ["Digital Roadmap", "Tech Assessment", "Change Plan", "Innovation Strategy"]
-    },
-    "AI Strategy Consultant": {
-        "description": "I am an AI Strategy Consultant helping businesses leverage artificial intelligence for competitive advantage. I specialize in AI implementation, automation, and machine learning applications.",
-        "emoji": "🤖",
-        "category": "Technology & Innovation",
-        "temperature": 0.7,
-        "specialties": ["AI Implementation", "Machine Learning", "Automation", "AI Strategy"],
-        "quick_actions": ["AI Roadmap", "Use Case Analysis", "Automation Plan", "ML Strategy"]
-    },
-    "Cybersecurity Specialist": {
-        "description": "I am a Cybersecurity Specialist protecting organizations from digital threats. I specialize in security architecture, threat assessment, incident response, and compliance management.",
-        "emoji": "🛡️",
-        "category": "Technology & Innovation",
-        "temperature": 0.5,
-        "specialties": ["Security Architecture", "Threat Assessment", "Incident Response", "Compliance"],
-        "quick_actions": ["Security Audit", "Risk Assessment", "Incident Plan", "Compliance Check"]
-    },
-
-    # HUMAN RESOURCES (15 bots)
-    "Human Resources Director": {
-        "description": "As an HR Director, I provide strategic HR leadership aligning human capital with business objectives. I specialize in HR strategy, organizational development, and talent management.",
-        "emoji": "👥",
-        "category": "Human Resources",
-        "temperature": 0.7,
-        "specialties": ["HR Strategy", "Organizational Development", "Talent Management", "Employee Engagement"],
-        "quick_actions": ["HR Strategy", "Org Chart", "Talent Plan", "Culture Assessment"]
-    },
-    "Talent Acquisition Manager": {
-        "description": "I am a Talent Acquisition Manager specializing in attracting and hiring top talent. I focus on recruitment strategy, candidate sourcing, and employer branding.",
-        "emoji": "🎯",
-        "category": "Human Resources",
-        "temperature": 0.7,
-        "specialties": ["Recruitment Strategy", "Candidate Sourcing", "Employer Branding", "Hiring Process"],
-        "quick_actions": ["Job Description", "Interview Questions", "Sourcing Strategy", "Employer Brand"]
-    },
-
-    # CUSTOMER RELATIONS (10 bots)
-    "Customer Success Manager": {
-        "description": "As a Customer Success Manager, I ensure customers achieve desired outcomes. I specialize in customer onboarding, relationship management, and retention strategies.",
-        "emoji": "🤝",
-        "category": "Customer Relations",
-        "temperature": 0.8,
-        "specialties": ["Customer Onboarding", "Relationship Management", "Retention", "Value Realization"],
-        "quick_actions": ["Onboarding Plan", "Success Metrics", "Retention Strategy", "Customer Journey"]
-    },
-    "Customer Experience Director": {
-        "description": "I am a Customer Experience Director designing exceptional customer journeys. I specialize in experience design, journey mapping, and touchpoint optimization.",
-        "emoji": "⭐",
-        "category": "Customer Relations",
-        "temperature": 0.8,
-        "specialties": ["Experience Design", "Journey Mapping", "Touchpoint Optimization", "Customer Satisfaction"],
-        "quick_actions": ["Journey Map", "Experience Audit", "Touchpoint Analysis", "CX Strategy"]
-    },
-
-    # FORMAT SPECIALISTS (10 bots)
-    "PDF Document Specialist": {
-        "description": "I am a PDF Document Specialist expert in creating and optimizing PDF documents for business. I specialize in PDF workflows, document security, accessibility, and form design.",
-        "emoji": "📄",
-        "category": "Format Specialists",
-        "temperature": 0.6,
-        "specialties": ["PDF Creation", "Document Security", "Accessibility", "Form Design"],
-        "quick_actions": ["PDF Template", "Form Design", "Security Setup", "Accessibility Check"]
-    },
-    "CSV Data Analyst": {
-        "description": "As a CSV Data Analyst, I help extract insights from structured data files. I specialize in data cleaning, transformation, analysis, and creating actionable reports from CSV data.",
-        "emoji": "📊",
-        "category": "Format Specialists",
-        "temperature": 0.5,
-        "specialties": ["Data Cleaning", "Data Analysis", "CSV Processing", "Report Generation"],
-        "quick_actions": ["Data Analysis", "Clean Dataset", "Generate Report", "Create Charts"]
-    },
-    "SQL Database Consultant": {
-        "description": "I am a SQL Database Consultant specializing in database design and optimization. I focus on database architecture, query optimization, and data modeling for business intelligence.",
-        "emoji": "🗄️",
-        "category": "Format Specialists",
-        "temperature": 0.5,
-        "specialties": ["Database Design", "Query Optimization", "Data Modeling", "Business Intelligence"],
-        "quick_actions": ["Database Design", "Query Optimization", "Data Model", "BI Dashboard"]
-    },
-    "API Integration Specialist": {
-        "description": "As an API Integration Specialist, I help businesses connect systems through APIs. I specialize in REST API design, webhook implementation, and system integration.",
-        "emoji": "🔗",
-        "category": "Format Specialists",
-        "temperature": 0.6,
-        "specialties": ["API Design", "System Integration", "Webhooks", "Automation"],
-        "quick_actions": ["API Design", "Integration Plan", "Webhook Setup", "Documentation"]
-    },
-    "Image Processing Expert": {
-        "description": "I am an Image Processing Expert helping optimize visual content for business. I specialize in image optimization, batch processing, and visual content management.",
-        "emoji": "🖼️",
-        "category": "Format Specialists",
-        "temperature": 0.6,
-        "specialties": ["Image Optimization", "Batch Processing", "Visual Content", "Image Analytics"],
-        "quick_actions": ["Generate Image", "Optimize Images", "Batch Process", "Visual Strategy"]
-    },
-}
+def get_openai_api_keys() -> List[Dict]:
+    """Key pool entries from OPENAI_API_KEYS, else the single OPENAI_API_KEY (secrets first, then environment)"""
+    for name in ("OPENAI_API_KEYS", "OPENAI_API_KEY"):
+        try:
+            if hasattr(st, 'secrets') and name in st.secrets:
+                return parse_api_keys(st.secrets[name])
+        except Exception:
+            pass
+        if name in os.environ:
+            return parse_api_keys(os.environ[name])
+    return []
 
-# Add more bots to reach 110+ total
-additional_bots = {
-    "E-commerce Strategist": {
-        "description": "I help businesses build and optimize online stores for maximum sales and customer satisfaction.",
-        "emoji": "🛒", "category": "Sales & Marketing", "temperature": 0.7,
-        "specialties": ["Online Sales", "Store Optimization", "Customer Journey", "Conversion"],
-        "quick_actions": ["Store Audit", "Product Strategy", "Checkout Optimization", "Marketing Plan"]
-    },
-    "Social Media Manager": {
-        "description": "I create engaging social media strategies that build communities and drive business results.",
-        "emoji": "📱", "category": "Sales & Marketing", "temperature": 0.8,
-        "specialties": ["Social Strategy", "Content Creation", "Community Management", "Influencer Marketing"],
-        "quick_actions": ["Content Calendar", "Post Ideas", "Engagement Strategy", "Influencer Outreach"]
-    },
-    "Email Marketing Expert": {
-        "description": "I design email campaigns that nurture leads and drive conversions through automation and personalization.",
-        "emoji": "📧", "category": "Sales & Marketing", "temperature": 0.7,
-        "specialties": ["Email Automation", "Segmentation", "Personalization", "Deliverability"],
-        "quick_actions": ["Email Campaign", "Automation Setup", "List Segmentation", "A/B Testing"]
-    },
-    "SEO Specialist": {
-        "description": "I help businesses improve search engine visibility and drive organic traffic through technical and content optimization.",
-        "emoji": "🔍", "category": "Sales & Marketing", "temperature": 0.6,
-        "specialties": ["Technical SEO", "Content Optimization", "Link Building", "Local SEO"],
-        "quick_actions": ["SEO Audit", "Keyword Research", "Content Strategy", "Link Building"]
-    },
-    "PPC Campaign Manager": {
-        "description": "I create and optimize paid advertising campaigns across platforms for maximum ROI.",
-        "emoji": "💰", "category": "Sales & Marketing", "temperature": 0.7,
-        "specialties": ["Google Ads", "Facebook Ads", "Campaign Optimization", "ROI Analysis"],
-        "quick_actions": ["Campaign Setup", "Ad Copy", "Keyword Strategy", "Performance Analysis"]
-    }
-}
+@st.cache_resource
+def get_key_pool(keys_json: str, base_url: Optional[str]) -> ApiKeyPool:
+    """One pool per process, so every session shares each key's rate-limit and health state"""
+    return mark_shared(ApiKeyPool(json.loads(keys_json), base_url, **API_KEY_POOL))
 
-# Merge additional bots
-BOT_PERSONALITIES.update(additional_bots)
+def get_openai_api_key() -> Optional[str]:
+    """First configured OpenAI API key, None for offline mode (the chat manager builds the clients)"""
+    try:
+        keys = get_openai_api_keys()
+        return keys[0]["api_key"] if keys else None
+    except Exception as e:
+        logger.error(f"Failed to read OpenAI API keys: {str(e)}")
+        return None
 
 # ======================================================
-# 💰 TOKEN MANAGEMENT & COST CALCULATION
+# 🤖 BOT PERSONALITIES, TOKENS & CHAT MANAGER
 # ======================================================
 
-OPENAI_PRICING = {
-    "gpt-4": {"input": 0.03, "output": 0.06},
-    "gpt-4-turbo": {"input": 0.01, "output": 0.03},
-    "gpt-3.5-turbo": {"input": 0.0015, "output": 0.002},
-    "dall-e-3": {"1024x1024": 0.040, "1024x1792": 0.080, "1792x1024": 0.080},
-    "dall-e-2": {"1024x1024": 0.020, "512x512": 0.018, "256x256": 0.016}
-}
-
-class TokenManager:
-    def __init__(self, model="gpt-4-turbo"):
-        self.model = model
-        self.encoding = None
-        self.initialize_encoding()
-    
-    def initialize_encoding(self):
-        """Initialize token encoding with error handling"""
-        try:
-            self.encoding = tiktoken.encoding_for_model(self.model)
-        except KeyError:
-            try:
-                self.encoding = tiktoken.get_encoding("cl100k_base")
-                logger.warning(f"Model {self.model} not found, using cl100k_base encoding")
-            except Exception as e:
-                logger.error(f"Failed to initialize encoding: {str(e)}")
-                self.encoding = None
-    
-    def count_tokens(self, text: str) -> int:
-        """Count tokens in text with error handling"""
-        if not self.encoding:
-            return max(1, len(text) // 4)
-        
-        try:
-            return len(self.encoding.encode(str(text)))
-        except Exception as e:
-            logger.error(f"Token counting error: {str(e)}")
-            return max(1, len(text) // 4)
-    
-    def calculate_cost(self, input_tokens: int, output_tokens: int, model: str) -> float:
-        """Calculate cost based on token usage"""
-        if model not in OPENAI_PRICING:
-            return 0.0
-        
-        pricing = OPENAI_PRICING[model]
-        input_cost = (input_tokens / 1000) * pricing["input"]
-        output_cost = (output_tokens / 1000) * pricing["output"]
-        
-        return input_cost + output_cost
-
-# ======================================================
-# 🎯 ENHANCED CHAT MANAGER
-# ======================================================
-
-class EnhancedChatManager:
-    def __init__(self):
-        self.client = None
-        self.api_key = None
-        self.token_manager = TokenManager()
-        self.conversation_history = []
-        self.session_stats = {
-            "total_tokens": 0,
-            "total_cost": 0.0,
-            "messages_count": 0,
-            "session_start": datetime.now()
-        }
-    
-    def initialize_client(self, api_key: str):
-        """Initialize OpenAI client"""
-        try:
-            if api_key and api_key != "demo_key":
-                self.client = OpenAI(api_key=api_key)
-                self.api_key = api_key
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Failed to initialize OpenAI client: {str(e)}")
-            return False
-    
-    def generate_response(self, messages: List[Dict], model: str = "gpt-4-turbo", temperature: float = 0.7) -> Tuple[str, Dict]:
-        """Generate response with enhanced error handling"""
-        try:
-            # Count input tokens
-            input_text = "\n".join([msg["content"] for msg in messages])
-            input_tokens = self.token_manager.count_tokens(input_text)
-            
-            if not self.client or self.api_key == "demo_key":
-                # Demo mode response
-                assistant_message = f"""I'm demonstrating the enhanced chat interface! In real mode with your OpenAI API key, I would provide:
-
-• Detailed analysis of your specific situation
-• Step-by-step implementation strategies  
-• Industry best practices and case studies
-• Specific metrics and KPIs to track success
-• Tailored recommendations for your business
-
-**To get real AI responses:**
-1. Add your OpenAI API key in Streamlit secrets
-2. Restart the application
-3. Start chatting for personalized business advice
-
-This demo shows the enhanced interface with inline features like image generation, quick actions, and seamless chat experience."""
-                
-                output_tokens = self.token_manager.count_tokens(assistant_message)
-                cost = 0.0
-            else:
-                # Real API call with new syntax
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=2000
-                )
-                
-                assistant_message = response.choices[0].message.content
-                output_tokens = response.usage.completion_tokens
-                input_tokens = response.usage.prompt_tokens
-                cost = self.token_manager.calculate_cost(input_tokens, output_tokens, model)
-            
-            total_tokens = input_tokens + output_tokens
-            
-            # Update session stats
-            self.session_stats["total_tokens"] += total_tokens
-            self.session_stats["total_cost"] += cost
-            self.session_stats["messages_count"] += 1
-            
-            metadata = {
-                "model": model,
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "total_tokens": total_tokens,
-                "cost": cost,
-                "temperature": temperature,
-                "timestamp": datetime.now().isoformat(),
-                "demo_mode": self.api_key == "demo_key" or not self.client
-            }
-            
-            return assistant_message, metadata
-            
-        except Exception as e:
-            logger.error(f"Chat generation error: {str(e)}")
-            error_message = f"I apologize, but I encountered an error: {str(e)}"
-            return error_message, {"error": True, "message": str(e)}
-    
-    def generate_image(self, prompt: str, model: str = "dall-e-3", size: str = "1024x1024") -> Tuple[str, Dict]:
-        """Generate image with new OpenAI API syntax"""
-        try:
-            if not self.client or self.api_key == "demo_key":
-                # Return demo image URL
-                demo_url = "https://via.placeholder.com/512x512/667eea/white?text=Demo+Image"
-                return demo_url, {
-                    "model": model,
-                    "size": size,
-                    "cost": 0.0,
-                    "demo_mode": True,
-                    "timestamp": datetime.now().isoformat()
-                }
-            
-            # Real API call with new syntax
-            response = self.client.images.generate(
-                model=model,
-                prompt=prompt,
-                size=size,
-                quality="standard",
-                n=1
-            )
-            
-            image_url = response.data[0].url
-            cost = OPENAI_PRICING.get(model, {}).get(size, 0.0)
-            
-            # Update session stats
-            self.session_stats["total_cost"] += cost
-            
-            metadata = {
-                "model": model,
-                "size": size,
-                "cost": cost,
-                "timestamp": datetime.now().isoformat(),
-                "demo_mode": False
-            }
-            
-            return image_url, metadata
-            
-        except Exception as e:
-            logger.error(f"Image generation error: {str(e)}")
-            return None, {"error": True, "message": str(e)}
+# BOT_PERSONALITIES, TokenManager and EnhancedChatManager live in the shared
+# aivas package so benchmarks and headless tools can use them without Streamlit
 
 # ======================================================
 # 🎨 ENHANCED UI COMPONENTS
@@ -737,12 +334,13 @@ def render_bot_selector():
                           index=category_bots.index(current_bot) if current_bot in category_bots else 0)
     
     if new_bot != current_bot:
+        cancel_active_generation("assistant switched")
         st.session_state.current_bot = new_bot
         st.rerun()
     
     return current_bot
 
-def render_quick_actions(bot_name: str):
+def render_quick_actions(bot_name: str, model: str, provider: Optional[str]):
     """Render quick action buttons for the current bot"""
     if bot_name not in BOT_PERSONALITIES:
         return
@@ -759,7 +357,9 @@ def render_quick_actions(bot_name: str):
                 if st.button(f"⚡ {action}", key=f"action_{idx}"):
                     # Add quick action as user message
                     action_message = f"Help me with: {action}"
-                    st.session_state.messages.append({"role": "user", "content": action_message})
+                    st.session_state.messages.append({"role": "user", "content": action_message, "action": action})
+                    # Non-streaming so identical clicks from other sessions share one upstream request
+                    generate_assistant_reply(bot_name, model, provider)
                     st.rerun()
         
         st.markdown('</div>', unsafe_allow_html=True)
@@ -776,9 +376,7 @@ def render_inline_features():
     
     with col2:
         if st.button("📊 Create Chart"):
-            chart_message = "Create a business chart or visualization for me"
-            st.session_state.messages.append({"role": "user", "content": chart_message})
-            st.rerun()
+            st.session_state.show_chart_builder = True
     
     with col3:
         if st.button("📝 Write Document"):
@@ -788,9 +386,19 @@ def render_inline_features():
     
     with col4:
         if st.button("🔍 Analyze Data"):
-            data_message = "Help me analyze business data and provide insights"
-            st.session_state.messages.append({"role": "user", "content": data_message})
-            st.rerun()
+            st.session_state.show_data_upload = True
+
+PROVIDER_BADGES = {
+    "openai": "✅ OpenAI",
+    "ollama": "🦙 Local",
+    "stub": "🧪 Offline",
+}
+
+def resolve_provider(bot_name: str, selected_backend: str) -> Optional[str]:
+    """Backend for a bot: sidebar override, then config routing, then the bot catalog"""
+    if selected_backend and selected_backend != "Auto":
+        return selected_backend
+    return PERSONA_PROVIDERS.get(bot_name) or BOT_PERSONALITIES.get(bot_name, {}).get("provider")
 
 def render_usage_dashboard():
     """Render compact usage dashboard"""
@@ -810,20 +418,497 @@ def render_usage_dashboard():
         st.metric("Cost", f"${stats['total_cost']:.4f}")
         duration = datetime.now() - stats["session_start"]
         st.metric("Duration", str(duration).split('.')[0])
+    
+    # Shared OpenAI key pool: load and health per key
+    openai_provider = st.session_state.chat_manager.providers.get("openai")
+    if openai_provider is not None and len(openai_provider.key_pool) > 1:
+        with st.expander(f"🔑 API keys ({len(openai_provider.key_pool)})"):
+            st.dataframe(pd.DataFrame(openai_provider.key_pool.snapshot()), hide_index=True)
+
+# ======================================================
+# 📎 DOCUMENT UPLOADS
+# ======================================================
+
+def current_user_key() -> str:
+    """Owner of the per-user document index: the signed-in user, else this browser session"""
+    user = st.session_state.get("user")
+    if user is not None and getattr(user, "id", None):
+        return user.id
+    if "anonymous_id" not in st.session_state:
+        st.session_state.anonymous_id = f"anon-{uuid.uuid4().hex[:12]}"
+    return st.session_state.anonymous_id
+
+RETRIEVAL_BACKENDS = {
+    "bm25": "🔤 Keyword (BM25)",
+    "vector": "🧭 Semantic (embeddings)",
+}
+
+def get_retrievers() -> Dict:
+    """Per-user retrieval indexes, opened once per session; the BM25 index holds every document"""
+    if "retrievers" not in st.session_state:
+        chat_manager = st.session_state.chat_manager
+        user_key = current_user_key()
+        provider = chat_manager.get_provider(RETRIEVAL["embedding_provider"])
+        st.session_state.retrievers = {
+            "bm25": LexicalRetriever(
+                user_index_dir(RETRIEVAL["data_dir"], user_key, "bm25"),
+                chat_manager.token_manager.count_tokens,
+                **BM25
+            ),
+            "vector": DocumentRetriever(
+                user_index_dir(RETRIEVAL["data_dir"], user_key, f"vectors-{provider.name}"),
+                lambda texts: chat_manager.embed(texts, provider=provider.name)
+            ),
+        }
+    return st.session_state.retrievers
+
+def save_conversation(bot_name: str):
+    """Index every branch of the current conversation so later chats can retrieve it"""
+    conversation = st.session_state.messages
+    if not conversation:
+        return
+    try:
+        for branch in conversation.branches:
+            messages = conversation.branch_messages(branch)
+            if not messages:
+                continue
+            suffix = "" if branch == MAIN_BRANCH else "-" + branch.replace(" ", "-")
+            get_retrievers()["bm25"].add_conversation(
+                st.session_state.conversation_id + suffix,
+                messages,
+                f"{bot_name} chat {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+                + ("" if branch == MAIN_BRANCH else f" ({branch})")
+            )
+    except Exception as e:
+        logger.error(f"Failed to save conversation: {str(e)}")
+
+def render_branch_selector():
+    """Switch between conversation branches once a chat has been forked"""
+    conversation = st.session_state.messages
+    if len(conversation.branches) < 2:
+        return
+    st.markdown("### 🌿 Branches")
+    summary = {branch["name"]: branch for branch in conversation.branch_summary()}
+    names = list(summary)
+    selected = st.selectbox(
+        "Branch",
+        names,
+        index=names.index(conversation.current),
+        format_func=lambda name: f"{name} · {summary[name]['messages']} msgs · {summary[name]['tokens']:,} tokens"
+    )
+    if selected != conversation.current:
+        cancel_active_generation("branch switched")
+        conversation.switch(selected)
+        st.rerun()
+    if conversation.current != MAIN_BRANCH and st.button("🗑️ Delete Branch"):
+        conversation.delete_branch(conversation.current)
+        st.rerun()
+
+def render_document_panel():
+    """Upload documents once; they are chunked, indexed and only relevant chunks reach the prompt"""
+    st.markdown("### 📎 Documents")
+    backend = st.selectbox(
+        "Retrieval",
+        list(RETRIEVAL_BACKENDS),
+        index=list(RETRIEVAL_BACKENDS).index(st.session_state.retrieval_backend),
+        format_func=RETRIEVAL_BACKENDS.get
+    )
+    st.session_state.retrieval_backend = backend
+    uploads = st.file_uploader(
+        "Upload reference files",
+        type=SUPPORTED_EXTENSIONS,
+        accept_multiple_files=True,
+        key=f"document_uploader_{st.session_state.uploader_key}"
+    )
+    
+    retrievers = get_retrievers()
+    lexical = retrievers["bm25"]
+    documents = lexical.documents()
+    max_bytes = INGESTION["max_file_mb"] * 1024 * 1024
+    new_files = []
+    for upload in uploads or []:
+        data = upload.getvalue()
+        doc_id = document_id(data)
+        if len(data) > max_bytes:
+            st.warning(f"{upload.name} is larger than {INGESTION['max_file_mb']} MB and was skipped")
+        elif doc_id not in documents and doc_id not in st.session_state.dismissed_documents:
+            new_files.append((upload.name, data))
+    
+    if new_files:
+        with st.spinner(f"Reading {len(new_files)} file(s)..."):
+            chunks, errors = ingest_files(
+                new_files,
+                st.session_state.chat_manager.token_manager,
+                chunk_tokens=INGESTION["chunk_tokens"],
+                overlap_tokens=INGESTION["chunk_overlap_tokens"],
+                max_workers=INGESTION["max_workers"]
+            )
+            lexical.add_chunks(chunks)
+        for name, error in errors.items():
+            st.error(f"Could not read {name}: {error}")
+        documents = lexical.documents()
+    
+    if backend == "vector":
+        # Embed documents the semantic index has not seen yet (uploads made under BM25, saved chats)
+        missing = set(documents) - set(retrievers["vector"].documents())
+        if missing:
+            with st.spinner("Embedding documents..."):
+                try:
+                    retrievers["vector"].add_chunks(lexical.chunks_for(missing))
+                except Exception as e:
+                    logger.error(f"Document embedding error: {str(e)}")
+                    st.warning(f"Semantic index unavailable, keyword search will be used: {e}")
+    
+    conversations = [doc_id for doc_id in documents if doc_id.startswith("conversation-")]
+    for doc_id, doc in documents.items():
+        if doc_id in conversations:
+            continue
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.caption(f"📄 {doc['name']} · {doc['chunks']} chunks · {doc['tokens']:,} tokens")
+        with col2:
+            if st.button("✖", key=f"remove_doc_{doc_id}"):
+                for retriever in retrievers.values():
+                    retriever.remove_document(doc_id)
+                st.session_state.dismissed_documents.add(doc_id)
+                st.rerun()
+    if conversations:
+        st.caption(f"💬 {len(conversations)} saved conversation(s) searchable")
+    
+    if len(documents) > len(conversations) and st.button("🗑️ Clear Documents"):
+        for doc_id in documents:
+            if doc_id not in conversations:
+                for retriever in retrievers.values():
+                    retriever.remove_document(doc_id)
+        st.session_state.dismissed_documents = set()
+        st.session_state.uploader_key += 1
+        st.rerun()
+
+def build_document_context(query: str) -> Optional[str]:
+    """Reference block with the indexed chunks most relevant to the query"""
+    retrievers = get_retrievers()
+    lexical = retrievers["bm25"]
+    if not len(lexical.index):
+        return None
+    if st.session_state.retrieval_backend == "vector":
+        try:
+            return retrievers["vector"].build_context(query, INGESTION["context_tokens"],
+                                                      RETRIEVAL["top_k"], RETRIEVAL["min_score"])
+        except Exception as e:
+            # Embedding backend unavailable: fall back to keyword retrieval
+            logger.warning(f"Vector retrieval failed, using BM25: {str(e)}")
+    return lexical.build_context(query, INGESTION["context_tokens"], RETRIEVAL["top_k"])
+
+# ======================================================
+# 🔍 DATA ANALYSIS
+# ======================================================
+
+def load_dataset(data_file):
+    """Profile an uploaded dataset and keep it for charts; returns the profile or None"""
+    data = data_file.getvalue()
+    if len(data) > DATA_PROFILING["max_file_mb"] * 1024 * 1024:
+        st.error(f"{data_file.name} is larger than {DATA_PROFILING['max_file_mb']} MB")
+        return None
+    with st.spinner("Profiling dataset..."):
+        try:
+            profile = profile_dataset(
+                data_file.name,
+                data,
+                chunk_rows=DATA_PROFILING["chunk_rows"],
+                sample_rows=DATA_PROFILING["sample_rows"],
+                top_k=DATA_PROFILING["top_k"]
+            )
+        except Exception as e:
+            logger.error(f"Data profiling error: {str(e)}")
+            st.error(f"Could not read {data_file.name}: {e}")
+            return None
+    
+    st.session_state.data_profile = profile
+    st.session_state.dataset = (data_file.name, data)
+    st.session_state.dataset_evicted = False
+    return profile
+
+def render_data_upload():
+    """Profile an uploaded dataset locally; only the profile is shared with the assistant"""
+    with st.container():
+        st.markdown("### 🔍 Analyze Data")
+        data_file = st.file_uploader("Upload a dataset", type=DATA_EXTENSIONS, key="data_uploader")
+        data_question = st.text_input("What do you want to know?",
+                                      placeholder="Which regions drive revenue growth?")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("🔍 Analyze") and data_file:
+                if load_dataset(data_file) is None:
+                    return
+                question = data_question or "Summarize this dataset and give me the key business insights"
+                st.session_state.messages.append({"role": "user", "content": f"📊 {data_file.name}: {question}",
+                                                  "action": "Analyze Data"})
+                st.session_state.show_data_upload = False
+                st.session_state.pending_response = True
+                st.rerun()
+        
+        with col2:
+            if st.button("❌ Cancel", key="cancel_data_upload"):
+                st.session_state.show_data_upload = False
+                st.rerun()
+
+def render_active_dataset():
+    """Show which dataset profile is attached to the conversation"""
+    profile = st.session_state.get("data_profile")
+    if profile is None:
+        return
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        with st.expander(f"📊 {profile.name} · {profile.rows:,} rows · {len(profile.columns)} columns "
+                         f"· profiled in {profile.elapsed_ms:,.0f} ms"):
+            st.caption("This profile is what the assistant sees - raw rows never leave the app.")
+            st.code(profile.to_prompt(DATA_PROFILING["max_columns"]), language=None)
+            if st.session_state.get("dataset_evicted") and st.session_state.get("dataset") is None:
+                st.caption("🧠 The raw file was released to free memory; re-upload it to build charts.")
+    with col2:
+        if st.button("✖ Dataset"):
+            st.session_state.data_profile = None
+            st.session_state.dataset = None
+            st.rerun()
+
+def render_chart_builder():
+    """Build a chart locally from the dataset; the assistant only narrates the result"""
+    with st.container():
+        st.markdown("### 📊 Create Chart")
+        profile = st.session_state.get("data_profile")
+        if profile is None or st.session_state.get("dataset") is None:
+            data_file = st.file_uploader("Upload a dataset", type=DATA_EXTENSIONS, key="chart_uploader")
+            if data_file and load_dataset(data_file) is not None:
+                st.rerun()
+            if st.button("❌ Cancel", key="cancel_chart_upload"):
+                st.session_state.show_chart_builder = False
+                st.rerun()
+            return
+        
+        suggested = suggest_chart(profile, CHARTS["max_categories"])
+        column_names = [column.name for column in profile.columns]
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            kinds = ["auto"] + CHART_KINDS
+            kind = st.selectbox("Chart", kinds,
+                                format_func=lambda k: f"Auto ({suggested.kind})" if k == "auto" and suggested else k.title())
+        with col2:
+            default_x = suggested.x if suggested else column_names[0]
+            x = st.selectbox("X", column_names, index=column_names.index(default_x))
+        with col3:
+            y_options = ["(none)"] + column_names
+            default_y = suggested.y if suggested and suggested.y else "(none)"
+            y = st.selectbox("Y", y_options, index=y_options.index(default_y))
+        with col4:
+            agg = st.selectbox("Aggregation", AGGREGATIONS, help="Used by bar charts")
+        
+        # Auto only picks the chart kind; the columns and aggregation are always the user's
+        chart_kind = (suggested.kind if suggested else None) if kind == "auto" else kind
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            build = st.button("📊 Build Chart")
+            if build and chart_kind is None:
+                st.warning("No chart type could be suggested for this dataset; pick one from the Chart list.")
+            elif build:
+                spec = ChartSpec(chart_kind, x, None if y == "(none)" else y, agg)
+                name, data = st.session_state.dataset
+                with st.spinner("Building chart..."):
+                    try:
+                        result = build_chart(
+                            name,
+                            data,
+                            profile,
+                            spec,
+                            max_points=CHARTS["max_points"],
+                            downsampling=CHARTS["downsampling"],
+                            max_categories=CHARTS["max_categories"],
+                            histogram_bins=CHARTS["histogram_bins"],
+                            chunk_rows=DATA_PROFILING["chunk_rows"]
+                        )
+                    except Exception as e:
+                        logger.error(f"Chart error: {str(e)}")
+                        st.error(f"Could not build the chart: {e}")
+                        return
+                
+                st.session_state.messages.append({"role": "user", "content": f"📊 Create a chart: {spec.title}",
+                                                  "action": "Create Chart"})
+                st.session_state.pending_chart = {"chart": result.figure.to_json(), "summary": result.summary}
+                st.session_state.show_chart_builder = False
+                st.session_state.pending_response = True
+                st.rerun()
+        
+        with col2:
+            if st.button("❌ Cancel", key="cancel_chart_builder"):
+                st.session_state.show_chart_builder = False
+                st.rerun()
 
 # ======================================================
 # 🚀 MAIN CHAT INTERFACE
 # ======================================================
 
+def build_messages_for_api(bot_name: str, query: str, extra_context: Optional[str] = None) -> List[Dict]:
+    """System prompt, retrieved document context, dataset profile and extra context, then the conversation"""
+    messages_for_api = [
+        {"role": "system", "content": build_system_prompt(bot_name)}
+    ]
+    document_context = build_document_context(query)
+    if document_context:
+        messages_for_api.append({"role": "system", "content": document_context})
+    profile = st.session_state.get("data_profile")
+    if profile is not None:
+        messages_for_api.append({"role": "system", "content": profile.to_prompt(DATA_PROFILING["max_columns"])})
+    if extra_context:
+        messages_for_api.append({"role": "system", "content": extra_context})
+    # Only the most recent history that fits the budget is re-sent
+    return messages_for_api + st.session_state.messages.window(CONVERSATION["history_tokens"])
+
+@st.cache_resource
+def get_generation_slots() -> GenerationSlots:
+    """Process-wide cap on concurrent upstream generations, shared by every session"""
+    return mark_shared(GenerationSlots(GENERATION["max_concurrent_generations"]))
+
+@st.cache_resource
+def get_budget_planner() -> BudgetPlanner:
+    """Output budgets learned from the shared usage ledger"""
+    ledger = UsageLedger(TOKEN_BUDGETS["ledger_path"], TOKEN_BUDGETS["window"])
+    return mark_shared(BudgetPlanner(
+        ledger,
+        percentile=TOKEN_BUDGETS["percentile"],
+        headroom=TOKEN_BUDGETS["headroom"],
+        min_tokens=TOKEN_BUDGETS["min_tokens"],
+        max_tokens=TOKEN_BUDGETS["max_tokens"],
+        min_samples=TOKEN_BUDGETS["min_samples"]
+    ))
+
+def plan_reply(bot_name: str) -> Tuple[str, str, int]:
+    """Last user message, its action and the output budget for that (bot, action)"""
+    last_user = next((m for m in reversed(st.session_state.messages) if m["role"] == "user"), {})
+    action = last_user.get("action", CHAT_ACTION)
+    max_tokens = get_budget_planner().budget(bot_name, action, BOT_PERSONALITIES[bot_name])
+    return last_user.get("content", ""), action, max_tokens
+
+def store_reply(bot_name: str, action: str, content: str, metadata: Dict, attachments: Optional[Dict] = None):
+    """Append the assistant message and log its length for future budgets"""
+    get_budget_planner().ledger.record(bot_name, action, metadata)
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": content,
+        "metadata": metadata,
+        "action": action,
+        **(attachments or {})
+    })
+
+def cancel_active_generation(reason: str):
+    """Abort the session's in-flight generation, if any"""
+    token = st.session_state.get("generation_token")
+    if token is not None:
+        token.cancel(reason)
+        st.session_state.generation_token = None
+
+def generate_assistant_reply(bot_name: str, model: str, provider: Optional[str]):
+    """Reply to the last user message in one request (deduplicated across sessions)
+
+    The request runs on a worker thread while this run keeps updating a status
+    line; those updates are where a rerun (clear chat, bot switch, new prompt)
+    interrupts the script, and the interruption cancels the request upstream.
+    """
+    bot_info = BOT_PERSONALITIES[bot_name]
+    query, action, max_tokens = plan_reply(bot_name)
+    cancel_active_generation("new prompt")
+    token = st.session_state.generation_token = CancellationToken()
+    chat_manager = st.session_state.chat_manager
+    messages = build_messages_for_api(bot_name, query)
+    reply: Dict = {}
+    worker = threading.Thread(
+        target=lambda: reply.update(result=chat_manager.generate_response(
+            messages, model, bot_info["temperature"], provider=provider, cancel_token=token, max_tokens=max_tokens
+        )),
+        name="quick-action",
+        daemon=True
+    )
+    status = st.empty()
+    started = time.time()
+    try:
+        worker.start()
+        while worker.is_alive():
+            status.caption(f"⏳ {bot_info['emoji']} {bot_name} is thinking... {time.time() - started:.0f}s")
+            worker.join(0.5)
+    finally:
+        if "result" not in reply:
+            token.cancel("interrupted")
+        if st.session_state.get("generation_token") is token:
+            st.session_state.generation_token = None
+    status.empty()
+    response, metadata = reply["result"]
+    if metadata.get("cancelled") and not response:
+        return
+    store_reply(bot_name, action, response, metadata)
+
+def stream_assistant_reply(bot_name: str, model: str, provider: Optional[str],
+                           extra_context: Optional[str] = None, attachments: Optional[Dict] = None):
+    """Stream a reply to the last user message into a placeholder, then store it with any attachments"""
+    bot_info = BOT_PERSONALITIES[bot_name]
+    query, action, max_tokens = plan_reply(bot_name)
+    
+    cancel_active_generation("new prompt")
+    token = st.session_state.generation_token = CancellationToken()
+    
+    placeholder = st.empty()
+    streamed = ""
+    response, metadata = None, {}
+    events = st.session_state.chat_manager.stream_response(
+        build_messages_for_api(bot_name, query, extra_context),
+        model,
+        bot_info["temperature"],
+        provider=provider,
+        cancel_token=token,
+        max_tokens=max_tokens
+    )
+    try:
+        for event in events:
+            if event.get("done"):
+                response, metadata = event["content"], event["metadata"]
+            elif event.get("queued"):
+                placeholder.info(f"⏳ Waiting for a free generation slot ({event['waiting']} waiting)...")
+            else:
+                streamed += event["delta"]
+                placeholder.markdown(f"""
+                <div class="assistant-message">
+                    <strong>{bot_info['emoji']} {bot_name}:</strong> {streamed}<span class="typing-indicator">▌</span>
+                </div>
+                """, unsafe_allow_html=True)
+    finally:
+        if response is None:
+            # Interrupted by a rerun (clear chat, bot switch, new prompt): closing the generator
+            # aborts the upstream stream, frees the slot and records the partial usage
+            token.cancel("interrupted")
+            events.close()
+            if streamed:
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": streamed,
+                    "metadata": {
+                        "cancelled": True,
+                        "model": model,
+                        "provider": provider or st.session_state.chat_manager.default_provider
+                    },
+                    "action": action
+                })
+        if st.session_state.get("generation_token") is token:
+            st.session_state.generation_token = None
+    
+    store_reply(bot_name, action, response, metadata, attachments)
+
 def main_chat_interface():
     """Enhanced main chat interface with inline features"""
     
-    # Initialize OpenAI
-    client, api_key = initialize_openai()
+    api_key = get_openai_api_key()
     
     if not api_key:
-        st.error("⚠️ OpenAI API key not found!")
-        with st.expander("📋 How to Configure Your API Key", expanded=True):
+        st.info("🧪 No OpenAI API key found - running in offline mode with local backends.")
+        with st.expander("📋 How to Configure Your API Key", expanded=False):
             st.markdown("""
             **Using Streamlit Secrets (Recommended)**
             1. Create a `.streamlit/secrets.toml` file in your project root
@@ -837,13 +922,20 @@ def main_chat_interface():
             - Visit [OpenAI Platform](https://platform.openai.com/api-keys)
             - Create a new API key
             - Copy and paste it using the method above
+            
+            **Local models:** start an Ollama server, set `LLM_PROVIDERS["ollama"]["enabled"] = True` in `config.py` and pick the `ollama` backend in the sidebar.
             """)
-        return
     
     # Initialize chat manager
     if "chat_manager" not in st.session_state:
-        st.session_state.chat_manager = EnhancedChatManager()
-        st.session_state.chat_manager.initialize_client(api_key)
+        chat_manager = EnhancedChatManager(build_providers(LLM_PROVIDERS), slots=get_generation_slots())
+        key_pool = None
+        if api_key:
+            key_pool = get_key_pool(json.dumps(get_openai_api_keys(), sort_keys=True, default=str),
+                                    get_openai_base_url())
+        chat_manager.initialize_client(api_key, get_openai_base_url(), key_pool=key_pool)
+        chat_manager.default_provider = default_provider_name(chat_manager.providers, LLM_PROVIDERS.get("default"))
+        st.session_state.chat_manager = chat_manager
     
     # Sidebar
     with st.sidebar:
@@ -855,23 +947,39 @@ def main_chat_interface():
         # Model selection
         st.markdown("### ⚙️ Settings")
         selected_model = st.selectbox("Model", ["gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"])
+        backend_options = ["Auto"] + sorted(st.session_state.chat_manager.providers)
+        selected_backend = st.selectbox("Backend", backend_options,
+                                        help="Auto uses the persona's backend, then the default one")
         
         # Usage dashboard
         render_usage_dashboard()
         
+        # Conversation branches
+        render_branch_selector()
+        
+        # Reference documents
+        render_document_panel()
+        
         # Chat controls
         st.markdown("### 🔧 Controls")
         col1, col2 = st.columns(2)
         with col1:
             if st.button("🗑️ Clear Chat"):
-                st.session_state.messages = []
+                cancel_active_generation("chat cleared")
+                save_conversation(current_bot)
+                st.session_state.messages.clear()
+                st.session_state.data_profile = None
+                st.session_state.dataset = None
+                st.session_state.conversation_id = f"conversation-{uuid.uuid4().hex[:12]}"
                 st.rerun()
         with col2:
             if st.button("💾 Export"):
                 if st.session_state.messages:
+                    save_conversation(current_bot)
                     export_data = {
                         "bot": current_bot,
-                        "messages": st.session_state.messages,
+                        "branch": st.session_state.messages.current,
+                        "messages": st.session_state.messages.to_list(),
                         "timestamp": datetime.now().isoformat()
                     }
                     st.download_button(
@@ -887,10 +995,11 @@ def main_chat_interface():
     
     # Current bot info
     bot_info = BOT_PERSONALITIES[current_bot]
+    provider = resolve_provider(current_bot, selected_backend)
     st.success(f"✅ Chatting with **{bot_info['emoji']} {current_bot}** - {bot_info['category']}")
     
     # Quick actions
-    render_quick_actions(current_bot)
+    render_quick_actions(current_bot, selected_model, provider)
     
     # Inline features
     render_inline_features()
@@ -905,7 +1014,7 @@ def main_chat_interface():
             with col1:
                 if st.button("🎨 Generate") and image_prompt:
                     with st.spinner("Creating image..."):
-                        image_url, metadata = st.session_state.chat_manager.generate_image(image_prompt)
+                        image_url, metadata = st.session_state.chat_manager.generate_image(image_prompt, provider=provider)
                         
                         if image_url and not metadata.get("error"):
                             # Add image to chat
@@ -926,10 +1035,19 @@ def main_chat_interface():
                     st.session_state.show_image_prompt = False
                     st.rerun()
     
+    # Dataset upload and the profile attached to the conversation
+    if st.session_state.get("show_data_upload", False):
+        render_data_upload()
+    if st.session_state.get("show_chart_builder", False):
+        render_chart_builder()
+    render_active_dataset()
+    
     # Chat messages with enhanced display
     st.markdown("### 💬 Conversation")
+    if st.session_state.messages.archived_messages:
+        st.caption(f"📦 {st.session_state.messages.archived_messages} earlier messages were archived to free memory")
     
-    for message in st.session_state.messages:
+    for idx, message in enumerate(st.session_state.messages):
         if message["role"] == "user":
             st.markdown(f"""
             <div class="user-message">
@@ -943,6 +1061,10 @@ def main_chat_interface():
             </div>
             """, unsafe_allow_html=True)
             
+            # Display inline chart if present
+            if "chart" in message:
+                st.plotly_chart(pio.from_json(message["chart"]), use_container_width=True, key=f"chart_{idx}")
+            
             # Display inline image if present
             if "image_url" in message:
                 st.image(message["image_url"], caption="Generated Image", width=300)
@@ -956,48 +1078,111 @@ def main_chat_interface():
                         <span>💰 ${metadata.get('cost', 0):.4f}</span>
                         <span>🔢 {metadata.get('total_tokens', 0)} tokens</span>
                         <span>🤖 {metadata.get('model', 'N/A')}</span>
-                        <span>{'🎮 Demo' if metadata.get('demo_mode') else '✅ Real'}</span>
+                        <span>{PROVIDER_BADGES.get(metadata.get('provider'), '✅ ' + str(metadata.get('provider', 'Real')))}</span>
+                        {f"<span>🤝 shared ×{metadata['singleflight']['group_size']}</span>" if metadata.get('singleflight') else ""}
+                        {"<span>⏹️ stopped early</span>" if metadata.get('cancelled') else ""}
+                        {f"<span>✂️ cut at {metadata.get('max_tokens')} tokens</span>" if metadata.get('finish_reason') == 'length' else ""}
                     </div>
                     """, unsafe_allow_html=True)
+            
+            # Branch a "what if" from this answer; the prefix is shared, not copied
+            if st.button("🌿 Branch from here", key=f"fork_{idx}"):
+                cancel_active_generation("branch created")
+                st.session_state.messages.fork(idx)
+                st.rerun()
+    
+    # Truncated answer: let the user ask for the rest
+    last_message = st.session_state.messages[-1] if st.session_state.messages else None
+    if (last_message and last_message["role"] == "assistant"
+            and (last_message.get("metadata") or {}).get("finish_reason") == "length"):
+        if st.button("➡️ Continue"):
+            st.session_state.messages.append({
+                "role": "user",
+                "content": "Continue exactly where your previous answer stopped.",
+                "action": CONTINUE_ACTION
+            })
+            st.session_state.pending_response = True
+            st.rerun()
+    
+    # Replies requested outside the chat input (dataset analysis, charts, continue)
+    if st.session_state.get("pending_response", False):
+        st.session_state.pending_response = False
+        chart = st.session_state.pop("pending_chart", None)
+        if chart:
+            # The figure is already built locally; the assistant only narrates it
+            stream_assistant_reply(
+                current_bot, selected_model, provider,
+                extra_context=(f"A chart has been rendered for the user. {chart['summary']} "
+                               "Explain in a few sentences what it shows and what the user should take "
+                               "away from it. Do not describe how to build the chart."),
+                attachments={"chart": chart["chart"]}
+            )
+        else:
+            stream_assistant_reply(current_bot, selected_model, provider)
+        st.rerun()
     
     # Enhanced chat input
     if prompt := st.chat_input("Ask your AI assistant anything..."):
         # Add user message
         st.session_state.messages.append({"role": "user", "content": prompt})
         
-        # Generate response
-        with st.spinner("🤔 Thinking..."):
-            # Create system prompt
-            system_prompt = f"""You are a {current_bot}. {bot_info['description']}
-
-Your specialties include: {', '.join(bot_info['specialties'])}
+        # Stream the response into a placeholder below the conversation
+        stream_assistant_reply(current_bot, selected_model, provider)
+        
+        st.rerun()
 
-Provide expert, actionable advice with:
-- Specific examples and implementation strategies
-- Industry best practices and case studies
-- Relevant metrics and KPIs to track success
-- Tailored recommendations for the business context
+# ======================================================
+# 🧠 SESSION MEMORY
+# ======================================================
 
-Maintain a professional yet approachable tone."""
-            
-            messages_for_api = [
-                {"role": "system", "content": system_prompt}
-            ] + st.session_state.messages
-            
-            response, metadata = st.session_state.chat_manager.generate_response(
-                messages_for_api,
-                selected_model,
-                bot_info["temperature"]
+def account_session_memory():
+    """Report this session's size to the admin registry; spill old messages when over the cap"""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    conversation = st.session_state.messages
+    signature = (len(conversation), conversation.current, id(st.session_state.dataset))
+    last = st.session_state.get("memory_check")
+    if last and last[0] == signature and time.time() - last[1] < SESSION_MEMORY["measure_interval_s"]:
+        return
+    
+    sizes = measure_session({key: st.session_state[key] for key in st.session_state.keys()})
+    total = sum(sizes.values())
+    cap = SESSION_MEMORY["max_session_mb"] * 1024 * 1024
+    if total > cap:
+        target = int(cap * SESSION_MEMORY["target_ratio"])
+        try:
+            archived = spill_conversation(
+                conversation, total - target, SESSION_MEMORY["keep_last_messages"],
+                os.path.join(SESSION_MEMORY["archive_dir"], f"{st.session_state.conversation_id}.jsonl"),
+                st.session_state.conversation_id
             )
-            
-            # Add assistant message
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response,
-                "metadata": metadata
-            })
-        
-        st.rerun()
+        except OSError as e:
+            logger.error(f"Failed to archive messages: {str(e)}")
+            archived = 0
+        if archived:
+            logger.info(f"Session {ctx.session_id}: archived {archived} messages (session was {total} bytes)")
+        sizes["messages"] = measure_session({"messages": conversation})["messages"]
+        total = sum(sizes.values())
+        if total > cap and st.session_state.dataset is not None:
+            # The profile and sample stay attached to the chat; only the raw upload goes
+            st.session_state.dataset = None
+            st.session_state.dataset_evicted = True
+            sizes.pop("dataset", None)
+            total = sum(sizes.values())
+    
+    user = st.session_state.get("user")
+    SESSION_REGISTRY.report(SessionUsage(
+        session_id=ctx.session_id,
+        user=getattr(user, "email", None) or current_user_key(),
+        total_bytes=total,
+        messages=len(conversation),
+        archived_messages=conversation.archived_messages,
+        top_keys=sorted(sizes.items(), key=lambda item: -item[1])[:5]
+    ))
+    SESSION_REGISTRY.prune(SESSION_MEMORY["stale_after_s"])
+    st.session_state.memory_check = ((len(conversation), conversation.current, id(st.session_state.dataset)),
+                                     time.time())
 
 # ======================================================
 # 🚀 MAIN APPLICATION
@@ -1008,7 +1193,7 @@ def main():
     
     # Initialize session state
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = Conversation(TokenManager().count_tokens)
     
     if "current_bot" not in st.session_state:
         st.session_state.current_bot = "Startup Strategist"
@@ -1016,6 +1201,38 @@ def main():
     if "show_image_prompt" not in st.session_state:
         st.session_state.show_image_prompt = False
     
+    if "show_data_upload" not in st.session_state:
+        st.session_state.show_data_upload = False
+    
+    if "data_profile" not in st.session_state:
+        st.session_state.data_profile = None
+    
+    if "dataset" not in st.session_state:
+        st.session_state.dataset = None
+    
+    if "show_chart_builder" not in st.session_state:
+        st.session_state.show_chart_builder = False
+    
+    if "generation_token" not in st.session_state:
+        st.session_state.generation_token = None
+    
+    if "pending_response" not in st.session_state:
+        st.session_state.pending_response = False
+    
+    if "conversation_id" not in st.session_state:
+        st.session_state.conversation_id = f"conversation-{uuid.uuid4().hex[:12]}"
+    
+    if "retrieval_backend" not in st.session_state:
+        st.session_state.retrieval_backend = RETRIEVAL["backend"]
+    
+    if "dismissed_documents" not in st.session_state:
+        st.session_state.dismissed_documents = set()
+    
+    if "uploader_key" not in st.session_state:
+        st.session_state.uploader_key = 0
+    
+    account_session_memory()
+    
     # Run main chat interface
     main_chat_interface()
 
@@ -9,6 +9,8 @@ from dataclasses import dataclass
 from pathlib import Path
 import re
 
+from portal.health import get_breaker
+
 # Page configuration
 st.set_page_config(
     page_title="Toolkitflow – n8n Workflows",
@@ -56,7 +58,8 @@ class GitHubRepository:
         
         try:
             url = f"{_self.api_base_url}/contents/{path}"
-            response = requests.get(url, timeout=10)
+            # Fails fast while the admin health prober sees GitHub as down
+            response = get_breaker("GitHub").call(requests.get, url, timeout=10)
             
             if response.status_code == 200:
                 items = response.json()
@@ -85,7 +88,7 @@ class GitHubRepository:
     def fetch_workflow_content(_self, file: WorkflowFile) -> Optional[Dict[str, Any]]:
         """Fetch workflow content from a file"""
         try:
-            response = requests.get(file.download_url, timeout=15)
+            response = get_breaker("GitHub").call(requests.get, file.download_url, timeout=15)
             if response.status_code == 200:
                 return response.json()
             return None
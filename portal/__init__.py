@@ -0,0 +1,4 @@
+"""
+Streamlit-free helpers for the authentication portal (main_app.py): user
+directory, admin metrics and the background services behind the admin pages
+"""
@@ -0,0 +1,128 @@
+"""
+Login, logout and page-view events with per-user daily rollups
+
+Events go through a BatchedWriter, so recording one never waits on disk or
+the network. Locally they are appended to daily JSONL segments and folded
+into a per-user, per-day counter rollup that is persisted next to them; the
+activity page reads that rollup, never the raw events. With a Supabase
+client, events are inserted into user_activity_events and a trigger keeps
+user_activity_daily up to date (portal/sql/user_activity.sql).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from portal.writer import BatchedWriter, JsonlSegmentSink, SupabaseTableSink, iso_timestamp
+
+logger = logging.getLogger(__name__)
+
+EVENTS_TABLE = "user_activity_events"
+DAILY_TABLE = "user_activity_daily"
+
+COUNTERS = {"login": "logins", "logout": "logouts", "page_view": "page_views"}
+
+def _utc_day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+class ActivityLog:
+    """Records user events in the background and answers per-user daily activity from the rollup"""
+
+    def __init__(self, directory: str, client=None, retention_days: int = 90, **writer_options):
+        self.client = client
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        # user_id -> {"days": {"YYYY-MM-DD": {"logins": n, ...}}, "logins": [recent login timestamps]}
+        self._rollups: Dict[str, Dict] = {}
+        if client is not None:
+            sink = SupabaseTableSink(client, EVENTS_TABLE, iso_timestamp)
+        else:
+            self.segments = JsonlSegmentSink(directory, "events")
+            self.rollup_path = os.path.join(directory, "daily_rollups.json")
+            self._load_rollups()
+            sink = self._write_local
+        self.writer = BatchedWriter(sink, name="activity", **writer_options)
+
+    def record(self, user_id: Optional[str], event: str, page: Optional[str] = None):
+        """Queue one event (a COUNTERS key); returns immediately"""
+        if not user_id or event not in COUNTERS:
+            return
+        record = {"ts": time.time(), "user_id": str(user_id), "event": event, "page": page}
+        # Events dropped by a full queue are not counted either, so the rollup matches the log
+        if self.writer.submit(record) and self.client is None:
+            self._fold(record)
+
+    # ======================================================
+    # 📦 LOCAL ROLLUPS
+    # ======================================================
+
+    def _load_rollups(self):
+        if not os.path.exists(self.rollup_path):
+            return
+        try:
+            with open(self.rollup_path, encoding="utf-8") as handle:
+                self._rollups = json.load(handle)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load activity rollups: {str(e)}")
+
+    def _fold(self, record: Dict):
+        with self._lock:
+            user = self._rollups.setdefault(record["user_id"], {"days": {}, "logins": []})
+            counters = user["days"].setdefault(_utc_day(record["ts"]), {name: 0 for name in COUNTERS.values()})
+            counters[COUNTERS[record["event"]]] += 1
+            if record["event"] == "login":
+                user["logins"] = (user["logins"] + [record["ts"]])[-2:]
+
+    def _write_local(self, batch: List[Dict]):
+        """Sink: append the raw events, then persist the rollup they were already folded into"""
+        self.segments(batch)
+        cutoff = _utc_day(time.time() - self.retention_days * 86400)
+        with self._lock:
+            for user in self._rollups.values():
+                for day in [day for day in user["days"] if day < cutoff]:
+                    del user["days"][day]
+            snapshot = json.dumps(self._rollups)
+        temp_path = self.rollup_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.write(snapshot)
+        os.replace(temp_path, self.rollup_path)
+
+    # ======================================================
+    # 📊 QUERIES
+    # ======================================================
+
+    def daily(self, user_id: str, days: int = 30) -> pd.DataFrame:
+        """Counters per UTC day for the last `days` days, zero-filled"""
+        today = datetime.now(timezone.utc).date()
+        since = today - timedelta(days=days - 1)
+        if self.client is not None:
+            rows = (self.client.table(DAILY_TABLE).select("day, logins, logouts, page_views")
+                    .eq("user_id", user_id).gte("day", since.isoformat()).execute().data or [])
+            by_day = {row["day"]: row for row in rows}
+        else:
+            with self._lock:
+                by_day = dict(self._rollups.get(str(user_id), {}).get("days", {}))
+        dates = pd.date_range(since, today, freq="D")
+        return pd.DataFrame([
+            {"date": day, **{name: int(by_day.get(day.strftime("%Y-%m-%d"), {}).get(name, 0))
+                             for name in COUNTERS.values()}}
+            for day in dates
+        ])
+
+    def last_login(self, user_id: str, before: Optional[float] = None) -> Optional[datetime]:
+        """Most recent login earlier than `before` (e.g. the one preceding the current session)"""
+        before = before if before is not None else time.time()
+        if self.client is not None:
+            rows = (self.client.table(EVENTS_TABLE).select("ts").eq("user_id", user_id).eq("event", "login")
+                    .lt("ts", datetime.fromtimestamp(before, timezone.utc).isoformat())
+                    .order("ts", desc=True).limit(1).execute().data or [])
+            return datetime.fromisoformat(rows[0]["ts"]) if rows else None
+        with self._lock:
+            logins = [ts for ts in self._rollups.get(str(user_id), {}).get("logins", []) if ts < before]
+        return datetime.fromtimestamp(max(logins), timezone.utc) if logins else None
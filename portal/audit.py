@@ -0,0 +1,143 @@
+"""
+Admin audit log
+
+Every admin action is queued on a BatchedWriter, so recording it adds no
+latency to the click, and lands in daily JSONL segments or, with a Supabase
+client, in the admin_audit_log table (portal/sql/admin_audit_log.sql).
+Locally, entries are also kept in memory in time order with per-admin and
+per-target position indexes; a time range is found by bisecting the
+timestamps, so lookups never scan the whole log.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from portal.writer import BatchedWriter, JsonlSegmentSink, SupabaseTableSink, iso_timestamp
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLE = "admin_audit_log"
+
+ACTIONS = ("role_change", "password_reset", "user_delete", "user_export", "bulk_email")
+
+class AuditLog:
+    """Append-only record of admin actions with lookups by admin, target and time range"""
+
+    def __init__(self, directory: str, client=None, **writer_options):
+        self.client = client
+        self._lock = threading.Lock()
+        self._entries: List[Dict] = []
+        self._timestamps: List[float] = []
+        self._by_admin: Dict[str, List[int]] = defaultdict(list)
+        self._by_target: Dict[str, List[int]] = defaultdict(list)
+        if client is not None:
+            sink = SupabaseTableSink(client, AUDIT_TABLE, iso_timestamp)
+        else:
+            sink = JsonlSegmentSink(directory, "audit")
+            self._load(directory)
+        self.writer = BatchedWriter(sink, name="audit", **writer_options)
+
+    def record(self, admin_email: str, action: str, target_email: Optional[str] = None,
+               details: Optional[Dict] = None, admin_id: Optional[str] = None, target_id: Optional[str] = None):
+        """Queue one admin action; returns immediately"""
+        entry = {
+            "ts": time.time(),
+            "admin_id": admin_id,
+            "admin_email": (admin_email or "").lower(),
+            "action": action,
+            "target_id": target_id,
+            "target_email": target_email.lower() if target_email else None,
+            "details": details or {},
+        }
+        if not self.writer.submit(entry):
+            logger.error(f"Audit queue full, dropped {action} by {admin_email} on {target_email}")
+        elif self.client is None:
+            self._index(entry)
+
+    # ======================================================
+    # 🗂️ LOCAL INDEX
+    # ======================================================
+
+    def _load(self, directory: str):
+        entries = []
+        # Segment names sort by day, and each segment is in append order
+        for path in sorted(glob.glob(os.path.join(directory, "audit-*.jsonl"))):
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line after a crash is skipped, not fatal
+                        continue
+        for entry in sorted(entries, key=lambda entry: entry["ts"]):
+            self._index(entry)
+
+    def _index(self, entry: Dict):
+        with self._lock:
+            position = len(self._entries)
+            if self._timestamps and entry["ts"] < self._timestamps[-1]:
+                # Clock stepped back: keep the timestamp list sorted for bisect
+                entry = {**entry, "ts": self._timestamps[-1]}
+            self._entries.append(entry)
+            self._timestamps.append(entry["ts"])
+            self._by_admin[(entry.get("admin_email") or "").lower()].append(position)
+            if entry.get("target_email"):
+                self._by_target[entry["target_email"].lower()].append(position)
+
+    def _query_local(self, admin_email, target_email, since, until, action, limit) -> List[Dict]:
+        with self._lock:
+            start = bisect_left(self._timestamps, since) if since is not None else 0
+            end = bisect_right(self._timestamps, until) if until is not None else len(self._timestamps)
+            candidates = None
+            for index, key in ((self._by_admin, admin_email), (self._by_target, target_email)):
+                if key:
+                    positions = index.get(key.lower(), [])
+                    # Positions are ascending, so the time window is a slice of them too
+                    window = positions[bisect_left(positions, start):bisect_left(positions, end)]
+                    candidates = window if candidates is None else sorted(set(candidates) & set(window))
+            if candidates is None:
+                candidates = range(start, end)
+            results = []
+            for position in reversed(candidates):
+                entry = self._entries[position]
+                if action and entry["action"] != action:
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+            return results
+
+    # ======================================================
+    # 🔎 QUERIES
+    # ======================================================
+
+    def query(self, admin_email: Optional[str] = None, target_email: Optional[str] = None,
+              since: Optional[datetime] = None, until: Optional[datetime] = None,
+              action: Optional[str] = None, limit: int = 200) -> List[Dict]:
+        """Matching entries, newest first, with "ts" as an aware UTC datetime"""
+        if self.client is not None:
+            query = self.client.table(AUDIT_TABLE).select("*")
+            if admin_email:
+                query = query.eq("admin_email", admin_email.lower())
+            if target_email:
+                query = query.eq("target_email", target_email.lower())
+            if since is not None:
+                query = query.gte("ts", since.isoformat())
+            if until is not None:
+                query = query.lte("ts", until.isoformat())
+            if action:
+                query = query.eq("action", action)
+            rows = query.order("ts", desc=True).limit(limit).execute().data or []
+            return [{**row, "ts": datetime.fromisoformat(row["ts"])} for row in rows]
+        entries = self._query_local(admin_email, target_email,
+                                    since.timestamp() if since is not None else None,
+                                    until.timestamp() if until is not None else None, action, limit)
+        return [{**entry, "ts": datetime.fromtimestamp(entry["ts"], timezone.utc)} for entry in entries]
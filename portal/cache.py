@@ -0,0 +1,104 @@
+"""
+Process-wide caches for the admin pages: a TTL cache and a periodic refresher
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Values expire ttl_s seconds after loading; concurrent misses on one key load once"""
+
+    def __init__(self, ttl_s: float):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._values: Dict[Hashable, Tuple[float, float, Any]] = {}   # key -> (expires, loaded, value)
+        self._loading: Dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[2]
+            return None
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl_s: Optional[float] = None) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another session may have loaded it while we waited
+            value = self.get(key)
+            if value is None:
+                value = loader()
+                self.set(key, value, ttl_s)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_s: Optional[float] = None):
+        now = time.monotonic()
+        with self._lock:
+            self._values[key] = (now + (self.ttl_s if ttl_s is None else ttl_s), now, value)
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since the key was loaded, None when absent or expired"""
+        with self._lock:
+            entry = self._values.get(key)
+            if not entry or entry[0] <= time.monotonic():
+                return None
+            return time.monotonic() - entry[1]
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything"""
+        with self._lock:
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
+
+class Refresher:
+    """Re-runs loader every interval_s on a daemon thread; readers get the last good value without waiting"""
+
+    def __init__(self, name: str, loader: Callable[[], Any], interval_s: float):
+        self.name = name
+        self.loader = loader
+        self.interval_s = interval_s
+        self.value: Any = None
+        self.updated_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Refresher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"refresh-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval_s)
+
+    def refresh(self) -> Any:
+        """Load now (also used for the first read, before the thread's first pass lands)"""
+        try:
+            value = self.loader()
+        except Exception as e:
+            logger.error(f"Refreshing {self.name} failed: {str(e)}")
+            with self._lock:
+                self.error = str(e)
+                return self.value
+        with self._lock:
+            self.value, self.updated_at, self.error = value, time.time(), None
+            return value
+
+    def current(self) -> Any:
+        """Latest value, loading synchronously only if nothing has been loaded yet"""
+        with self._lock:
+            value = self.value
+        return value if value is not None else self.refresh()
@@ -0,0 +1,187 @@
+"""
+User directory: user_profiles rows joined with Supabase auth users
+
+Auth users are indexed by id once, so the join is O(profiles + auth users)
+instead of a scan of the auth list per profile. Both sources are read page
+by page: a single list_users() or select() call only returns the first page.
+
+The user management page does not load the directory at all: search and
+role filters run in PostgREST and pages are walked with a (created_at, id)
+keyset, so only the visible page is fetched and joined. Until the
+created_at column from portal/sql/user_profiles_search.sql exists, pages
+are keyed on id alone.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from postgrest import CountMethod
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class UserRecord:
+    """One user as the admin pages need it"""
+    id: str
+    email: str
+    role: str
+    created_at: Optional[Any] = None
+    last_sign_in: Optional[Any] = None
+    confirmed: bool = False
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+def auth_user_list(response) -> List:
+    """Users from auth.admin.list_users(): a plain list in supabase-py 2.x, an object with .user/.users before"""
+    if isinstance(response, list):
+        return response
+    return list(getattr(response, "users", None) or getattr(response, "user", None) or [])
+
+def build_user_directory(profiles: Iterable[Dict], auth_users: Iterable) -> List[UserRecord]:
+    """Join profiles with their auth users in one pass over each"""
+    auth_by_id = {str(user.id): user for user in auth_users}
+    directory = []
+    for profile in profiles:
+        auth_info = auth_by_id.get(str(profile["id"]))
+        directory.append(UserRecord(
+            id=profile["id"],
+            email=profile["email"],
+            role=profile["role"],
+            created_at=getattr(auth_info, "created_at", None),
+            last_sign_in=getattr(auth_info, "last_sign_in_at", None),
+            confirmed=getattr(auth_info, "email_confirmed_at", None) is not None,
+        ))
+    return directory
+
+# ======================================================
+# 📄 PAGINATED FETCHING
+# ======================================================
+
+def iter_auth_users(admin, page_size: int = 1000, concurrency: int = 4) -> Iterator:
+    """Every auth user, walking list_users() pages in order with up to `concurrency` pages in flight
+
+    GoTrue does not return a total, so pages are fetched in windows until one
+    comes back short.
+    """
+    page = 1
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="list-users") as pool:
+        while True:
+            window = [pool.submit(admin.list_users, page=number, per_page=page_size)
+                      for number in range(page, page + concurrency)]
+            for future in window:
+                users = auth_user_list(future.result())
+                yield from users
+                if len(users) < page_size:
+                    for pending in window:
+                        pending.cancel()
+                    return
+            page += concurrency
+
+def iter_table_rows(client, table: str, columns: str = "*", page_size: int = 1000,
+                    order: str = "id") -> Iterator[Dict]:
+    """Every row of a table; PostgREST caps a single select at its max-rows setting"""
+    start = 0
+    while True:
+        rows = (client.table(table).select(columns).order(order)
+                .range(start, start + page_size - 1).execute().data or [])
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+# ======================================================
+# 🔎 SERVER-SIDE SEARCH
+# ======================================================
+
+PROFILE_COLUMNS = "id, email, role, created_at"
+LEGACY_PROFILE_COLUMNS = "id, email, role"
+UNDEFINED_COLUMN = "42703"
+
+# Set once a select shows that user_profiles has no created_at column yet
+_created_at_missing = False
+
+def _filtered_profiles(client, columns: str, search: str = "", role: Optional[str] = None, **select_options):
+    query = client.table("user_profiles").select(columns, **select_options)
+    if search:
+        # ilike wildcards typed by the admin are matched literally
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.ilike("email", f"%{escaped}%")
+    if role:
+        query = query.eq("role", role)
+    return query
+
+def count_profiles(client, search: str = "", role: Optional[str] = None) -> int:
+    """Profiles matching the filters, counted by the database"""
+    return _filtered_profiles(client, "id", search, role, count=CountMethod.exact, head=True).execute().count or 0
+
+def fetch_profile_page(client, search: str = "", role: Optional[str] = None, page_size: int = 25,
+                       after: Optional[Tuple[Optional[str], str]] = None
+                       ) -> Tuple[List[Dict], Optional[Tuple[Optional[str], str]]]:
+    """One page of matching profiles, newest first, and the cursor of the next page (None on the last)
+
+    Pages are keyed on (created_at, id) rather than offsets, so deep pages cost
+    the same as the first (with the index in portal/sql/user_profiles_search.sql)
+    and rows inserted meanwhile do not shift them. Without the created_at
+    column, pages are keyed on id and cursors are (None, id).
+    """
+    global _created_at_missing
+    if not _created_at_missing and not (after and after[0] is None):
+        try:
+            return _fetch_keyset_page(client, search, role, page_size, after)
+        except APIError as e:
+            if e.code != UNDEFINED_COLUMN:
+                raise
+            _created_at_missing = True
+            logger.warning("user_profiles.created_at is missing; paging by id until "
+                           "portal/sql/user_profiles_search.sql is run")
+    return _fetch_id_page(client, search, role, page_size, after[1] if after else None)
+
+def _fetch_keyset_page(client, search, role, page_size, after):
+    query = _filtered_profiles(client, PROFILE_COLUMNS, search, role)
+    if after:
+        created_at, user_id = after
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{user_id})')
+    # One extra row tells whether another page exists without a count query
+    rows = (query.order("created_at", desc=True).order("id", desc=True)
+            .limit(page_size + 1).execute().data or [])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (rows[-1]["created_at"], rows[-1]["id"])
+
+def _fetch_id_page(client, search, role, page_size, after_id):
+    query = _filtered_profiles(client, LEGACY_PROFILE_COLUMNS, search, role)
+    if after_id:
+        query = query.lt("id", after_id)
+    rows = query.order("id", desc=True).limit(page_size + 1).execute().data or []
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (None, rows[-1]["id"])
+
+def iter_profiles(client, search: str = "", role: Optional[str] = None, page_size: int = 1000) -> Iterator[Dict]:
+    """Every matching profile, walking the keyset pages"""
+    after = None
+    while True:
+        rows, after = fetch_profile_page(client, search, role, page_size, after)
+        yield from rows
+        if after is None:
+            return
+
+def fetch_auth_users(admin, user_ids: Iterable[str], concurrency: int = 4) -> List:
+    """Auth users by id, fetched in parallel; ids without an auth user are skipped"""
+    def fetch(user_id: str):
+        try:
+            return admin.get_user_by_id(user_id).user
+        except Exception as e:
+            logger.warning(f"Could not load auth user {user_id}: {str(e)}")
+            return None
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="get-user") as pool:
+        return [user for user in pool.map(fetch, user_ids) if user is not None]
@@ -0,0 +1,203 @@
+"""
+Dependency health: periodic probes, latency percentiles and circuit breakers
+
+HealthProber times one cheap call per dependency every interval_s on a
+daemon thread and keeps the last `window` results per dependency in a ring
+buffer, from which the Reports page reads p50/p95/p99 and the error rate.
+Every dependency also has a process-wide CircuitBreaker (get_breaker())
+that the probes feed; callers check it before their own requests, so a
+dependency that is down fails fast instead of hanging each page for a timeout.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised by CircuitBreaker.call() while the circuit is open"""
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; after reset_timeout_s one trial call is let through"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout_s: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        return self.HALF_OPEN if now - self.opened_at >= self.reset_timeout_s else self.OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (in half-open, only one trial at a time)"""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            self.failures += 1
+            if self._state(now) == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.opened_at = now
+            self._trial_running = False
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn through the breaker; raises CircuitOpenError without calling it while open"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+def get_breaker(name: str, failure_threshold: int = 3, reset_timeout_s: float = 30.0) -> CircuitBreaker:
+    """The process-wide breaker for a dependency; settings apply when it is first created"""
+    with _BREAKERS_LOCK:
+        if name not in _BREAKERS:
+            _BREAKERS[name] = CircuitBreaker(name, failure_threshold, reset_timeout_s)
+        return _BREAKERS[name]
+
+class LatencyRing:
+    """The last `size` probe results (latency and success) in fixed numpy arrays"""
+
+    def __init__(self, size: int = 500):
+        self.latencies_ms = np.zeros(size, dtype=np.float64)
+        self.ok = np.zeros(size, dtype=bool)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, ok: bool):
+        with self._lock:
+            slot = self.count % len(self.ok)
+            self.latencies_ms[slot] = latency_ms
+            self.ok[slot] = ok
+            self.count += 1
+
+    def summary(self) -> Dict:
+        """Sample count, error rate and latency percentiles of successful probes"""
+        with self._lock:
+            filled = min(self.count, len(self.ok))
+            latencies, ok = self.latencies_ms[:filled].copy(), self.ok[:filled].copy()
+        summary = {"samples": filled, "error_rate": float(1 - ok.mean()) if filled else 0.0}
+        good = latencies[ok]
+        for label, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+            summary[label] = float(np.percentile(good, q)) if len(good) else None
+        return summary
+
+# ======================================================
+# 🩺 PROBER
+# ======================================================
+
+class HealthProber:
+    """Runs every probe each interval_s on a daemon thread; a probe is a callable that raises on failure"""
+
+    def __init__(self, probes: Dict[str, Callable[[], Any]], interval_s: float = 30.0, window: int = 500,
+                 failure_threshold: int = 3, reset_timeout_s: float = 30.0):
+        self.probes = probes
+        self.interval_s = interval_s
+        self.rings = {name: LatencyRing(window) for name in probes}
+        self.breakers = {name: get_breaker(name, failure_threshold, reset_timeout_s) for name in probes}
+        self.last: Dict[str, Dict] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(probes)), thread_name_prefix="health-probe")
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "HealthProber":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.probe_all()
+            time.sleep(self.interval_s)
+
+    def _probe(self, name: str):
+        started = time.perf_counter()
+        error = None
+        try:
+            self.probes[name]()
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.rings[name].record(latency_ms, error is None)
+        if error is None:
+            self.breakers[name].record_success()
+        else:
+            self.breakers[name].record_failure()
+            logger.warning(f"Health probe {name} failed after {latency_ms:.0f}ms: {error}")
+        self.last[name] = {"latency_ms": latency_ms, "error": error, "checked_at": time.time()}
+
+    def probe_all(self):
+        """One round of probes, run concurrently so a hanging dependency does not delay the others"""
+        list(self._pool.map(self._probe, list(self.probes)))
+
+    def snapshot(self) -> List[Dict]:
+        """Per-dependency status, percentiles and last result for dashboards"""
+        return [
+            {
+                "dependency": name,
+                "circuit": self.breakers[name].state,
+                **self.rings[name].summary(),
+                "last_latency_ms": self.last.get(name, {}).get("latency_ms"),
+                "last_error": self.last.get(name, {}).get("error"),
+                "checked_at": self.last.get(name, {}).get("checked_at"),
+            }
+            for name in self.probes
+        ]
+
+def build_probes(client, openai_api_key: Optional[str] = None, openai_base_url: Optional[str] = None,
+                 timeout_s: float = 5.0) -> Dict[str, Callable[[], Any]]:
+    """Cheap read-only calls against each dependency the portal uses"""
+    def get(url: str, **headers):
+        requests.get(url, headers=headers, timeout=timeout_s).raise_for_status()
+
+    probes = {
+        "Supabase REST": lambda: client.table("user_profiles").select("id").limit(1).execute(),
+        "Supabase Auth": lambda: client.auth.admin.list_users(page=1, per_page=1),
+        # /rate_limit does not count against the unauthenticated quota
+        "GitHub": lambda: get("https://api.github.com/rate_limit"),
+    }
+    if openai_api_key:
+        base_url = (openai_base_url or "https://api.openai.com/v1").rstrip("/")
+        probes["OpenAI"] = lambda: get(f"{base_url}/models", Authorization=f"Bearer {openai_api_key}")
+    return probes
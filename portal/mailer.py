@@ -0,0 +1,252 @@
+"""
+Bulk email: one queued job per recipient, sent by background workers
+
+A campaign enqueues a job per recipient and returns at once (a recipients
+loader, such as a paged profile query, is walked on its own thread); worker threads
+send over reused SMTP connections, all drawing from one TokenBucket so the
+combined send rate stays under rate_per_s. Temporary failures (4xx replies,
+dropped connections) are retried with exponential backoff; permanent ones
+(5xx) are recorded on the campaign, whose counters the admin page polls.
+"""
+
+import itertools
+import logging
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from email.message import EmailMessage
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from aivas.keypool import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SMTPSettings:
+    """Where and as whom to send"""
+    host: str
+    sender: str
+    port: int = 587
+    username: Optional[str] = None
+    password: Optional[str] = None
+    starttls: bool = True
+    ssl: bool = False
+    timeout_s: float = 10.0
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "SMTPSettings":
+        fields = cls.__dataclass_fields__
+        return cls(**{key: value for key, value in dict(values).items() if key in fields})
+
+@dataclass
+class Campaign:
+    """One bulk send and its progress"""
+    id: str
+    subject: str
+    body: str
+    total: int
+    created_by: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    skipped: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)   # (recipient, error), first 100
+    cancelled: bool = False
+    expanding: bool = False   # recipients are still being loaded; total grows until this is False
+    finished_at: Optional[float] = None
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.sent - self.failed - self.skipped
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "pending": self.pending}
+
+@dataclass
+class MailJob:
+    campaign_id: str
+    recipient: str
+    attempts: int = 0
+
+def is_permanent(error: Exception) -> bool:
+    """5xx replies will fail again; timeouts, dropped connections and 4xx replies may not"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+def describe(error: Exception) -> str:
+    """Short reason for the failures table, such as 550 No such user"""
+    def reply(code: int, text) -> str:
+        return f"{code} {text.decode(errors='replace') if isinstance(text, bytes) else text}"
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return "; ".join(reply(code, text) for code, text in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return reply(error.smtp_code, error.smtp_error)
+    return str(error) or type(error).__name__
+
+class BulkMailer:
+    """Campaign queue drained by `workers` threads at no more than rate_per_s messages per second"""
+
+    def __init__(self, smtp: SMTPSettings, rate_per_s: float = 5.0, burst: int = 10, workers: int = 4,
+                 max_attempts: int = 4, backoff_s: float = 5.0, max_backoff_s: float = 300.0,
+                 idle_close_s: float = 30.0):
+        self.smtp = smtp
+        self.bucket = TokenBucket(rate_per_s, burst)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.idle_close_s = idle_close_s
+        self.campaigns: Dict[str, Campaign] = {}
+        # (not_before, sequence, job): retries wait in the same queue until their backoff has passed
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def enqueue(self, subject: str, body: str, recipients: Union[Iterable[str], Callable[[], Iterable[str]]],
+                created_by: Optional[str] = None) -> Campaign:
+        """Queue one job per distinct recipient and return the campaign immediately
+
+        recipients may be a callable returning them; it is then called and walked
+        on a background thread, and the campaign's total grows as it goes.
+        """
+        campaign = Campaign(uuid.uuid4().hex[:12], subject, body, 0, created_by, expanding=True)
+        with self._lock:
+            self.campaigns[campaign.id] = campaign
+            self._start_workers()
+        if callable(recipients):
+            threading.Thread(target=self._expand, args=(campaign, recipients), name=f"mailer-expand-{campaign.id}",
+                             daemon=True).start()
+        else:
+            self._expand(campaign, lambda: recipients)
+        return campaign
+
+    def _expand(self, campaign: Campaign, load: Callable[[], Iterable[str]]):
+        seen = set()
+        try:
+            for email in load():
+                if campaign.cancelled:
+                    break
+                email = (email or "").strip().lower()
+                if not email or email in seen:
+                    continue
+                seen.add(email)
+                with self._lock:
+                    campaign.total += 1
+                self._queue.put((time.monotonic(), next(self._sequence), MailJob(campaign.id, email)))
+        except Exception as e:
+            logger.error(f"Failed to load recipients for campaign {campaign.id}: {str(e)}")
+            with self._lock:
+                campaign.errors.append(("(recipients)", str(e)))
+        finally:
+            with self._lock:
+                campaign.expanding = False
+                if campaign.pending == 0:
+                    campaign.finished_at = time.time()
+
+    def cancel(self, campaign_id: str):
+        """Skip the campaign's unsent jobs (messages already handed to the server are not recalled)"""
+        with self._lock:
+            self.campaigns[campaign_id].cancelled = True
+
+    def snapshot(self) -> List[Dict]:
+        """Every campaign's counters, newest first"""
+        with self._lock:
+            return [campaign.to_dict()
+                    for campaign in sorted(self.campaigns.values(), key=lambda c: c.created_at, reverse=True)]
+
+    # ======================================================
+    # 📮 WORKERS
+    # ======================================================
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"mailer-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.smtp.ssl:
+            connection = smtplib.SMTP_SSL(self.smtp.host, self.smtp.port, timeout=self.smtp.timeout_s)
+        else:
+            connection = smtplib.SMTP(self.smtp.host, self.smtp.port, timeout=self.smtp.timeout_s)
+            if self.smtp.starttls:
+                connection.starttls()
+        if self.smtp.username:
+            connection.login(self.smtp.username, self.smtp.password or "")
+        return connection
+
+    def _message(self, campaign: Campaign, recipient: str) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.smtp.sender
+        message["To"] = recipient
+        message["Subject"] = campaign.subject.replace("{email}", recipient)
+        message.set_content(campaign.body.replace("{email}", recipient))
+        return message
+
+    @staticmethod
+    def _close(connection: Optional[smtplib.SMTP]):
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    def _finish(self, campaign: Campaign, outcome: str, recipient: str, error: Optional[str] = None):
+        with self._lock:
+            setattr(campaign, outcome, getattr(campaign, outcome) + 1)
+            if error and len(campaign.errors) < 100:
+                campaign.errors.append((recipient, error))
+            if campaign.pending == 0 and not campaign.expanding:
+                campaign.finished_at = time.time()
+
+    def _work(self):
+        connection: Optional[smtplib.SMTP] = None
+        while True:
+            try:
+                not_before, sequence, job = self._queue.get(timeout=self.idle_close_s)
+            except queue.Empty:
+                # Nothing to send: do not hold the server's connection slot
+                self._close(connection)
+                connection = None
+                continue
+            wait = not_before - time.monotonic()
+            if wait > 0:
+                self._queue.put((not_before, sequence, job))
+                time.sleep(min(wait, 0.5))
+                continue
+
+            campaign = self.campaigns[job.campaign_id]
+            if campaign.cancelled:
+                self._finish(campaign, "skipped", job.recipient)
+                continue
+            while not self.bucket.try_consume(1):
+                time.sleep(self.bucket.time_until(1))
+
+            try:
+                connection = connection or self._connect()
+                connection.send_message(self._message(campaign, job.recipient))
+            except Exception as e:
+                if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                    # The session may be unusable: reconnect for the next message
+                    self._close(connection)
+                    connection = None
+                job.attempts += 1
+                if is_permanent(e) or job.attempts >= self.max_attempts:
+                    logger.warning(f"Giving up on {job.recipient} after {job.attempts} attempts: {describe(e)}")
+                    self._finish(campaign, "failed", job.recipient, describe(e))
+                else:
+                    with self._lock:
+                        campaign.retries += 1
+                    backoff = min(self.max_backoff_s, self.backoff_s * 2 ** (job.attempts - 1))
+                    self._queue.put((time.monotonic() + backoff, next(self._sequence), job))
+            else:
+                self._finish(campaign, "sent", job.recipient)
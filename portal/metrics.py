@@ -0,0 +1,56 @@
+"""
+Admin dashboard metrics computed by the database
+
+The admin_user_metrics() RPC (portal/sql/admin_user_metrics.sql) returns every
+number in one round trip. Without it, head-only count="exact" queries return
+the profile counts without transferring any rows.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+from postgrest import CountMethod
+
+logger = logging.getLogger(__name__)
+
+METRICS_RPC = "admin_user_metrics"
+
+@dataclass
+class AdminMetrics:
+    """User counts shown on the analytics page"""
+    total_users: int
+    admins: int
+    confirmed: Optional[int]       # None when auth.users cannot be counted
+    source: str                    # "rpc" or "count"
+    fetched_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def regular_users(self) -> int:
+        return self.total_users - self.admins
+
+def count_rows(client, table: str, **filters) -> int:
+    """Exact row count from the Content-Range header; no rows are transferred"""
+    query = client.table(table).select("id", count=CountMethod.exact, head=True)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    return query.execute().count or 0
+
+def fetch_admin_metrics(client, confirmed_fallback: Optional[Callable[[], int]] = None) -> AdminMetrics:
+    """Metrics from the RPC, else from count queries (confirmed users from confirmed_fallback)"""
+    try:
+        data = client.rpc(METRICS_RPC, {}).execute().data
+        row = data[0] if isinstance(data, list) else data
+        return AdminMetrics(int(row["total_users"]), int(row["admins"]), int(row["confirmed"]), "rpc")
+    except Exception as e:
+        logger.info(f"{METRICS_RPC}() unavailable, using count queries: {str(e)}")
+
+    confirmed = None
+    if confirmed_fallback is not None:
+        try:
+            confirmed = confirmed_fallback()
+        except Exception as e:
+            logger.error(f"Failed to count confirmed users: {str(e)}")
+    return AdminMetrics(count_rows(client, "user_profiles"), count_rows(client, "user_profiles", role="admin"),
+                        confirmed, "count")
@@ -0,0 +1,49 @@
+"""
+Portal roles carried in the session instead of looked up at every login
+
+The role is mirrored into the auth user's app_metadata (only the service
+role can write it, and it is issued in the JWT), so sign_in_with_password()
+already returns it and login takes one round trip. Users without the claim
+yet fall back to a user_profiles lookup cached per user for a TTL. Role
+changes go through set_role(), which updates both copies and drops the
+cached entry. portal/sql/role_claims.sql backfills existing users and keeps
+the claim in sync with changes made directly in the database.
+"""
+
+import logging
+from typing import Optional
+
+from portal.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ROLE_CLAIM = "role"
+ROLES = ("user", "admin")
+DEFAULT_ROLE = "user"
+
+def role_from_claims(user) -> Optional[str]:
+    """Role from the auth user's app_metadata, None when it has not been set"""
+    role = (getattr(user, "app_metadata", None) or {}).get(ROLE_CLAIM)
+    return role if role in ROLES else None
+
+def fetch_profile_role(client, user_id: str) -> str:
+    profile = client.table("user_profiles").select("role").eq("id", user_id).execute()
+    return profile.data[0]["role"] if profile.data else DEFAULT_ROLE
+
+def resolve_role(client, user, cache: TTLCache) -> str:
+    """Role for a signed-in user: the claim if present, else the cached profile lookup"""
+    role = role_from_claims(user)
+    if role is not None:
+        return role
+    return cache.get_or_load(("role", str(user.id)), lambda: fetch_profile_role(client, user.id))
+
+def set_role(client, user_id: str, role: str, cache: TTLCache):
+    """Change a user's role in user_profiles and in their claim, and forget the cached role"""
+    if role not in ROLES:
+        raise ValueError(f"Unknown role: {role}")
+    client.table("user_profiles").update({"role": role}).eq("id", user_id).execute()
+    try:
+        client.auth.admin.update_user_by_id(user_id, {"app_metadata": {ROLE_CLAIM: role}})
+    finally:
+        # Even if the claim update failed, the next profile lookup must see the new role
+        cache.invalidate(("role", str(user_id)))
@@ -0,0 +1,23 @@
+-- Admin audit log for AUDIT_LOG["backend"] = "supabase" (portal/audit.py).
+-- Written in batches by the service role; read by the Reports page viewer.
+-- Run once in the Supabase SQL editor.
+
+create table if not exists public.admin_audit_log (
+    id bigint generated always as identity primary key,
+    ts timestamptz not null default now(),
+    admin_id uuid,
+    admin_email text not null,
+    action text not null,
+    target_id uuid,
+    target_email text,
+    details jsonb not null default '{}'::jsonb
+);
+
+-- One index per viewer lookup: by admin, by target user, and by time alone
+create index if not exists admin_audit_log_admin_ts_idx on public.admin_audit_log (admin_email, ts desc);
+create index if not exists admin_audit_log_target_ts_idx on public.admin_audit_log (target_email, ts desc);
+create index if not exists admin_audit_log_ts_idx on public.admin_audit_log (ts desc);
+
+-- Append-only: no client role may change or remove entries
+alter table public.admin_audit_log enable row level security;
+revoke update, delete, truncate on public.admin_audit_log from anon, authenticated;
@@ -0,0 +1,20 @@
+-- Registrations per UTC day for the admin trend chart, grouped in the database.
+-- Optional: without this function main_app.py buckets the cached user
+-- directory with pandas. Run once in the Supabase SQL editor.
+
+create or replace function public.admin_daily_registrations(since date default null)
+returns table (day date, registrations bigint)
+language sql
+stable
+security definer
+set search_path = public, auth
+as $$
+    select (created_at at time zone 'utc')::date as day, count(*) as registrations
+    from auth.users
+    where since is null or created_at >= (since::timestamp at time zone 'utc')
+    group by 1
+    order by 1;
+$$;
+
+revoke all on function public.admin_daily_registrations(date) from public, anon, authenticated;
+grant execute on function public.admin_daily_registrations(date) to service_role;
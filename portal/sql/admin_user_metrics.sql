@@ -0,0 +1,20 @@
+-- Aggregate user metrics for the admin dashboard, computed in the database.
+-- Optional: without this function main_app.py falls back to head-only
+-- count="exact" queries on user_profiles. Run once in the Supabase SQL editor.
+
+create or replace function public.admin_user_metrics()
+returns json
+language sql
+stable
+security definer
+set search_path = public, auth
+as $$
+    select json_build_object(
+        'total_users', (select count(*) from public.user_profiles),
+        'admins', (select count(*) from public.user_profiles where role = 'admin'),
+        'confirmed', (select count(*) from auth.users where email_confirmed_at is not null)
+    );
+$$;
+
+revoke all on function public.admin_user_metrics() from public, anon, authenticated;
+grant execute on function public.admin_user_metrics() to service_role;
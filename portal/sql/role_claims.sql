@@ -0,0 +1,29 @@
+-- Mirrors user_profiles.role into auth.users app_metadata ("role" claim), so
+-- login reads the role from the sign-in response instead of a second query
+-- (portal/roles.py). Run once in the Supabase SQL editor.
+
+-- Backfill existing users
+update auth.users u
+set raw_app_meta_data = coalesce(u.raw_app_meta_data, '{}'::jsonb) || jsonb_build_object('role', p.role)
+from public.user_profiles p
+where p.id = u.id;
+
+-- Keep the claim in sync with inserts and role changes, including ones made outside the portal
+create or replace function public.sync_role_claim()
+returns trigger
+language plpgsql
+security definer
+set search_path = public, auth
+as $$
+begin
+    update auth.users
+    set raw_app_meta_data = coalesce(raw_app_meta_data, '{}'::jsonb) || jsonb_build_object('role', new.role)
+    where id = new.id;
+    return new;
+end;
+$$;
+
+drop trigger if exists sync_role_claim on public.user_profiles;
+create trigger sync_role_claim
+    after insert or update of role on public.user_profiles
+    for each row execute function public.sync_role_claim();
@@ -0,0 +1,86 @@
+-- Event log and per-user daily rollup behind the "My Activity" page when
+-- ACTIVITY_LOG["backend"] is "supabase" (portal/activity.py). The trigger keeps
+-- the rollup current as batches are inserted, so reads never scan raw events.
+-- Run once in the Supabase SQL editor.
+
+create table if not exists public.user_activity_events (
+    id bigint generated always as identity primary key,
+    ts timestamptz not null default now(),
+    user_id uuid not null,
+    event text not null check (event in ('login', 'logout', 'page_view')),
+    page text
+);
+
+create index if not exists user_activity_events_user_event_ts_idx
+    on public.user_activity_events (user_id, event, ts desc);
+
+create table if not exists public.user_activity_daily (
+    user_id uuid not null,
+    day date not null,
+    logins integer not null default 0,
+    logouts integer not null default 0,
+    page_views integer not null default 0,
+    primary key (user_id, day)
+);
+
+-- Runs as the owner so a user's insert can update the rollup they may only read
+create or replace function public.fold_user_activity_event()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    insert into public.user_activity_daily (user_id, day, logins, logouts, page_views)
+    values (
+        new.user_id,
+        (new.ts at time zone 'utc')::date,
+        (new.event = 'login')::int,
+        (new.event = 'logout')::int,
+        (new.event = 'page_view')::int
+    )
+    on conflict (user_id, day) do update set
+        logins = user_activity_daily.logins + excluded.logins,
+        logouts = user_activity_daily.logouts + excluded.logouts,
+        page_views = user_activity_daily.page_views + excluded.page_views;
+    return new;
+end;
+$$;
+
+drop trigger if exists fold_user_activity_event on public.user_activity_events;
+create trigger fold_user_activity_event
+    after insert on public.user_activity_events
+    for each row execute function public.fold_user_activity_event();
+
+-- Users log and read their own activity; admins (role claim from
+-- portal/sql/role_claims.sql, else user_profiles) read everyone's. Only the
+-- service role, which bypasses RLS, and the trigger above write the rollup.
+create or replace function public.is_admin()
+returns boolean
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select coalesce(auth.jwt() -> 'app_metadata' ->> 'role', '') = 'admin'
+        or exists (select 1 from public.user_profiles where id = auth.uid() and role = 'admin');
+$$;
+
+alter table public.user_activity_events enable row level security;
+alter table public.user_activity_daily enable row level security;
+
+drop policy if exists "Users insert own activity" on public.user_activity_events;
+create policy "Users insert own activity" on public.user_activity_events
+    for insert to authenticated with check (user_id = auth.uid());
+
+drop policy if exists "Users read own activity" on public.user_activity_events;
+create policy "Users read own activity" on public.user_activity_events
+    for select to authenticated using (user_id = auth.uid() or public.is_admin());
+
+drop policy if exists "Users read own daily activity" on public.user_activity_daily;
+create policy "Users read own daily activity" on public.user_activity_daily
+    for select to authenticated using (user_id = auth.uid() or public.is_admin());
+
+-- Events are append-only and the rollup is written by the trigger alone
+revoke update, delete, truncate on public.user_activity_events from anon, authenticated;
+revoke insert, update, delete, truncate on public.user_activity_daily from anon, authenticated;
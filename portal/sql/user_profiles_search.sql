@@ -0,0 +1,19 @@
+-- Indexes behind the user management page's server-side search and keyset
+-- pagination (portal/directory.py fetch_profile_page). Run once in the
+-- Supabase SQL editor.
+
+-- Keyset column: existing rows get the migration time, new rows their insert time
+alter table public.user_profiles
+    add column if not exists created_at timestamptz not null default now();
+
+create index if not exists user_profiles_created_at_id_idx
+    on public.user_profiles (created_at desc, id desc);
+
+create index if not exists user_profiles_role_created_at_id_idx
+    on public.user_profiles (role, created_at desc, id desc);
+
+-- Substring search on email (email ilike '%term%') needs a trigram index
+create extension if not exists pg_trgm;
+
+create index if not exists user_profiles_email_trgm_idx
+    on public.user_profiles using gin (email gin_trgm_ops);
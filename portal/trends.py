@@ -0,0 +1,105 @@
+"""
+Registration trends from auth created_at
+
+Daily counts come from the admin_daily_registrations(since) RPC
+(portal/sql/admin_daily_registrations.sql), grouped in the database, or are
+bucketed with pandas from the auth user list. A finished day never changes,
+so RegistrationTrends keeps every closed day, zero days included, and only
+asks for days from the last load on: after the first load, a refresh
+recomputes today. GoTrue lists users newest first, so the fallback stops
+paging at the first user older than that. Weekly and monthly series are
+resampled from the daily one.
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DAILY_RPC = "admin_daily_registrations"
+
+FREQUENCIES = {
+    "Daily": "D",
+    "Weekly": "W-MON",   # weeks labelled by the Monday they end on
+    "Monthly": "MS",
+}
+
+def daily_counts(timestamps: Iterable, since: Optional[date] = None) -> pd.Series:
+    """Registrations per UTC day from created_at values (datetimes or ISO strings), from `since` on"""
+    days = pd.to_datetime(pd.Series(list(timestamps), dtype="object"), utc=True, errors="coerce").dropna()
+    days = days.dt.tz_localize(None).dt.normalize()
+    if since is not None:
+        days = days[days >= pd.Timestamp(since)]
+    return days.value_counts().sort_index().astype("int64")
+
+def created_since(timestamps: Iterable, since: Optional[date] = None) -> Iterator:
+    """created_at values listed newest first, up to the first one before `since`"""
+    if since is None:
+        yield from timestamps
+        return
+    cutoff = pd.Timestamp(since, tz="UTC")
+    for value in timestamps:
+        created = pd.to_datetime(value, utc=True, errors="coerce")
+        if not pd.isna(created) and created < cutoff:
+            return
+        yield value
+
+def fetch_daily_registrations(client, since: Optional[date] = None,
+                              fallback: Optional[Callable[[Optional[date]], Iterable]] = None) -> pd.Series:
+    """Daily counts from the RPC, else bucketed from the created_at values fallback(since) returns"""
+    try:
+        rows = client.rpc(DAILY_RPC, {"since": since.isoformat() if since else None}).execute().data or []
+        return pd.Series({pd.Timestamp(row["day"]): int(row["registrations"]) for row in rows},
+                         dtype="int64").sort_index()
+    except Exception as e:
+        if fallback is None:
+            raise
+        logger.info(f"{DAILY_RPC}() unavailable, bucketing the user directory: {str(e)}")
+    return daily_counts(fallback(since), since)
+
+class RegistrationTrends:
+    """Daily registration counts with finished days cached; loader(since) returns counts for days >= since"""
+
+    def __init__(self, loader: Callable[[Optional[date]], pd.Series]):
+        self.loader = loader
+        self._closed = pd.Series(dtype="int64")
+        self._loaded_through: Optional[pd.Timestamp] = None
+        self._lock = threading.Lock()
+
+    def daily(self, today: Optional[date] = None) -> pd.Series:
+        """Every day from the first registration through today, zero-filled"""
+        today = pd.Timestamp(today or datetime.now(timezone.utc).date())
+        with self._lock:
+            since = self._loaded_through.date() if self._loaded_through is not None else None
+            fresh = self.loader(since)
+            series = pd.concat([self._closed, fresh]).groupby(level=0).sum().astype("int64")
+            if not series.empty:
+                full_range = pd.date_range(series.index[0], max(series.index[-1], today), freq="D")
+                series = series.reindex(full_range, fill_value=0)
+            # Days before today are final: keep them materialized, zero days included
+            self._closed = series[series.index < today]
+            self._loaded_through = today
+        return series
+
+    def series(self, frequency: str = "Daily", daily: Optional[pd.Series] = None) -> pd.DataFrame:
+        """Registrations and running total at the given frequency (a FREQUENCIES key), from `daily` if given"""
+        if daily is None:
+            daily = self.daily()
+        if daily.empty:
+            return pd.DataFrame(columns=["date", "registrations", "total_users"])
+        counts = daily.resample(FREQUENCIES[frequency]).sum()
+        return pd.DataFrame({
+            "date": counts.index,
+            "registrations": counts.values,
+            "total_users": counts.cumsum().values,
+        })
+
+    def invalidate(self):
+        """Forget cached days (e.g. after bulk deletes)"""
+        with self._lock:
+            self._closed = pd.Series(dtype="int64")
+            self._loaded_through = None
@@ -0,0 +1,138 @@
+"""
+Non-blocking batched writes for event logs
+
+Callers submit() records to an in-memory queue and return immediately; a
+daemon thread hands them to a sink in batches of up to batch_size, or
+whatever arrived within flush_interval_s. A full queue drops records rather
+than blocking a page render. Sinks are callables taking a list of records.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Sink = Callable[[List[Dict]], None]
+
+class BatchedWriter:
+    """Queue in front of a sink, drained by one background thread"""
+
+    def __init__(self, sink: Sink, batch_size: int = 200, flush_interval_s: float = 1.0,
+                 max_queue: int = 10000, retries: int = 3, name: str = "writer"):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.retries = retries
+        self.name = name
+        self.stats = {"submitted": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue)
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"batched-{name}", daemon=True)
+        self._thread.start()
+        # Records still queued at interpreter exit get one last chance
+        atexit.register(self.flush, 5.0)
+
+    def submit(self, record: Dict) -> bool:
+        """Queue a record without blocking; False when the queue is full and it was dropped"""
+        with self._idle:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self.stats["dropped"] += 1
+                return False
+            self._pending += 1
+            self.stats["submitted"] += 1
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything submitted so far is written (or failed); False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _next_batch(self) -> List[Dict]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval_s
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict]) -> bool:
+        for attempt in range(self.retries + 1):
+            try:
+                self.sink(batch)
+                return True
+            except Exception as e:
+                if attempt == self.retries:
+                    logger.error(f"{self.name}: dropping {len(batch)} records after {attempt + 1} attempts: {str(e)}")
+                    return False
+                time.sleep(min(30.0, 0.5 * 2 ** attempt))
+        return False
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            ok = self._write(batch)
+            with self._idle:
+                self.stats["batches"] += 1
+                self.stats["written" if ok else "failed"] += len(batch)
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+# ======================================================
+# 🗄️ SINKS
+# ======================================================
+
+class JsonlSegmentSink:
+    """Appends records to one JSONL segment per UTC day: {directory}/{prefix}-YYYY-MM-DD.jsonl"""
+
+    def __init__(self, directory: str, prefix: str):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, day: str) -> str:
+        return os.path.join(self.directory, f"{self.prefix}-{day}.jsonl")
+
+    def __call__(self, batch: List[Dict]):
+        def day(record: Dict) -> str:
+            return datetime.fromtimestamp(record["ts"], timezone.utc).strftime("%Y-%m-%d")
+        for segment_day, records in groupby(batch, key=day):
+            with open(self.segment_path(segment_day), "a", encoding="utf-8") as handle:
+                handle.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+
+class SupabaseTableSink:
+    """Inserts each batch into a table with one request; to_row maps a record to the table's columns"""
+
+    def __init__(self, client, table: str, to_row: Optional[Callable[[Dict], Dict]] = None):
+        self.client = client
+        self.table = table
+        self.to_row = to_row
+
+    def __call__(self, batch: List[Dict]):
+        rows = [self.to_row(record) for record in batch] if self.to_row else batch
+        self.client.table(self.table).insert(rows).execute()
+
+def iso_timestamp(record: Dict) -> Dict:
+    """Record with its epoch "ts" as an ISO-8601 UTC string, for timestamptz columns"""
+    return {**record, "ts": datetime.fromtimestamp(record["ts"], timezone.utc).isoformat()}